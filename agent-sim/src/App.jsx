@@ -15,6 +15,12 @@ import * as THREE from 'three';
 const GEMINI_API_KEY = process.env.REACT_APP_GEMINI_API_KEY;
 // ============================================================================
 
+// Must match HISTORY_WINDOW in app.py, frames append the entries logged since the last one
+const HISTORY_WINDOW = 10;
+// Must match MAX_AGENTS / MAX_ROUNDS in app.py; runs over 500 agents only send a sample of them
+const MAX_AGENTS = 1000000;
+const MAX_ROUNDS = 10000;
+
 const Sidebar = ({ stats, selectedAgent, setSelectedAgent, onAnalyzeAgent, analysisLoading, isConnected, viewConfigs, activeView }) => {    
   return (
     <div className="w-80 bg-gray-800 p-4 overflow-y-auto border-l border-gray-700">
@@ -29,6 +35,11 @@ const Sidebar = ({ stats, selectedAgent, setSelectedAgent, onAnalyzeAgent, analy
         <div className="bg-gray-700 p-3 rounded">
           <div className="text-sm text-gray-400">Alive Agents</div>
           <div className="text-2xl font-bold text-green-400">{stats.alive}</div>
+          {stats.sampled != null && (
+            <div className="text-xs text-gray-400">
+              of {stats.population}, showing a sample of {stats.sampled}
+            </div>
+          )}
         </div>
 
         <div className="bg-gray-700 p-3 rounded">
@@ -270,6 +281,8 @@ const SocialMobilityViz = () => {
   const [activeView, setActiveView] = useState('self-knowledge');
   const [numAgents, setNumAgents] = useState(100);
   const [numRounds, setNumRounds] = useState(50);
+  // simulation rounds per second, 0 = as fast as the server can go (frames still arrive at its broadcast rate)
+  const [tickRate, setTickRate] = useState(2);
   const [isFullscreen, setIsFullscreen] = useState(false);
 
   
@@ -292,6 +305,13 @@ const SocialMobilityViz = () => {
   const visualModeRef = useRef('spiral');
   const activeViewRef = useRef('self-knowledge');
 
+  // agents by id as of the last applied frame, agent_delta frames are patched onto this
+  const agentMapRef = useRef({});
+  const frameRef = useRef(null);
+  const resyncingRef = useRef(false);
+  // string dictionary from the last agent_binary keyframe
+  const dictionaryRef = useRef(null);
+
   // ============================================================================
   // IMAGE GENERATION FUNCTIONS
   // ============================================================================
@@ -744,7 +764,9 @@ This portrait should subtly reflect their socioeconomic background and current l
       const io = (await import('socket.io-client')).default;
       
       const socket = io(wsUrl, {
-        transports: ['websocket', 'polling']
+        transports: ['websocket', 'polling'],
+        // ask for packed agent_binary frames, the server falls back to JSON without this
+        auth: { encoding: 'binary' }
       });
       
       socket.on('connect', () => {
@@ -753,9 +775,142 @@ This portrait should subtly reflect their socioeconomic background and current l
         setConnectionError('');
       });
       
+      const applyAgents = () => {
+        const agentList = Object.values(agentMapRef.current);
+        setAgents(agentList);
+        updateAgentPositions(agentList);
+      };
+
+      // keyframe: the full agent list
       socket.on('agent_update', (data) => {
-        setAgents(data.agents);
-        updateAgentPositions(data.agents);
+        const agentMap = {};
+        data.agents.forEach((agent) => {
+          agentMap[agent.id] = agent;
+        });
+        agentMapRef.current = agentMap;
+        frameRef.current = data.frame ?? null;
+        resyncingRef.current = false;
+        applyAgents();
+      });
+
+      socket.on('agent_delta', (data) => {
+        if (resyncingRef.current) return;
+
+        // a delta only applies on top of the frame it was built from, otherwise ask for a keyframe
+        if (frameRef.current === null || data.base !== frameRef.current) {
+          resyncingRef.current = true;
+          socket.emit('message', { command: 'get_state' });
+          return;
+        }
+
+        const agentMap = agentMapRef.current;
+        data.changes.forEach((change) => {
+          agentMap[change.id] = { ...agentMap[change.id], ...change };
+        });
+        Object.entries(data.history).forEach(([id, entries]) => {
+          const agent = agentMap[id];
+          agentMap[id] = { ...agent, history: [...(agent.history || []), ...entries].slice(-HISTORY_WINDOW) };
+        });
+        frameRef.current = data.frame;
+        applyAgents();
+      });
+
+      // packed columns: every field is a Float32Array / Uint16Array / Uint8Array view into data.data
+      socket.on('agent_binary', (data) => {
+        if (data.dictionary) {
+          dictionaryRef.current = data.dictionary;
+          resyncingRef.current = false;
+        }
+        const dictionary = dictionaryRef.current;
+        if (!dictionary || dictionary.names.length !== data.count) {
+          // joined (or reset) between keyframes, the codes can't be decoded yet
+          if (!resyncingRef.current) {
+            resyncingRef.current = true;
+            socket.emit('message', { command: 'get_state' });
+          }
+          return;
+        }
+
+        // copy into a fresh ArrayBuffer so every 4-byte aligned offset stays aligned
+        const buffer = new Uint8Array(data.data).slice().buffer;
+        const arrays = { f4: Float32Array, u2: Uint16Array, u1: Uint8Array };
+        const view = ([, dtype, offset], length) => new arrays[dtype](buffer, offset, length);
+        const columnsOf = (specs, length) => {
+          const columns = {};
+          specs.forEach((spec) => { columns[spec[0]] = view(spec, length); });
+          return columns;
+        };
+
+        const count = data.count;
+        const taskName = (code) => (code === dictionary.noTask ? null : dictionary.tasks[code]);
+        const decodeField = {
+          class: (code) => dictionary.classes[code],
+          gender: (code) => dictionary.genders[code],
+          alive: (flag) => flag === 1,
+          'succeeded last task?': (flag) => flag === 1,
+          'last task': taskName,
+        };
+        const historyEntry = (columns, i) => {
+          const task = columns.task[i];
+          return {
+            round: columns.round[i],
+            age: columns.age[i],
+            task: taskName(task),
+            difficulty: task === dictionary.noTask ? 0 : dictionary.difficulty[task],
+            success: columns.success[i] === 1,
+            reward: columns.reward[i],
+            loss: columns.loss[i],
+            confidence: columns.confidence[i],
+            competence: columns.competence[i],
+            aspiration: columns.aspiration[i],
+            risk_tolerance: columns.risk_tolerance[i],
+            money: columns.money[i],
+          };
+        };
+
+        const columns = columnsOf(data.columns, count);
+        const logged = columnsOf(data.history, data.historyCount);
+        const previous = agentMapRef.current;
+        const agentMap = {};
+        let windows = null;
+        if (data.keyframe) {
+          const [lengthSpec, ...blockSpecs] = data.historyWindow;
+          windows = { lengths: view(lengthSpec, count), blocks: columnsOf(blockSpecs, count * data.window) };
+        }
+
+        // history entries logged since the last frame, grouped by agent row
+        const loggedByRow = {};
+        for (let k = 0; k < data.historyCount; k++) {
+          const row = logged.agent[k];
+          loggedByRow[row] = [...(loggedByRow[row] || []), k];
+        }
+
+        for (let i = 0; i < count; i++) {
+          const agent = { name: dictionary.names[i] };
+          data.columns.forEach(([field]) => {
+            const value = columns[field][i];
+            agent[field] = decodeField[field] ? decodeField[field](value) : value;
+          });
+
+          let history;
+          if (windows) {
+            history = [];
+            for (let j = 0; j < windows.lengths[i]; j++) {
+              history.push(historyEntry(windows.blocks, i * data.window + j));
+            }
+          } else {
+            history = previous[agent.id]?.history || [];
+            if (loggedByRow[i]) {
+              history = [...history, ...loggedByRow[i].map((k) => historyEntry(logged, k))].slice(-HISTORY_WINDOW);
+            }
+          }
+          agent.history = history;
+          agentMap[agent.id] = agent;
+        }
+
+        agentMapRef.current = agentMap;
+        frameRef.current = data.frame;
+        applyAgents();
       });
 
       socket.on('simulation_unpaused', () => {
@@ -772,6 +927,17 @@ This portrait should subtly reflect their socioeconomic background and current l
         console.log('Simulation complete');
       });
       
+      // the server's session pool dropped this run (idle too long, or room needed for other runs)
+      socket.on('simulation_evicted', (data) => {
+        setSimulationRunning(false);
+        setConnectionError(data.message);
+      });
+
+      socket.on('simulation_error', (data) => {
+        setSimulationRunning(false);
+        setConnectionError(data.message);
+      });
+
       socket.on('connect_error', (error) => {
         console.error('Connection error:', error);
         setConnectionError('Failed to connect. Is the backend running on ' + wsUrl + '?');
@@ -807,7 +973,9 @@ This portrait should subtly reflect their socioeconomic background and current l
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
-          agent_id: selectedAgent.id
+          agent_id: selectedAgent.id,
+          // agents belong to this socket's session on the server
+          session_id: wsRef.current?.id
         })
       });
 
@@ -1291,7 +1459,8 @@ This portrait should subtly reflect their socioeconomic background and current l
         command: 'start',
         params: {
           num_agents: numAgents,
-          num_rounds: numRounds
+          num_rounds: numRounds,
+          tick_rate: tickRate
         }
       });
       setSimulationRunning(true);
@@ -1300,6 +1469,13 @@ This portrait should subtly reflect their socioeconomic background and current l
     }
   };
 
+  const changeTickRate = (rate) => {
+    setTickRate(rate);
+    if (wsRef.current && wsRef.current.connected) {
+      wsRef.current.emit('message', { command: 'set_speed', params: { tick_rate: rate } });
+    }
+  };
+
   const pauseSimulation = () => {
     if (wsRef.current && wsRef.current.connected) {
       wsRef.current.emit('message', { command: 'pause' });
@@ -1327,6 +1503,9 @@ This portrait should subtly reflect their socioeconomic background and current l
         mesh.material.dispose();
       });
       agentMeshesRef.current = {};
+      agentMapRef.current = {};
+      frameRef.current = null;
+      dictionaryRef.current = null;
       setAgents([]);
       setSelectedAgent(null);
     }
@@ -1469,10 +1648,10 @@ This portrait should subtly reflect their socioeconomic background and current l
               <input
                 type="number"
                 value={numAgents}
-                onChange={(e) => setNumAgents(Math.max(1, Math.min(500, parseInt(e.target.value) || 100)))}
+                onChange={(e) => setNumAgents(Math.max(1, Math.min(MAX_AGENTS, parseInt(e.target.value) || 100)))}
                 min="1"
-                max="500"
-                className="px-3 py-1 bg-gray-700 rounded text-sm w-20 text-white"
+                max={MAX_AGENTS}
+                className="px-3 py-1 bg-gray-700 rounded text-sm w-24 text-white"
                 disabled={simulationRunning}
               />
             </div>
@@ -1481,13 +1660,27 @@ This portrait should subtly reflect their socioeconomic background and current l
               <input
                 type="number"
                 value={numRounds}
-                onChange={(e) => setNumRounds(Math.max(1, Math.min(200, parseInt(e.target.value) || 50)))}
+                onChange={(e) => setNumRounds(Math.max(1, Math.min(MAX_ROUNDS, parseInt(e.target.value) || 50)))}
                 min="1"
-                max="200"
+                max={MAX_ROUNDS}
                 className="px-3 py-1 bg-gray-700 rounded text-sm w-20 text-white"
                 disabled={simulationRunning}
               />
             </div>
+            <div className="flex items-center gap-2">
+              <label className="text-sm text-gray-400">Speed:</label>
+              <select
+                value={tickRate}
+                onChange={(e) => changeTickRate(Number(e.target.value))}
+                className="px-3 py-1 bg-gray-700 rounded text-sm text-white"
+              >
+                <option value={1}>1 round/s</option>
+                <option value={2}>2 rounds/s</option>
+                <option value={10}>10 rounds/s</option>
+                <option value={50}>50 rounds/s</option>
+                <option value={0}>Max</option>
+              </select>
+            </div>
           </div>
 
           {connectionError && (
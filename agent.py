@@ -1,7 +1,9 @@
-import random
+import bisect
+import math
+from itertools import accumulate
 import numpy as np
 from enum import Enum
-import names
+import namegen
 
 DECAY_RATE = 40
 AGE_HALF_LIFE = 40
@@ -29,36 +31,52 @@ RISK_BANDS = {
 }
 
 wealth_classes = ["Low", "Middle", "High"]
+CLASS_RANK = {wealth: rank for rank, wealth in enumerate(wealth_classes)}
 class_probability = [33, 34, 33]
 
 risk_classes =["safe", "striver", "elite"]
 
+# stream for callers that don't hand in a Generator of their own (so not reproducible)
+default_rng = np.random.default_rng()
+
+def resolve_rng(rng):
+    return default_rng if rng is None else rng
+
+def weighted_choice(rng, options, weights):
+    """One of options, picked with probability proportional to weights (like random.choices(...)[0])."""
+    cumulative = list(accumulate(weights))
+    return options[bisect.bisect_right(cumulative, rng.random() * cumulative[-1])]
+
 class Identity:
-    def __init__(self, wealth, talent):
-        noise = np.random.normal(0, 0.1)
+    __slots__ = ("aspiration", "competence", "confidence", "risk_class", "max_confidence", "risk_tolerance")
+
+    def __init__(self, wealth, talent, rng=None):
+        rng = resolve_rng(rng)
+        # plain Python floats throughout, so nothing downstream has to unwrap NumPy scalars
+        noise = float(rng.normal(0, 0.1))
         aspiration = 0
         belief = 0
         risk = 0
         if wealth == "Low":
             aspiration = clamp(0.3 + noise, 0, 1)
-            low_belief = np.random.normal(0, 0.05)
+            low_belief = float(rng.normal(0, 0.05))
             belief = clamp(talent + low_belief, 0, 1) # ensure that no agent has a negative self belief (it breaks lol)
             risk_probability = [65, 30, 5]
-            risk = random.choices(risk_classes, weights=risk_probability, k=1)[0]
+            risk = weighted_choice(rng, risk_classes, risk_probability)
 
         elif wealth == "Middle":
             aspiration = clamp(0.5 + noise, 0, 1)
-            middle_belief = np.random.normal(0.15, 0.05)
+            middle_belief = float(rng.normal(0.15, 0.05))
             belief = clamp(talent + middle_belief, 0, 1)
             risk_probability = [30, 40, 30]
-            risk = random.choices(risk_classes, weights=risk_probability, k=1)[0]
+            risk = weighted_choice(rng, risk_classes, risk_probability)
 
         elif wealth == "High":
             aspiration = clamp(0.8 + noise, 0, 1)
-            high_belief = np.random.normal(0.3, 0.05)
+            high_belief = float(rng.normal(0.3, 0.05))
             belief = clamp(talent + high_belief, 0, 1)
             risk_probability = [20, 40, 40]
-            risk = random.choices(risk_classes, weights=risk_probability, k=1)[0]
+            risk = weighted_choice(rng, risk_classes, risk_probability)
         """
         Aspiration:     The measure for which tasks the agent even considers
                         "What am I aiming for?"
@@ -71,7 +89,7 @@ class Identity:
         """
         self.aspiration = aspiration
         self.competence = belief
-        self.confidence = clamp(self.competence + np.random.normal(0, 0.1), 0, 1)
+        self.confidence = clamp(self.competence + float(rng.normal(0, 0.1)), 0, 1)
         self.risk_class = risk
 
         MAX_CONFIDENCE_BY_CLASS = {
@@ -82,10 +100,10 @@ class Identity:
 
         self.max_confidence = (
             MAX_CONFIDENCE_BY_CLASS[wealth]
-            + np.random.normal(0, 0.05)
+            + float(rng.normal(0, 0.05))
         )
         low, high = RISK_BANDS[risk]
-        self.risk_tolerance = random.uniform(low, high)
+        self.risk_tolerance = float(rng.uniform(low, high))
 
 
 class Agent:
@@ -97,13 +115,31 @@ class Agent:
     Age: How old an agent is. The older an agent becomes, the more rigid their decision making becomes
     Identity: The agent's perception of itself. This is the main deciding factor when making decisions
     """
-    def __init__(self, id: int):
-        self.gender = "male" if random.random() > 0.5 else "female"
-        self.name = names.get_full_name(gender=self.gender)
-        self.talent = random.random()
-        self.wealth = random.choices(wealth_classes, weights=class_probability, k=1)[0]
+    __slots__ = (
+        "gender", "_name", "talent", "wealth", "age", "identity", "performance_estimate", "rewards",
+        "id", "alive", "last_task", "last_task_succeeded", "tasks_done", "history",
+        "dropout_pressure", "social_capital",
+        # bookkeeping for the dashboard in app.py
+        "total_tasks_attempted", "total_tasks_succeeded", "task_difficulty_sum",
+        "reward_history", "initial_rewards",
+        # where this agent's random draws and its name come from
+        "rng", "name_pool",
+    )
+
+    def __init__(self, id: int, rng=None, name_pool=None):
+        """
+        rng:        numpy Generator for every random draw this agent makes (shared
+                    by a whole simulation so one seed reproduces the run)
+        name_pool:  namegen.NamePool the name is drawn from, the module's by default
+        """
+        self.rng = rng = resolve_rng(rng)
+        self.name_pool = name_pool
+        self.gender = "male" if rng.random() > 0.5 else "female"
+        self._name = None  # drawn from the name pool the first time someone reads it
+        self.talent = float(rng.random())
+        self.wealth = weighted_choice(rng, wealth_classes, class_probability)
         self.age = 0
-        self.identity = Identity(self.wealth, self.talent)
+        self.identity = Identity(self.wealth, self.talent, rng)
         self.performance_estimate = self.identity.confidence
         if self.wealth == "High":
             self.rewards = 100
@@ -120,10 +156,26 @@ class Agent:
         self.history = []
         self.dropout_pressure = 0.0
         # your coolness factor (how likely you are to interact with other people)
-        self.social_capital = random.uniform(0.1, 0.3) if self.wealth == "Low" else \
-                      random.uniform(0.3, 0.6) if self.wealth == "Middle" else \
-                      random.uniform(0.6, 0.9)
-
+        self.social_capital = float(rng.uniform(0.1, 0.3) if self.wealth == "Low" else \
+                      rng.uniform(0.3, 0.6) if self.wealth == "Middle" else \
+                      rng.uniform(0.6, 0.9))
+
+        self.total_tasks_attempted = 0
+        self.total_tasks_succeeded = 0
+        self.task_difficulty_sum = 0
+        self.reward_history = []
+        self.initial_rewards = self.rewards
+
+    @property
+    def name(self):
+        if self._name is None:
+            pool = self.name_pool
+            self._name = pool.full_name(self.gender) if pool is not None else namegen.full_name(self.gender)
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
 
     def available_tasks(self, tasks):
         """
@@ -132,6 +184,9 @@ class Agent:
         - Broke check relaxed for low-class to allow gambling their way up.
         - High-class still protected by overconfidence rules elsewhere.
         """
+        if isinstance(tasks, TaskIndex):
+            return tasks.available(self.wealth, self.rewards, self.rng)
+
         available = []
         for task in tasks:
             # Capital requirement
@@ -143,7 +198,7 @@ class Agent:
             # Class requirement
             if task.required_class and self.wealth != task.required_class:
                 # Rare chance for Low-class to breach class requirement
-                if self.wealth == "Low" and random.random() < 0.05:
+                if self.wealth == "Low" and self.rng.random() < 0.05:
                     pass  # allow it
                 else:
                     continue
@@ -159,25 +214,40 @@ class Agent:
 
 
     def choose_task(self, tasks):
-        viable_tasks = []
-        for task in self.available_tasks(tasks):
-            # Aspiration Check
-            if task.difficulty > self.identity.aspiration and random.random() < 0.7:
-                continue
+        if isinstance(tasks, TaskIndex):
+            # the index already ran the availability, aspiration, risk and broke checks
+            candidates = tasks.eligible(
+                self.wealth,
+                self.rewards,
+                self.identity.confidence,
+                self.identity.aspiration,
+                self.identity.risk_tolerance,
+                self.rng
+            )
+        else:
+            candidates = []
+            for task in self.available_tasks(tasks):
+                # Aspiration Check
+                if task.difficulty > self.identity.aspiration and self.rng.random() < 0.7:
+                    continue
 
-            # Risk Check
-            expected_gap = self.identity.confidence - task.difficulty
-            if expected_gap < -self.identity.risk_tolerance:
-                continue
+                # Risk Check
+                expected_gap = self.identity.confidence - task.difficulty
+                if expected_gap < -self.identity.risk_tolerance:
+                    continue
+
+                # Broke Check
+                if self.rewards < task.base_loss:
+                    continue
 
+                candidates.append(task)
+
+        viable_tasks = []
+        for task in candidates:
             # I'm too old for this shiiii
             if self.age > 40 and task.difficulty < self.identity.aspiration - 0.2:
                 continue
 
-            # Broke Check
-            if self.rewards < task.base_loss:
-                continue
-
             # Overconfidence check
             if self.wealth == "High" and task.difficulty > self.identity.competence + 0.2:
                 continue
@@ -212,7 +282,7 @@ class Agent:
 
     def peer_opportunity(self, peer):
         if peer.wealth in ["Middle", "High"] and self.wealth == "Low":
-            if random.random() < 0.05 * peer.social_capital:
+            if self.rng.random() < 0.05 * peer.social_capital:
                 self.identity.aspiration += 0.1
                 self.identity.aspiration = clamp(self.identity.aspiration, 0, 1)
                 self.social_capital += 0.05
@@ -222,28 +292,30 @@ class Agent:
         # Only learn if peer is doing better
         if peer.identity.competence > self.identity.competence:
             # Only attempt learning if agent succeeded last task
-            if self.last_task_succeeded and random.random() < 0.15:
+            if self.last_task_succeeded and self.rng.random() < 0.15:
                 self.identity.competence += 0.02
                 # Clamp so competence doesn't exceed max
                 self.identity.competence = clamp(self.identity.competence, 0, 1)
 
 
     def interact(self, population):
-        def pick_peers(agent, population, k=2):
-            same = [a for a in population if a.wealth == agent.wealth and a.alive]
-            above = [a for a in population if a.wealth > agent.wealth and a.alive]
-            below = [a for a in population if a.wealth < agent.wealth and a.alive]
-
+        """
+        population is either a PeerIndex kept for the round or a plain list of agents
+        (which gets indexed on the spot).
+        """
+        def pick_peers(agent, index, k=2):
             peers = []
-            if same:
-                peers += random.sample(same, min(1, len(same)))
-            if above and random.random() < 0.25:
-                peers += random.sample(above, 1)
-            if below and random.random() < 0.1:
-                peers += random.sample(below, 1)
+            same = index.sample_same(agent)
+            if same is not None:
+                peers.append(same)
+            if index.count_above(agent) and self.rng.random() < 0.25:
+                peers.append(index.sample_above(agent))
+            if index.count_below(agent) and self.rng.random() < 0.1:
+                peers.append(index.sample_below(agent))
             return peers[:k]
-    
-        peers = pick_peers(self, population)
+
+        index = population if isinstance(population, PeerIndex) else PeerIndex(population, self.rng)
+        peers = pick_peers(self, index)
         for peer in peers:
             self.peer_confidence_update(peer)
             self.peer_opportunity(peer)
@@ -258,7 +330,7 @@ class Agent:
         else:
             self.dropout_pressure *= 0.97
 
-        age_rate = np.exp(-self.age / DECAY_RATE) # updates become less drastic the older an agent is
+        age_rate = math.exp(-self.age / DECAY_RATE) # updates become less drastic the older an agent is
         
        # social capital wears off over time
         self.social_capital *= 0.995
@@ -285,7 +357,7 @@ class Agent:
 
             # Rare mentor boost, Senapi notices u
             if outcome["success"] and self.wealth == "Low":
-                if random.random() < 0.08:
+                if self.rng.random() < 0.08:
                     self.identity.competence += 0.05
                     self.identity.max_confidence += 0.1
 
@@ -412,8 +484,8 @@ class Agent:
             self.rewards += 2
 
         # Rare positive life shock (luck)
-        if self.wealth == "Low" and random.random() < 0.015:
-            windfall = random.uniform(20, 80)
+        if self.wealth == "Low" and self.rng.random() < 0.015:
+            windfall = float(self.rng.uniform(20, 80))
             self.rewards += windfall
             self.identity.confidence += 0.1
 
@@ -440,7 +512,7 @@ class Agent:
                 0,
                 0.5
             )
-            if random.random() < dropout_chance:
+            if self.rng.random() < dropout_chance:
                 self.alive = False
 
 
@@ -452,18 +524,21 @@ class Agent:
             "age": self.age,
             "class": self.wealth,
             "alive": self.alive,
-            "talent": self.talent.item() if isinstance(self.talent, np.floating) else self.talent,
-            "money": self.rewards.item() if isinstance(self.rewards, np.floating) else self.rewards,
-            "confidence": self.identity.confidence.item() if isinstance(self.identity.confidence, np.floating) else self.identity.confidence,
-            "competence": self.identity.competence.item() if isinstance(self.identity.competence, np.floating) else self.identity.competence,
-            "aspiration": self.identity.aspiration.item() if isinstance(self.identity.aspiration, np.floating) else self.identity.aspiration,
-            "risk tolerance": self.identity.risk_tolerance.item() if isinstance(self.identity.risk_tolerance, np.floating) else self.identity.risk_tolerance,
+            "talent": self.talent,
+            "money": self.rewards,
+            "confidence": self.identity.confidence,
+            "competence": self.identity.competence,
+            "aspiration": self.identity.aspiration,
+            "risk tolerance": self.identity.risk_tolerance,
             "last task": self.last_task,
             "succeeded last task?": self.last_task_succeeded,
         }
 
 
 class Task:
+    __slots__ = ("difficulty", "reward", "variance", "base_loss", "name", "repeatability",
+                 "required_capital", "required_class")
+
     def __init__(self, name, difficulty, reward, variance, base_loss, repeatability, required_capital=None, required_class=None):
         self.difficulty = difficulty
         self.reward = reward
@@ -484,16 +559,17 @@ class Task:
             "High": 0.7
         }
 
-        luck = random.gauss(0, 0.05)
+        rng = agent.rng
+        luck = float(rng.normal(0, 0.05))
 
         # Doing the actual task
         performance = (agent.talent + 
                        luck + 
-                       random.uniform(-self.variance, self.variance) * class_noise[agent.wealth])
+                       float(rng.uniform(-self.variance, self.variance)) * class_noise[agent.wealth])
 
         # Effects of training slows down as you age
-        task_value = self.reward * np.exp(-agent.tasks_done[self.name] / self.repeatability)
-        age_penalty = np.exp(-agent.age / AGE_HALF_LIFE)
+        task_value = self.reward * math.exp(-agent.tasks_done[self.name] / self.repeatability)
+        age_penalty = math.exp(-agent.age / AGE_HALF_LIFE)
         effective_reward = task_value * age_penalty
 
         if performance > self.difficulty:
@@ -539,5 +615,168 @@ class Task:
         else:
             agent.tasks_done[self.name] = 1
 
+class PeerIndex:
+    """
+    Alive agents bucketed by wealth class, in class rank order (Low < Middle < High).
+
+    Built once per round; picking a same-class, higher-class or lower-class peer is
+    O(1). Call remove() when an agent drops out mid-round so nobody picks it afterwards.
+    Peers are drawn from rng (a numpy Generator).
+    """
+    def __init__(self, population, rng=None):
+        self.rng = resolve_rng(rng)
+        self.buckets = [[] for _ in wealth_classes]
+        self.slots = {}
+        for agent in population:
+            if agent.alive:
+                self.add(agent)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, agent):
+        return id(agent) in self.slots
+
+    def add(self, agent):
+        if agent in self:
+            return
+        bucket = self.buckets[CLASS_RANK[agent.wealth]]
+        self.slots[id(agent)] = len(bucket)
+        bucket.append(agent)
+
+    def remove(self, agent):
+        # swap the last agent of the bucket into the hole so removal stays O(1)
+        slot = self.slots.pop(id(agent), None)
+        if slot is None:
+            return
+        bucket = self.buckets[CLASS_RANK[agent.wealth]]
+        last = bucket.pop()
+        if last is not agent:
+            bucket[slot] = last
+            self.slots[id(last)] = slot
+
+    def count_above(self, agent):
+        return sum(len(b) for b in self.buckets[CLASS_RANK[agent.wealth] + 1:])
+
+    def count_below(self, agent):
+        return sum(len(b) for b in self.buckets[:CLASS_RANK[agent.wealth]])
+
+    def sample_same(self, agent):
+        bucket = self.buckets[CLASS_RANK[agent.wealth]]
+        return bucket[self.rng.integers(len(bucket))] if bucket else None
+
+    def sample_above(self, agent):
+        return self.pick(self.buckets[CLASS_RANK[agent.wealth] + 1:])
+
+    def sample_below(self, agent):
+        return self.pick(self.buckets[:CLASS_RANK[agent.wealth]])
+
+    def pick(self, buckets):
+        # uniform over the union of a few buckets without concatenating them
+        total = sum(len(b) for b in buckets)
+        if not total:
+            return None
+        r = int(self.rng.integers(total))
+        for bucket in buckets:
+            if r < len(bucket):
+                return bucket[r]
+            r -= len(bucket)
+
+
+class TaskBucket:
+    """Tasks sorted by the money an agent needs before it may take them."""
+    def __init__(self, tasks, threshold):
+        ordered = sorted(tasks, key=threshold)
+        self.thresholds = [threshold(t) for t in ordered]
+        self.tasks = ordered
+
+    def affordable(self, rewards):
+        return self.tasks[:bisect.bisect_right(self.thresholds, rewards)]
+
+
+class TaskIndex:
+    """
+    Precomputed eligibility lookups over a fixed task list.
+
+    required_class, required_capital and base_loss never change, so tasks are
+    grouped by the class allowed to take them and sorted by their money
+    threshold once. A lookup bisects to the affordable prefix of the agent's
+    group instead of re-checking every task. Low-class agents still breach each
+    class-locked task with a 5% chance.
+
+    Lookups return tasks in their original list order so ties in choose_task
+    resolve the same way as a plain list.
+    """
+    def __init__(self, tasks: list[Task]):
+        self.tasks = list(tasks)
+        self.position = {id(task): i for i, task in enumerate(self.tasks)}
+        self.available_buckets = {}
+        self.eligible_buckets = {}
+        for wealth in wealth_classes:
+            own = [t for t in self.tasks if not t.required_class or t.required_class == wealth]
+            self.available_buckets[wealth] = TaskBucket(own, lambda t, w=wealth: self.available_threshold(t, w))
+            self.eligible_buckets[wealth] = TaskBucket(own, lambda t, w=wealth: self.eligible_threshold(t, w))
+
+        # class-locked tasks a Low-class agent can occasionally sneak into
+        locked = [t for t in self.tasks if t.required_class and t.required_class != "Low"]
+        self.breach_available = TaskBucket(locked, lambda t: self.available_threshold(t, "Low"))
+        self.breach_eligible = TaskBucket(locked, lambda t: self.eligible_threshold(t, "Low"))
+
+    @staticmethod
+    def capital_threshold(task, wealth):
+        # Low-class agents may attempt low/mid-reward tasks even if undercapitalized
+        if task.required_capital and (wealth != "Low" or task.reward > 20):
+            return task.required_capital
+        return -np.inf
+
+    @classmethod
+    def available_threshold(cls, task, wealth):
+        threshold = cls.capital_threshold(task, wealth)
+        if wealth != "Low":
+            threshold = max(threshold, task.base_loss)
+        return threshold
+
+    @classmethod
+    def eligible_threshold(cls, task, wealth):
+        return max(cls.capital_threshold(task, wealth), task.base_loss)
+
+    @staticmethod
+    def breach(bucket, rewards, rng):
+        # each locked task is let through independently with a 5% chance
+        reachable = bucket.affordable(rewards)
+        k = rng.binomial(len(reachable), 0.05) if reachable else 0
+        return [reachable[i] for i in rng.choice(len(reachable), k, replace=False)] if k else []
+
+    def in_order(self, tasks):
+        return sorted(tasks, key=lambda t: self.position[id(t)])
+
+    def available(self, wealth, rewards, rng=None):
+        """Same result as Agent.available_tasks over the full list."""
+        tasks = self.available_buckets[wealth].affordable(rewards)
+        if wealth == "Low":
+            tasks = tasks + self.breach(self.breach_available, rewards, resolve_rng(rng))
+        return self.in_order(tasks)
+
+    def eligible(self, wealth, rewards, confidence, aspiration, risk_tolerance, rng=None):
+        """
+        Available tasks that also pass the aspiration, risk and broke checks of Agent.choose_task.
+        """
+        rng = resolve_rng(rng)
+        tasks = self.eligible_buckets[wealth].affordable(rewards)
+        if wealth == "Low":
+            tasks = tasks + self.breach(self.breach_eligible, rewards, rng)
+
+        # one aspiration roll per task, drawn together (a Generator call per task is slow)
+        rolls = rng.random(len(tasks)).tolist()
+        eligible = []
+        for task, roll in zip(tasks, rolls):
+            if confidence - task.difficulty < -risk_tolerance:
+                continue
+            if task.difficulty > aspiration and roll < 0.7:
+                continue
+            eligible.append(task)
+        return self.in_order(eligible)
+
+
 def clamp(val, a, b):
     return max(min(b, val), a)
\ No newline at end of file
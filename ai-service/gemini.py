@@ -1,19 +1,24 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
-import google.generativeai as genai
-from PIL import Image
-from google.generativeai import types
 import io
-import base64
+
+# google.generativeai (and PIL) take seconds to import, so they are only loaded
+# by the first call that needs them; the configured model objects are made once.
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 model_name = "gemini-2.0-flash"
 image_model_name = "gemini-1.5-pro"
 
+@lru_cache(maxsize=None)
+def get_model(name):
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return genai.GenerativeModel(name)
+
 def call_gemini(prompt):
-    model = genai.GenerativeModel(model_name)
+    model = get_model(model_name)
     response = model.generate_content(
         prompt,
         generation_config={
@@ -25,12 +30,13 @@ def call_gemini(prompt):
     # Handle blocked/empty responses
     if not response.text:
         return "Unable to generate response. The request may have been blocked by safety filters or the model encountered an error."
-    
+
     return response.text
 
 def generate_agent_image(prompt):
     try:
-        model = genai.GenerativeModel(image_model_name)
+        from PIL import Image
+        model = get_model(image_model_name)
         response = model.generate_content(
             prompt,
             generation_config={
@@ -53,5 +59,3 @@ def generate_agent_image(prompt):
     except Exception as e:
         print(f"Error generating image: {str(e)}")
         return None
-
-generate_agent_image("Hello World, I am a robot")
\ No newline at end of file
@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Queued access to the text model.
+
+Every analysis goes through one InferenceQueue: at most `concurrency` model
+calls run at once (each on a worker thread, the model clients block), calls
+start no faster than a token bucket allows, and every request has a deadline.
+Requests over the limits wait in line instead of piling onto the model;
+one whose deadline passes gets DeadlineExceeded, and once max_queue requests
+are already waiting new ones get QueueFull straight away.
+
+The backend is anything with generate(prompt) -> str. GeminiBackend calls the
+real model; StubBackend answers deterministically (optionally after a fixed
+latency) for tests and load runs. AI_BACKEND=stub selects it.
+"""
+
+CONCURRENCY = 4
+RATE = 2.0     # model calls started per second, sustained
+BURST = 4      # calls that may start back to back after a quiet spell
+MAX_QUEUE = 64
+TIMEOUT = 30.0  # seconds a request may take, waiting included
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class GeminiBackend:
+    def __init__(self):
+        from gemini import call_gemini
+        self.call = call_gemini
+
+    def generate(self, prompt):
+        return self.call(prompt)
+
+
+class StubBackend:
+    """Same prompt, same answer; latency seconds of pretend model time per call."""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def generate(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        return f"Stub analysis {digest} of a {len(prompt)} character prompt."
+
+
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+
+
+def backend_from_env():
+    name = os.getenv("AI_BACKEND", "gemini")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown AI_BACKEND {name!r}, expected one of {tuple(BACKENDS)}")
+    if name == "stub":
+        return StubBackend(float(os.getenv("AI_STUB_LATENCY", "0")))
+    return BACKENDS[name]()
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most burst."""
+    def __init__(self, rate=RATE, burst=BURST, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def reserve(self):
+        """Take a token, returning how long to wait until it's actually there (0 if now)."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self):
+        self.tokens += 1
+
+    async def acquire(self, deadline):
+        wait = self.reserve()
+        if self.clock() + wait > deadline:
+            self.refund()
+            raise DeadlineExceeded("Rate limited past the request deadline")
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class InferenceQueue:
+    def __init__(self, backend, concurrency=CONCURRENCY, rate=RATE, burst=BURST,
+                 max_queue=MAX_QUEUE, timeout=TIMEOUT):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="inference")
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+
+    async def submit(self, prompt, timeout=None):
+        """The model's answer to prompt, within timeout seconds (the queue's default if None)."""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(f"{self.waiting} requests are already waiting")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise DeadlineExceeded("Deadline passed while waiting for a model slot") from None
+        finally:
+            self.waiting -= 1
+
+        try:
+            await self.bucket.acquire(deadline)
+        except DeadlineExceeded:
+            self.slots.release()
+            self.timed_out += 1
+            raise
+
+        # the slot is held until the model call returns, even if the caller stops waiting,
+        # so an abandoned call still counts against the concurrency limit
+        self.running += 1
+        call = asyncio.get_running_loop().run_in_executor(self.executor, self.backend.generate, prompt)
+        call.add_done_callback(self.finished)
+        try:
+            return await asyncio.wait_for(asyncio.shield(call), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise DeadlineExceeded("Deadline passed while the model was answering") from None
+
+    def finished(self, call):
+        self.running -= 1
+        self.slots.release()
+        if call.cancelled() or call.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    async def submit_batch(self, prompts, timeout=None):
+        """Answers (or the exception raised) for every prompt, in order; they share the queue."""
+        return await asyncio.gather(*(self.submit(prompt, timeout) for prompt in prompts), return_exceptions=True)
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "concurrency": self.concurrency,
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timedOut": self.timed_out,
+            "rejected": self.rejected,
+        }
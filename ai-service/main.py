@@ -1,14 +1,39 @@
+import os
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-from gemini import call_gemini
+from inference import (InferenceQueue, DeadlineExceeded, QueueFull, backend_from_env,
+                       CONCURRENCY, RATE, BURST, MAX_QUEUE, TIMEOUT)
 import uvicorn
 
 # Initialize FastAPI app
 app = FastAPI(title="Sample API", version="1.0.0")
 
+# every model call goes through this queue, see inference.py (limits can be
+# overridden from the environment)
+queue = InferenceQueue(
+    backend_from_env(),
+    concurrency=int(os.getenv("AI_CONCURRENCY", CONCURRENCY)),
+    rate=float(os.getenv("AI_RATE", RATE)),
+    burst=int(os.getenv("AI_BURST", BURST)),
+    max_queue=int(os.getenv("AI_MAX_QUEUE", MAX_QUEUE)),
+    timeout=float(os.getenv("AI_TIMEOUT", TIMEOUT)),
+)
+
 class Prompt(BaseModel):
     prompt: str
+    timeout: Optional[float] = None
+
+class PromptBatch(BaseModel):
+    prompts: list[str]
+    timeout: Optional[float] = None
+
+def error_status(error):
+    if isinstance(error, QueueFull):
+        return 503
+    if isinstance(error, DeadlineExceeded):
+        return 504
+    return 502
 
 # Root endpoint
 @app.get("/")
@@ -17,11 +42,34 @@ def read_root():
 
 # POST endpoint
 @app.post("/analyze")
-def create_item(prompt: Prompt):
+async def create_item(prompt: Prompt):
+    try:
+        message = await queue.submit(prompt.prompt, prompt.timeout)
+    except Exception as e:
+        raise HTTPException(status_code=error_status(e), detail=str(e))
     return {
-        "message": call_gemini(prompt.prompt)
+        "message": message
     }
 
+# several prompts in one request, answered in order; one failing doesn't fail the others
+@app.post("/analyze_batch")
+async def analyze_batch(batch: PromptBatch):
+    # a batch can't be bigger than the queue, or one request would get past its backpressure
+    if len(batch.prompts) > queue.max_queue:
+        raise HTTPException(status_code=413, detail=f"At most {queue.max_queue} prompts per batch")
+    answers = await queue.submit_batch(batch.prompts, batch.timeout)
+    return {
+        "results": [
+            {"error": str(answer), "status": error_status(answer)} if isinstance(answer, Exception)
+            else {"message": answer}
+            for answer in answers
+        ]
+    }
+
+@app.get("/queue")
+def queue_stats():
+    return queue.stats()
+
 # Run the server
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
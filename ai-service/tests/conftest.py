@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the service's modules live one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,114 @@
+import asyncio
+import time
+import pytest
+from inference import InferenceQueue, StubBackend, DeadlineExceeded, QueueFull
+
+"""
+InferenceQueue limits against the stub backend: a full queue refuses at once,
+deadlines hold while waiting for a slot, for the rate limit and for the model,
+and an abandoned model call keeps its slot until it actually returns.
+"""
+
+FAST = dict(rate=1000.0, burst=100)  # rate limit out of the way
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_full_queue_refuses_straight_away():
+    async def scenario():
+        queue = InferenceQueue(StubBackend(latency=0.2), concurrency=1, max_queue=1, **FAST)
+        running = asyncio.ensure_future(queue.submit("a"))
+        await asyncio.sleep(0.05)  # a holds the only slot
+        waiting = asyncio.ensure_future(queue.submit("b"))
+        await asyncio.sleep(0.01)  # b waits for it
+
+        started = time.monotonic()
+        with pytest.raises(QueueFull):
+            await queue.submit("c")
+        assert time.monotonic() - started < 0.05
+
+        assert await running == StubBackend().generate("a")
+        assert await waiting == StubBackend().generate("b")
+        return queue.stats()
+
+    stats = run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["waiting"] == stats["running"] == 0
+
+
+def test_deadline_while_waiting_for_a_slot():
+    async def scenario():
+        queue = InferenceQueue(StubBackend(latency=0.3), concurrency=1, **FAST)
+        running = asyncio.ensure_future(queue.submit("a"))
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await queue.submit("b", timeout=0.05)
+        assert time.monotonic() - started < 0.2
+        await running
+        return queue.stats()
+
+    stats = run(scenario())
+    assert stats["timedOut"] == 1
+    assert stats["completed"] == 1
+
+
+def test_zero_timeout_is_already_past():
+    async def scenario():
+        queue = InferenceQueue(StubBackend(latency=0.3), concurrency=1, timeout=10, **FAST)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await queue.submit("a", timeout=0)
+        assert time.monotonic() - started < 0.1
+        return queue
+
+    queue = run(scenario())
+    assert queue.stats()["timedOut"] == 1
+    assert not queue.slots.locked()
+
+
+def test_abandoned_call_keeps_its_slot_until_it_returns():
+    async def scenario():
+        queue = InferenceQueue(StubBackend(latency=0.3), concurrency=1, **FAST)
+        with pytest.raises(DeadlineExceeded):
+            await queue.submit("a", timeout=0.05)
+        # the model is still answering a, so the slot is still taken
+        assert queue.stats()["running"] == 1
+        assert queue.slots.locked()
+        await asyncio.sleep(0.4)
+        assert not queue.slots.locked()
+        return queue.stats()
+
+    stats = run(scenario())
+    assert stats["running"] == 0
+    assert stats["timedOut"] == 1
+
+
+def test_rate_limit_past_deadline_fails_fast():
+    async def scenario():
+        queue = InferenceQueue(StubBackend(), concurrency=2, rate=1.0, burst=1)
+        await queue.submit("a")
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await queue.submit("b", timeout=0.2)  # the next token is a second away
+        assert time.monotonic() - started < 0.1
+        return queue
+
+    queue = run(scenario())
+    assert not queue.slots.locked()  # the slot went back along with the token
+    assert queue.bucket.tokens == pytest.approx(0, abs=0.2)
+
+
+def test_batch_answers_in_order_and_fails_per_prompt():
+    async def scenario():
+        queue = InferenceQueue(StubBackend(latency=0.05), concurrency=2, max_queue=2, **FAST)
+        return await queue.submit_batch([f"prompt {i}" for i in range(6)])
+
+    answers = run(scenario())
+    refused = [answer for answer in answers if isinstance(answer, QueueFull)]
+    answered = [(i, answer) for i, answer in enumerate(answers) if isinstance(answer, str)]
+    assert refused and answered
+    assert all(answer == StubBackend().generate(f"prompt {i}") for i, answer in answered)
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+"""
+Cache of LLM agent analyses for /analyzeagent.
+
+An analysis only depends on the agent summary that goes into the prompt and on
+the prompt template, so the cache key is a hash of both: asking again about an
+agent that hasn't changed (a paused run, repeated clicks) is answered from
+memory instead of the AI service. Entries expire after a TTL and the least
+recently used ones are evicted beyond max_size.
+"""
+
+MAX_ENTRIES = 512
+TTL = 60 * 60  # seconds
+
+
+def cache_key(summary: dict, prompt_version) -> str:
+    text = json.dumps(summary, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{prompt_version}\n{text}".encode()).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, max_size=MAX_ENTRIES, ttl=TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (expires, analysis), least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """The cached analysis (marked as just used), or None."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] <= self.clock():
+            del self.entries[key]
+            self.expired += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, analysis):
+        self.entries[key] = (self.clock() + self.ttl, analysis)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evicted += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxSize": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
@@ -1,12 +1,26 @@
 import eventlet
 eventlet.monkey_patch()
+from eventlet import tpool
 from flask import Flask, render_template, jsonify, request
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, ConnectionRefusedError
 from flask_cors import CORS, cross_origin
+import os
+import re
 import time
 import threading
-from agent import Agent, Task, clamp  # Import your existing code
-from tasks import total_tasks
+from agent import Agent, Task, PeerIndex, clamp, wealth_classes  # Import your existing code
+from population import Population, BACKENDS
+from outcomes import TaskTable, batch_is_success
+from frames import DeltaEncoder, StatsWindow
+from classstats import ClassStats, REBUILD_INTERVAL
+from wire import BinaryEncoder
+from sessions import SessionPool, PoolFull
+from analysiscache import AnalysisCache, cache_key
+import perf
+from tasks import total_tasks, total_task_index
+import namegen
+import checkpoint
+import export
 import numpy as np
 import requests
 # from analyzer import call_gemini
@@ -18,41 +32,289 @@ CORS(app, resources={r"/analyzeagent": {"origins": ["http://localhost:3000", "ht
      supports_credentials=True)
 
 HISTORY_WINDOW = 10
-AI_SERVER = "http://0.0.0.0:8000/"
 
-# Simulation state
-simulation_state = {
-    'running': False,
-    'agents': [],
-    'tasks': [],
-    'round': 0,
-    'max_rounds': 50,
-    'dropouts': []
-}
+# capacity: the largest run a client can start, and the most rounds it can ask for
+MAX_AGENTS = 1_000_000
+MAX_ROUNDS = 10_000
+# bigger runs are in large-population mode: always vectorized, and clients get the
+# aggregates plus a stable sample of up to SAMPLE_PER_CLASS agents of every class
+FULL_STATE_AGENTS = 500
+SAMPLE_PER_CLASS = 200
+# agents simulated across all sessions at once
+MAX_TOTAL_AGENTS = 2_000_000
+
+# the simulation and the broadcast run at independent rates: rounds per second
+# (0 = as fast as the server can go) and agent frames per second sent to clients
+TICK_RATE = 2
+BROADCAST_FPS = 2
+MAX_TICK_RATE = 1000
+MAX_BROADCAST_FPS = 30
+AI_SERVER = "http://0.0.0.0:8000/"
+# part of the analysis cache key, bump it whenever build_prompt changes
+PROMPT_VERSION = 1
+# analyses in flight to the AI service at once (also its keep-alive connection pool size)
+ANALYSIS_WORKERS = 4
+ANALYSIS_TIMEOUT = 20
+
+# agent frame encodings a client can ask for on connect
+ENCODINGS = ("json", "binary")
+
+# seconds between sweeps for idle sessions
+REAP_INTERVAL = 60
+
+# save_checkpoint / load_checkpoint commands read and write named directories in here
+CHECKPOINT_DIR = "checkpoints"
+# start_export writes a run's per-round rows to named files in here
+EXPORT_DIR = "exports"
+# whether new sessions time their loops' phases (set_profiling switches it per session)
+PROFILING = False
+# seconds between perf_update events of a profiled session
+PERF_INTERVAL = 1.0
 
 # Define your tasks (adjust as needed)
 TASKS = total_tasks
+TASK_TABLE = TaskTable(TASKS)
+
+def new_simulation_state(sid, encoding='json'):
+    """Simulation state of one Socket.IO session, empty until its first start."""
+    return {
+        'sid': sid,
+        'encoding': encoding,
+        'num_agents': 0,
+        'evicted': None,  # why the pool last evicted this session's run, if it did
+        'running': False,
+        'agents': [],
+        'tasks': [],
+        'round': 0,
+        'max_rounds': 50,
+        'dropouts': 0,  # agents that dropped out so far (they're the dead ones, see dropout_ids)
+        'backend': 'agents',
+        'population': None,
+        'sample': None,  # ids of the agents sent to the client in large-population mode
+        'seed': None,  # seed of the current run, reported so it can be replayed
+        'rng': None,
+        'class_stats': ClassStats(),  # per-class aggregates of the living agents (agents backend)
+        'export': None,  # export.Sink getting every round's rows, if the client asked for one
+        'encoder': DeltaEncoder(HISTORY_WINDOW),
+        'binary_encoder': BinaryEncoder(TASK_TABLE, HISTORY_WINDOW),
+        'tick_rate': TICK_RATE,
+        'fps': BROADCAST_FPS,
+        'window': StatsWindow(),  # stats of the rounds the next broadcast covers
+        'profiling': PROFILING,
+        'timer': None,  # perf.TickTimer of the tick in progress while profiling
+        'perf': perf.PhaseWindow(),  # phase timings since the last perf_update
+        'generation': 0,  # bumped whenever the loops are (re)started, stale loops exit
+        'starting': False  # a 'start' is building its run in the background
+    }
 
-def initialize_simulation(num_agents=100):
-    simulation_state['agents'] = [Agent(i) for i in range(num_agents)]
-    simulation_state['tasks'] = TASKS
-    simulation_state['round'] = 0
-    simulation_state['dropouts'] = []
-    simulation_state['running'] = False
-    
-    for agent in simulation_state['agents']:
-        agent.total_tasks_attempted = 0
-        agent.total_tasks_succeeded = 0
-        agent.task_difficulty_sum = 0
-        agent.reward_history = []
-        agent.initial_rewards = agent.rewards
 
-        # NEW: rolling history buffer
-        agent.history = []
+def new_seed():
+    # 32 bits so the seed survives a round trip through JavaScript numbers
+    return int(np.random.SeedSequence().generate_state(1)[0])
 
-def record_agent_history(agent, task, outcome):
+def initialize_simulation(state, num_agents=100, backend="agents", seed=None, social_graph=False):
+    """
+    Fresh run in state; every random draw comes from one Generator seeded with seed (fresh if None).
+    social_graph gives lasting ties between agents (see socialgraph.py); only the
+    Population has them, so it makes the run vectorized whatever backend says.
+    """
+    stop_export(state)
+    state['seed'] = new_seed() if seed is None else seed
+    state['rng'] = rng = np.random.default_rng(state['seed'])
+    state['tasks'] = TASKS
+    state['num_agents'] = num_agents
+    state['evicted'] = None
+    state['round'] = 0
+    state['dropouts'] = 0
+    state['running'] = False
+    state['backend'] = backend
+    state['encoder'] = DeltaEncoder(HISTORY_WINDOW)
+    state['binary_encoder'] = BinaryEncoder(TASK_TABLE, HISTORY_WINDOW)
+    state['window'] = StatsWindow()
+    state['sample'] = None
+
+    if num_agents > FULL_STATE_AGENTS:
+        # large-population mode, only the sample keeps a history
+        state['backend'] = "vectorized"
+        population = Population(num_agents, TASKS, rng=rng, social_graph=social_graph)
+        state['sample'] = stratified_sample(population.wealth, SAMPLE_PER_CLASS, rng.spawn(1)[0])
+        population.track_history(HISTORY_WINDOW, state['sample'])
+        state['population'] = population
+        state['agents'] = []
+        state['class_stats'] = ClassStats()
+        return
+
+    if backend == "vectorized" or social_graph:
+        # the population keeps its own columns for the bookkeeping below
+        state['backend'] = "vectorized"
+        state['population'] = Population(
+            num_agents, TASKS, history_window=HISTORY_WINDOW, rng=rng, social_graph=social_graph
+        )
+        state['agents'] = []
+        state['class_stats'] = ClassStats()
+        return
+
+    state['population'] = None
+    # Agent declares the dashboard bookkeeping itself (attempt counters, reward_history,
+    # rolling history)
+    # names come from a child stream so reading them doesn't shift the simulation's draws
+    names = namegen.NamePool(rng=rng.spawn(1)[0])
+    state['agents'] = [Agent(i, rng=rng, name_pool=names) for i in range(num_agents)]
+    state['class_stats'] = ClassStats(state['agents'])
+
+def stratified_sample(wealth, per_class, rng):
+    """Sorted ids of up to per_class agents drawn from every wealth class."""
+    ids = [
+        rng.choice(members, min(per_class, len(members)), replace=False)
+        for members in (np.flatnonzero(wealth == code) for code in range(len(wealth_classes)))
+    ]
+    return np.sort(np.concatenate(ids))
+
+def release_simulation(state):
+    """Drop a session's run so the pool can reuse its room, retiring its loops."""
+    state['generation'] += 1
+    initialize_simulation(state, 0, state['backend'])
+
+def save_checkpoint(state, path):
+    """Write a session's run (agents, rolling history, RNG state, round) to directory path."""
+    meta = {
+        "kind": "app",
+        "backend": state['backend'],
+        "num_agents": state['num_agents'],
+        "round": state['round'],
+        "max_rounds": state['max_rounds'],
+        "seed": state['seed'],
+        "tick_rate": state['tick_rate'],
+        "fps": state['fps'],
+        "tasks": checkpoint.tasks_state(state['tasks']),
+        "rng": checkpoint.rng_state(state['rng']),
+    }
+    population = state['population']
+    if population is not None:
+        meta["population"], arrays = checkpoint.population_state(population)
+        arrays = checkpoint.prefixed("population", arrays)
+    else:
+        meta["agents"], arrays = checkpoint.agents_state(state['agents'], TASK_TABLE)
+        arrays = checkpoint.prefixed("agents", arrays)
+    arrays["dropouts"] = dropout_ids(state)
+    if state['sample'] is not None:
+        arrays["sample"] = state['sample']
+    checkpoint.write_checkpoint(path, meta, arrays)
+
+def restore_checkpoint(state, meta, arrays):
+    """Replace the session's run with a checkpoint read by checkpoint.read_checkpoint (paused)."""
+    state['running'] = False
+    state['generation'] += 1
+    initialize_simulation(state, 0, meta['backend'], meta['seed'])
+    state['num_agents'] = meta['num_agents']
+    state['round'] = meta['round']
+    state['max_rounds'] = meta['max_rounds']
+    state['tick_rate'] = meta['tick_rate']
+    state['fps'] = meta['fps']
+    state['rng'] = rng = checkpoint.rng_from_state(meta['rng'])
+
+    state['dropouts'] = len(arrays['dropouts'])
+    if 'population' in meta:
+        population = checkpoint.restore_population(
+            meta['population'], checkpoint.section(arrays, 'population'), state['tasks'], rng
+        )
+        state['population'] = population
+        state['sample'] = arrays.get('sample')
+    else:
+        agents = checkpoint.restore_agents(meta['agents'], checkpoint.section(arrays, 'agents'), TASK_TABLE, rng)
+        state['agents'] = agents
+        state['class_stats'] = ClassStats(agents)
+
+def dropout_ids(state):
+    """Ids of the agents that dropped out, only agents' own updates ever kill them."""
+    population = state['population']
+    if population is not None:
+        return np.flatnonzero(~population.alive)
+    return np.array([agent.id for agent in state['agents'] if not agent.alive], dtype=np.int64)
+
+def load_checkpoint(state, path):
+    meta, arrays = checkpoint.read_checkpoint(path, "app")
+    restore_checkpoint(state, meta, arrays)
+
+def named_path(directory, name, extension=""):
+    # only plain names, files never leave their directory
+    if not isinstance(name, str) or not re.fullmatch(r"[\w-]{1,64}", name):
+        return None
+    return os.path.join(directory, name + extension)
+
+def start_export(state, path, format, compress=None):
+    """Stream the rest of the run's rounds (every agent's state_summary) to path."""
+    stop_export(state)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    state['export'] = export.open_sink(path, format, compress)
+
+def stop_export(state):
+    if state['export'] is not None:
+        state['export'].close()
+        state['export'] = None
+
+def export_round(state):
+    if state['export'] is None:
+        return
+    state['export'].write(export.summary_rows(state['round'], state['agents'], state['population']))
+    if state['timer']:
+        state['timer'].lap("export")
+
+def handle_eviction(state, reason):
+    release_simulation(state)
+    print(f"Evicted session {state['sid']} ({reason})")
+    socketio.emit('simulation_evicted', {
+        'reason': reason,
+        'message': 'Session idle for too long' if reason == 'idle' else 'Paused run evicted to free memory'
+    }, to=state['sid'])
+    if reason == 'idle':
+        socketio.server.disconnect(state['sid'], namespace='/')
+
+def reap_idle_sessions():
+    while True:
+        socketio.sleep(REAP_INTERVAL)
+        sessions.evict_idle()
+
+# one simulation per connected Socket.IO session
+sessions = SessionPool(new_simulation_state, max_agents=MAX_TOTAL_AGENTS, on_evict=handle_eviction)
+# the green thread running reap_idle_sessions, started with the first connection
+reaper = None
+# /analyzeagent answers for agent summaries that were already analyzed
+analyses = AnalysisCache()
+# phase latency histograms over every profiled session, served on /metrics
+profiler = perf.Profiler()
+
+# keep-alive connections to the AI service, shared by every analysis
+ai_client = requests.Session()
+ai_client.mount(AI_SERVER, requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=ANALYSIS_WORKERS))
+# green threads the analyses wait on the AI service in; callers queue once all are busy
+analysis_pool = eventlet.GreenPool(ANALYSIS_WORKERS)
+# the AI service failing, or answering with something other than {"message": ...}
+ANALYSIS_ERRORS = (requests.RequestException, ValueError, KeyError, TypeError)
+
+def request_analysis(summary):
+    """(analysis, cached) for an agent summary, asking the AI service on a cache miss."""
+    key = cache_key(summary, PROMPT_VERSION)
+    analysis = analyses.get(key)
+    if analysis is not None:
+        return analysis, True
+    r = ai_client.post(f"{AI_SERVER}analyze", json={"prompt": build_prompt(summary)}, timeout=ANALYSIS_TIMEOUT)
+    r.raise_for_status()
+    analysis = r.json()["message"]
+    analyses.put(key, analysis)
+    return analysis, False
+
+def send_analysis(sid, agent_id, summary):
+    try:
+        analysis, cached = request_analysis(summary)
+    except ANALYSIS_ERRORS as e:
+        socketio.emit('agent_analysis', {'agent_id': agent_id, 'error': str(e)}, to=sid)
+        return
+    socketio.emit('agent_analysis', {'agent_id': agent_id, 'analysis': analysis, 'cached': cached}, to=sid)
+
+def record_agent_history(state, agent, task, outcome):
     entry = {
-        "round": simulation_state["round"],
+        "round": state["round"],
         "age": agent.age,
         "task": task.name,
         "difficulty": task.difficulty,
@@ -72,21 +334,42 @@ def record_agent_history(agent, task, outcome):
     if len(agent.history) > HISTORY_WINDOW:
         agent.history.pop(0)
 
-def run_simulation_round():
-    agents = simulation_state['agents']
-    tasks = simulation_state['tasks']
-    
-    print(f"Running round {simulation_state['round']} with {len(agents)} agents")
+def run_simulation_round(state):
+    agents = state['agents']
     
-    for agent in agents:
-        if not agent.alive:
-            continue
-            
-        chosen_task = agent.choose_task(tasks)
-        outcome = chosen_task.is_success(agent)
+    population = state['population']
+    if population is not None:
+        print(f"Running round {state['round']} with {len(population)} agents (vectorized)")
+        dropped = population.step(interact=True, insolvency_dropout=False, timer=state['timer'])
+        state['dropouts'] += len(dropped)
+        export_round(state)
+        state['round'] += 1
+        return
+
+    print(f"Running round {state['round']} with {len(agents)} agents")
+
+    # an agent's choice and outcome only depend on its own state, so evaluate the round in one batch
+    timer = state['timer']
+    acting = [agent for agent in agents if agent.alive]
+    chosen_tasks = [agent.choose_task(total_task_index) for agent in acting]
+    if timer:
+        timer.lap("choose")
+    outcomes = batch_is_success(acting, chosen_tasks, TASK_TABLE, state['rng'])
+    if timer:
+        timer.lap("outcome")
+    peers = PeerIndex(agents, state['rng'])
+    class_stats = state['class_stats']
+    if timer:
+        timer.lap("peers")
+
+    for agent, chosen_task, outcome in zip(acting, chosen_tasks, outcomes):
+        # out of the class aggregates while it changes, back in afterwards if still alive
+        class_stats.remove(agent)
 
         # NEW: record history
-        record_agent_history(agent, chosen_task, outcome)
+        record_agent_history(state, agent, chosen_task, outcome)
+        if timer:
+            timer.lap("history")
         
         # Existing tracking
         agent.total_tasks_attempted += 1
@@ -96,47 +379,152 @@ def run_simulation_round():
         agent.reward_history.append(agent.rewards)
         
         agent.update(outcome)
-        agent.interact(agents)
+        if not agent.alive:
+            # everyone acting was alive at the start of the round, so this is a fresh dropout
+            peers.remove(agent)
+            state['dropouts'] += 1
+        if timer:
+            timer.lap("update")
+        agent.interact(peers)
         agent.age += 1
-        
-        if not agent.alive and agent not in simulation_state['dropouts']:
-            simulation_state['dropouts'].append(agent)
+        if agent.alive:
+            class_stats.add(agent)
+        if timer:
+            timer.lap("interact")
     
-    simulation_state['round'] += 1
+    if state['round'] % REBUILD_INTERVAL == REBUILD_INTERVAL - 1:
+        class_stats.rebuild(agents)
+    export_round(state)
+    state['round'] += 1
+
+def start_loops(state):
+    """Start the session's simulation and broadcast loops, retiring any still running from before."""
+    state['generation'] += 1
+    generation = state['generation']
+    for target in (simulation_loop, broadcast_loop):
+        thread = threading.Thread(target=target, args=(state, generation))
+        thread.daemon = True
+        thread.start()
 
-def simulation_loop():
+def current_loop(state, generation):
+    return state['running'] and state['generation'] == generation
+
+def simulation_loop(state, generation):
     print("Simulation loop started!")
-    while simulation_state['running']:
-        if simulation_state['round'] >= simulation_state['max_rounds']:
-            simulation_state['running'] = False
-            socketio.emit('simulation_complete', {'message': 'Simulation finished'})
+    while current_loop(state, generation):
+        if state['round'] >= state['max_rounds']:
+            state['running'] = False
             break
-        
-        run_simulation_round()
-        
-        agent_data = get_agent_data()
-        print(f"Emitting agent_update with {len(agent_data)} agents")
-        
-        socketio.emit('agent_update', {
-            'type': 'agent_update',
-            'agents': agent_data
-        })
-        
-        stats = calculate_stats()
-        print(f"Stats: Round {stats['round']}, Alive: {stats['alive']}")
-        
-        socketio.emit('stats_update', {
-            'type': 'stats_update',
-            'stats': stats
-        })
-        
-        socketio.sleep(0.5)
 
-def get_agent_data():
-    """Serialize agent data for frontend with additional metrics"""
+        started = time.perf_counter()
+        state['timer'] = timer = perf.TickTimer(perf.TICK_PHASES) if state['profiling'] else None
+        run_simulation_round(state)
+        state['window'].add(calculate_stats(state))
+        if timer:
+            timer.lap("stats")
+            profiler.observe(timer, "tick")
+            state['perf'].add(timer, "tick")
+            state['timer'] = None
+
+        # always yield, even unthrottled, so the broadcaster and socket handlers get to run
+        tick_rate = state['tick_rate']
+        delay = 1 / tick_rate - (time.perf_counter() - started) if tick_rate else 0
+        socketio.sleep(max(delay, 0))
+
+def broadcast_loop(state, generation):
+    """Send the latest state at the broadcast rate, one frame for however many rounds ran."""
+    while state['generation'] == generation:
+        socketio.sleep(1 / state['fps'])
+        if state['generation'] != generation:
+            break
+        publish_frame(state)
+        if not state['running']:
+            break
+
+    if state['sid'] in sessions:
+        # a finished or paused run starts its idle clock now, not at the last command
+        sessions.touch(state['sid'])
+    if state['generation'] == generation and state['round'] >= state['max_rounds']:
+        socketio.emit('simulation_complete', {'message': 'Simulation finished'}, to=state['sid'])
+
+def publish_frame(state):
+    """Send the session's agents and stats if any round ran since the last frame."""
+    window = state['window']
+    stats = window.latest()
+    if stats is None:
+        return
+
+    timer = perf.TickTimer(perf.FRAME_PHASES) if state['profiling'] else None
+    broadcast_agents(state, timer)
+    print(f"Stats: Round {stats['round']}, Alive: {stats['alive']} ({len(window)} rounds in frame)")
+    summary = window.flush()
+    if timer:
+        timer.lap("serialize")
+    socketio.emit('stats_update', {
+        'type': 'stats_update',
+        'stats': stats,
+        'window': summary
+    }, to=state['sid'])
+    if timer:
+        timer.lap("emit")
+        profiler.observe(timer, "frame")
+        state['perf'].add(timer, "frame")
+        if state['perf'].age() >= PERF_INTERVAL:
+            send_perf_update(state)
+
+def send_perf_update(state):
+    socketio.emit('perf_update', {'type': 'perf_update', **state['perf'].flush()}, to=state['sid'])
+
+def broadcast_agents(state, timer=None):
+    """Send the session's agents to its client, in the encoding it negotiated."""
+    if state['encoding'] == 'binary':
+        # binary frames carry every agent
+        frame = state['binary_encoder'].encode(get_agent_data(state))
+        if timer:
+            timer.lap("serialize")
+        print(f"Emitting agent_binary frame {frame['frame']} ({len(frame['data'])} bytes)")
+        socketio.emit('agent_binary', frame, to=state['sid'])
+        if timer:
+            timer.lap("emit")
+        return
+
+    # JSON deltas only need agents alive in the last frame
+    encoder = state['encoder']
+    agent_data = get_agent_data(state, encoder.live_ids())
+    frame = encoder.encode(agent_data)
+    if timer:
+        timer.lap("serialize")
+    print(f"Emitting {frame['type']} frame {frame['frame']} with {len(agent_data)} agents")
+    socketio.emit(frame['type'], frame, to=state['sid'])
+    if timer:
+        timer.lap("emit")
+
+def send_keyframe(state):
+    """Full agent state to the session's client, in its encoding."""
+    if state['encoding'] == 'binary':
+        # through encode so the next frame only sends history logged after this keyframe
+        emit('agent_binary', state['binary_encoder'].encode(get_agent_data(state), keyframe=True))
+    else:
+        # deltas only make sense on top of a keyframe
+        emit('agent_update', current_keyframe(state))
+
+def get_agent_data(state, ids=None):
+    """
+    Serialize agent data for frontend with additional metrics (all agents / the
+    sample, or just ids)
+    """
+    if ids is None:
+        ids = state['sample']
+    if state['population'] is not None:
+        return state['population'].agent_data(None if ids is None else np.asarray(ids, dtype=int))
+
+    agents = state['agents']
+    if ids is not None:
+        agents = [agents[i] for i in ids]
+
     agent_list = []
     
-    for agent in simulation_state['agents']:
+    for agent in agents:
         # Calculate additional metrics
         avg_task_difficulty = (
             agent.task_difficulty_sum / agent.total_tasks_attempted 
@@ -168,12 +556,12 @@ def get_agent_data():
             "age": agent.age,
             "class": agent.wealth,
             "alive": agent.alive,
-            "talent": agent.talent.item() if isinstance(agent.talent, np.floating) else agent.talent,
-            "money": agent.rewards.item() if isinstance(agent.rewards, np.floating) else agent.rewards,
-            "confidence": agent.identity.confidence.item() if isinstance(agent.identity.confidence, np.floating) else agent.identity.confidence,
-            "competence": agent.identity.competence.item() if isinstance(agent.identity.competence, np.floating) else agent.identity.competence,
-            "aspiration": agent.identity.aspiration.item() if isinstance(agent.identity.aspiration, np.floating) else agent.identity.aspiration,
-            "risk tolerance": agent.identity.risk_tolerance.item() if isinstance(agent.identity.risk_tolerance, np.floating) else agent.identity.risk_tolerance,
+            "talent": agent.talent,
+            "money": agent.rewards,
+            "confidence": agent.identity.confidence,
+            "competence": agent.identity.competence,
+            "aspiration": agent.identity.aspiration,
+            "risk tolerance": agent.identity.risk_tolerance,
             "last task": agent.last_task,
             "succeeded last task?": agent.last_task_succeeded,
             
@@ -186,13 +574,26 @@ def get_agent_data():
             "initial_rewards": float(agent.initial_rewards),
             
             # Agent history for trajectory graph - ADD THIS LINE
-            "history": agent.history if hasattr(agent, 'history') else []
+            "history": agent.history
         }
         
         agent_list.append(agent_data)
     
     return agent_list
 
+def current_keyframe(state):
+    """Full agent list matching the last broadcast frame, for a client that needs to (re)sync."""
+    frame = state['encoder'].keyframe()
+    if frame is None:
+        # nothing broadcast yet, and the next broadcast is a keyframe anyway
+        frame = {
+            'type': 'agent_update',
+            'keyframe': True,
+            'frame': 0,
+            'agents': get_agent_data(state)
+        }
+    return frame
+
 def summarize_agent_for_llm(agent):
     """
     Produces a compact, narrative-ready summary of an agent's recent life trajectory.
@@ -298,71 +699,41 @@ def build_prompt(summary_payload):
 
 
 
-def calculate_stats():
+def calculate_stats(state):
     """Calculate statistics for the current round"""
-    agents = simulation_state['agents']
-    alive_agents = [a for a in agents if a.alive]
-    
+    population = state['population']
+    if population is not None:
+        alive = population.alive
+        class_stats = ClassStats.from_columns(population.wealth[alive], [
+            population.confidence[alive],
+            population.competence[alive],
+            population.aspiration[alive],
+            population.risk_tolerance[alive],
+            population.rewards[alive],
+        ])
+    else:
+        # kept up to date by run_simulation_round
+        class_stats = state['class_stats']
+
     stats = {
-        'round': simulation_state['round'],
-        'alive': len(alive_agents),
-        'dropouts': len(simulation_state['dropouts']),
-        'avgConfidence': {
-            'Low': 0,
-            'Middle': 0,
-            'High': 0
-        },
-        'avgCompetence': {
-            'Low': 0,
-            'Middle': 0,
-            'High': 0
-        },
-        'avgAspiration': {
-            'Low': 0,
-            'Middle': 0,
-            'High': 0
-        },
-        'avgRiskTolerance': {
-            'Low': 0,
-            'Middle': 0,
-            'High': 0
-        },
-        'avgMoney': {
-            'Low': 0,
-            'Middle': 0,
-            'High': 0
-        }
+        'round': state['round'],
+        'alive': class_stats.alive(),
+        'dropouts': state['dropouts'],
+        'population': state['num_agents'],
+        'sampled': len(state['sample']) if state['sample'] is not None else None,
     }
-    
-    # Calculate averages by class
-    for wealth_class in ['Low', 'Middle', 'High']:
-        class_agents = [a for a in alive_agents if a.wealth == wealth_class]
-        if class_agents:
-            # Confidence
-            avg_conf = sum(a.identity.confidence for a in class_agents) / len(class_agents)
-            stats['avgConfidence'][wealth_class] = float(avg_conf)
-            
-            # Competence
-            avg_comp = sum(a.identity.competence for a in class_agents) / len(class_agents)
-            stats['avgCompetence'][wealth_class] = float(avg_comp)
-            
-            # Aspiration
-            avg_asp = sum(a.identity.aspiration for a in class_agents) / len(class_agents)
-            stats['avgAspiration'][wealth_class] = float(avg_asp)
-            
-            # Risk Tolerance
-            avg_risk = sum(a.identity.risk_tolerance for a in class_agents) / len(class_agents)
-            stats['avgRiskTolerance'][wealth_class] = float(avg_risk)
-            
-            # Money
-            avg_money = sum(a.rewards for a in class_agents) / len(class_agents)
-            stats['avgMoney'][wealth_class] = float(avg_money)
-    
-    return stats
+    # per-class 'avg*' means and 'var*' variances of the living agents
+    return class_stats.fill(stats)
+
 
+def find_agent_by_id(state, agent_id: int):
+    population = state['population']
+    if population is not None:
+        if 0 <= agent_id < len(population):
+            return population.agent(agent_id)
+        return None
 
-def find_agent_by_id(agent_id: int):
-    for a in simulation_state['agents']:
+    for a in state['agents']:
         if a.id == agent_id:
             return a
     return None
@@ -390,95 +761,256 @@ def analyze_agent():
 
     if agent_id is None:
         return jsonify({"error": "agent_id is required"}), 400
+    # ids are JSON integers (bool is an int subclass, but not an id)
+    if not isinstance(agent_id, int) or isinstance(agent_id, bool):
+        return jsonify({"error": "agent_id must be an integer"}), 400
 
-    agent = find_agent_by_id(agent_id)
+    # agents belong to the Socket.IO session that runs them
+    state = sessions.get(payload.get("session_id"))
+    if state is None:
+        return jsonify({"error": "session_id of a connected simulation is required"}), 400
+
+    agent = find_agent_by_id(state, agent_id)
     if agent is None:
         return jsonify({"error": f"Agent {agent_id} not found"}), 404
 
     summary = summarize_agent_for_llm(agent)
-    prompt = build_prompt(summary)
 
     try:
-        r = requests.post(f"{AI_SERVER}analyze", json={"prompt": prompt}, timeout=20)
-        r.raise_for_status()
-        response = r.json()
-    except requests.RequestException as e:
+        # waits on the AI service in the analysis pool, so the simulation loops keep ticking
+        analysis, cached = analysis_pool.spawn(request_analysis, summary).wait()
+    except ANALYSIS_ERRORS as e:
         return jsonify({"error": str(e)}), 502
 
     return jsonify({
         "agent_id": agent_id,
-        "analysis": response["message"]
+        "analysis": analysis,
+        "cached": cached
+    })
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Phase latency histograms and session gauges in the Prometheus text format."""
+    text = perf.prometheus_text(profiler, {
+        "simulation_sessions": ("Connected Socket.IO sessions", len(sessions)),
+        "simulation_agents": ("Agents held by all sessions", sessions.total_agents()),
+        "simulation_profiled_sessions": ("Sessions with profiling on",
+                                         sum(state['profiling'] for state in sessions.sessions.values())),
+        "simulation_analysis_cache_entries": ("Cached agent analyses", len(analyses)),
     })
+    return text, 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route("/analyzeagent/cache", methods=["GET"])
+@cross_origin(origins=["http://localhost:3000","http://127.0.0.1:3000"])
+def analysis_cache_stats():
+    return jsonify(analyses.stats())
 
 @socketio.on('connect')
-def handle_connect():
-    print('Client connected')
-    emit('connected', {'message': 'Connected to simulation server'})
+def handle_connect(auth=None):
+    global reaper
+    # auth is whatever the client sent, only a dict can name an encoding
+    encoding = auth.get('encoding', 'json') if isinstance(auth, dict) else 'json'
+    if encoding not in ENCODINGS:
+        raise ConnectionRefusedError(f"Unknown encoding {encoding!r}, expected one of {', '.join(ENCODINGS)}")
+    try:
+        state = sessions.open(request.sid, encoding=encoding)
+    except PoolFull as e:
+        raise ConnectionRefusedError(str(e))
+    if reaper is None:
+        reaper = socketio.start_background_task(reap_idle_sessions)
+
+    print(f'Client connected ({encoding} frames, {len(sessions)} sessions)')
+    emit('connected', {'message': 'Connected to simulation server', 'encoding': encoding})
+    send_keyframe(state)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print('Client disconnected')
-    simulation_state['running'] = False
+    state = sessions.close(request.sid)
+    if state is not None:
+        stop_export(state)
+
+def set_speed(state, tick_rate, fps):
+    # tick_rate 0 runs rounds back to back, the broadcast always has some rate
+    state['tick_rate'] = max(0.0, min(MAX_TICK_RATE, float(tick_rate)))
+    state['fps'] = max(0.1, min(MAX_BROADCAST_FPS, float(fps)))
+
+def start_simulation(state, num_agents, num_rounds, backend, seed, social_graph):
+    """Background half of 'start': build the run in a worker thread, then start its loops."""
+    # retire the old run's loops before its state gets replaced underneath them
+    state['generation'] += 1
+    try:
+        tpool.execute(initialize_simulation, state, num_agents, backend, seed, social_graph)
+    finally:
+        state['starting'] = False
+    if state['sid'] not in sessions:
+        return  # disconnected while it was building
+    print(f"Starting simulation with {num_agents} agents and {num_rounds} rounds ({state['backend']} backend)")
+    state['max_rounds'] = num_rounds
+    state['running'] = True
+    
+    # Start simulation and broadcast loops in background threads
+    start_loops(state)
+    
+    socketio.emit('simulation_started', {
+        'message': f'Simulation started with {num_agents} agents for {num_rounds} rounds',
+        'seed': state['seed'],
+        'backend': state['backend'],
+        # only the vectorized backend has a social graph
+        'socialGraph': state['population'] is not None and state['population'].graph is not None,
+        # large-population runs only send sampleSize of their agents
+        'large': state['sample'] is not None,
+        'sampleSize': len(state['sample']) if state['sample'] is not None else num_agents
+    }, to=state['sid'])
+
+def claim_agents(state, num_agents):
+    """Reserve room for num_agents in the pool, telling the client if there isn't any."""
+    try:
+        sessions.reserve(state['sid'], num_agents)
+    except PoolFull as e:
+        emit('simulation_error', {'message': str(e)})
+        return False
+    return True
 
 @socketio.on('message')
 def handle_message(data):
     """Handle incoming WebSocket messages"""
+    state = sessions.get(request.sid)
+    if state is None:
+        emit('simulation_error', {'message': 'Session expired, reconnect to start a new one'})
+        return
+
     command = data.get('command')
     
+    if state['starting']:
+        emit('simulation_error', {'message': 'Still building the last run, try again in a moment'})
+        return
+
     if command == 'start':
         params = data.get('params', {})
-        num_agents = params.get('num_agents', 100)
-        num_rounds = params.get('num_rounds', 50)
+        backend = params.get('backend', 'agents')
+        seed = params.get('seed')
+        social_graph = bool(params.get('social_graph'))
         
         # Validate inputs
-        num_agents = max(1, min(500, int(num_agents)))  # Clamp between 1 and 500
-        num_rounds = max(1, min(200, int(num_rounds)))  # Clamp between 1 and 200
-        
-        print(f"Starting simulation with {num_agents} agents and {num_rounds} rounds")
-        
-        # Initialize simulation
-        initialize_simulation(num_agents)
-        simulation_state['max_rounds'] = num_rounds
-        simulation_state['running'] = True
-        
-        # Start simulation in background thread
-        thread = threading.Thread(target=simulation_loop)
-        thread.daemon = True
-        thread.start()
-        
-        emit('simulation_started', {
-            'message': f'Simulation started with {num_agents} agents for {num_rounds} rounds'
-        })
+        try:
+            num_agents = max(1, min(MAX_AGENTS, int(params.get('num_agents', 100))))
+            num_rounds = max(1, min(MAX_ROUNDS, int(params.get('num_rounds', 50))))
+            tick_rate = float(params.get('tick_rate', state['tick_rate']))
+            fps = float(params.get('fps', state['fps']))
+        except (TypeError, ValueError, OverflowError):
+            emit('simulation_error', {'message': 'num_agents, num_rounds, tick_rate and fps have to be numbers'})
+            return
+        if backend not in BACKENDS:
+            backend = 'agents'
+        seed = int(seed) if isinstance(seed, (int, float)) and 0 <= seed < 2**32 else None
+        set_speed(state, tick_rate, fps)
+
+        state['running'] = False
+        if not claim_agents(state, num_agents):
+            return
+
+        # a large population takes seconds to build, do it off the handler
+        state['starting'] = True
+        socketio.start_background_task(start_simulation, state, num_agents, num_rounds, backend, seed, social_graph)
     
     elif command == 'pause':
-        simulation_state['running'] = False
+        state['running'] = False
         emit('simulation_paused', {'message': 'Simulation paused'})
     
     elif command == 'unpause':
-        if not simulation_state['running']:
-            simulation_state['running'] = True
-            # Restart simulation loop in background thread
-            thread = threading.Thread(target=simulation_loop)
-            thread.daemon = True
-            thread.start()
+        if state['evicted']:
+            emit('simulation_error', {'message': 'This run was evicted to free memory, start a new one'})
+        elif not state['running']:
+            state['running'] = True
+            # Restart simulation and broadcast loops in background threads
+            start_loops(state)
             emit('simulation_unpaused', {'message': 'Simulation resumed'})
     
+    elif command == 'set_speed':
+        params = data.get('params', {})
+        set_speed(state, params.get('tick_rate', state['tick_rate']), params.get('fps', state['fps']))
+        emit('speed_changed', {'tick_rate': state['tick_rate'], 'fps': state['fps']})
+
     elif command == 'reset':
-        simulation_state['running'] = False
-        initialize_simulation()
+        state['running'] = False
+        if claim_agents(state, 100):
+            initialize_simulation(state, backend=state['backend'])
+        else:
+            release_simulation(state)
         emit('simulation_reset', {'message': 'Simulation reset'})
     
-    elif command == 'get_state':
-        emit('agent_update', {
-            'type': 'agent_update',
-            'agents': get_agent_data()
+    elif command == 'save_checkpoint':
+        path = named_path(CHECKPOINT_DIR, data.get('params', {}).get('name'))
+        if path is None:
+            emit('simulation_error', {'message': 'Checkpoint names are letters, digits, _ and - only'})
+            return
+        save_checkpoint(state, path)
+        emit('checkpoint_saved', {'name': os.path.basename(path), 'round': state['round']})
+
+    elif command == 'load_checkpoint':
+        path = named_path(CHECKPOINT_DIR, data.get('params', {}).get('name'))
+        try:
+            meta, arrays = checkpoint.read_checkpoint(path or "", "app")
+        except checkpoint.CheckpointError as e:
+            emit('simulation_error', {'message': str(e)})
+            return
+        if not claim_agents(state, meta['num_agents']):
+            return
+        restore_checkpoint(state, meta, arrays)
+        emit('checkpoint_loaded', {'round': state['round'], 'max_rounds': state['max_rounds'], 'seed': state['seed']})
+        send_keyframe(state)
+        emit('stats_update', {
+            'type': 'stats_update',
+            'stats': calculate_stats(state)
         })
+
+    elif command == 'start_export':
+        params = data.get('params', {})
+        format = params.get('format', 'jsonl')
+        compress = 'gzip' if params.get('compress') and format != 'parquet' else None
+        if format not in export.FORMATS:
+            emit('simulation_error', {'message': f"Export formats are {', '.join(export.FORMATS)}"})
+            return
+        path = named_path(EXPORT_DIR, params.get('name'), f".{format}" + (".gz" if compress else ""))
+        if path is None:
+            emit('simulation_error', {'message': 'Export names are letters, digits, _ and - only'})
+            return
+        try:
+            start_export(state, path, format, compress)
+        except ImportError as e:
+            emit('simulation_error', {'message': str(e)})
+            return
+        emit('export_started', {'file': os.path.basename(path), 'round': state['round']})
+
+    elif command == 'stop_export':
+        sink = state['export']
+        stop_export(state)
+        emit('export_stopped', {'rows': sink.rows if sink is not None else 0})
+
+    elif command == 'analyze_agent':
+        # answered with an 'agent_analysis' event once the AI service replies
+        agent_id = data.get('params', {}).get('agent_id')
+        valid = isinstance(agent_id, int) and not isinstance(agent_id, bool)
+        agent = find_agent_by_id(state, agent_id) if valid else None
+        if agent is None:
+            emit('agent_analysis', {'agent_id': agent_id, 'error': f'Agent {agent_id} not found'})
+            return
+        # summarized now, so the analysis is of the agent as the client saw it
+        analysis_pool.spawn_n(send_analysis, state['sid'], agent_id, summarize_agent_for_llm(agent))
+
+    elif command == 'set_profiling':
+        state['profiling'] = bool(data.get('params', {}).get('enabled'))
+        state['perf'].clear()
+        emit('profiling_changed', {'enabled': state['profiling']})
+
+    elif command == 'get_state':
+        send_keyframe(state)
         emit('stats_update', {
             'type': 'stats_update',
-            'stats': calculate_stats()
+            'stats': calculate_stats(state)
         })
 
 if __name__ == '__main__':
-    initialize_simulation()
     print("Starting simulation server on http://localhost:5000")
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
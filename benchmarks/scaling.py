@@ -0,0 +1,226 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agent import Agent, PeerIndex
+from loop import Simulation
+from outcomes import TaskTable, batch_is_success
+from tasks import total_tasks, total_task_index
+import namegen
+
+"""
+Scaling benchmark for the simulation hot paths.
+
+Every case handles each of N agents once per call (one "agent-round"), at
+N = 100 ... 100k. It reports throughput in agent-rounds per second (best
+call out of those fitting in --min-time) and the peak memory traced during
+one extra call.
+
+    python benchmarks/scaling.py --output results.json
+    python benchmarks/scaling.py --baseline benchmarks/baseline.json   # exits 1 on regressions
+    python benchmarks/scaling.py --save-baseline                        # refresh the stored baseline
+
+The app.py cases run last: importing app monkey-patches the process with
+eventlet, which is how those paths run in the server (and slows numpy's
+Generator down a little), but shouldn't affect the other cases.
+"""
+
+SIZES = (100, 1000, 10_000, 100_000)
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+SEED = 0
+MIN_TIME = 0.5   # seconds of timed calls per case and size
+MAX_CALLS = 5
+TOLERANCE = 0.2  # throughput drop vs the baseline that counts as a regression
+
+
+def make_agents(n, rng):
+    names = namegen.NamePool(rng=rng.spawn(1)[0])
+    return [Agent(i, rng=rng, name_pool=names) for i in range(n)]
+
+
+# case setup: (n, rng) -> the function to time; run in this order
+def agent_init(n, rng):
+    return lambda: make_agents(n, rng)
+
+
+def choose_task(n, rng):
+    agents = make_agents(n, rng)
+    return lambda: [agent.choose_task(total_task_index) for agent in agents]
+
+
+def is_success(n, rng):
+    agents = make_agents(n, rng)
+    tasks = [agent.choose_task(total_task_index) for agent in agents]
+    return lambda: [task.is_success(agent) for agent, task in zip(agents, tasks)]
+
+
+def update(n, rng):
+    agents = make_agents(n, rng)
+    tasks = [agent.choose_task(total_task_index) for agent in agents]
+    outcomes = batch_is_success(agents, tasks, TaskTable(total_tasks), rng)
+    return lambda: [agent.update(outcome) for agent, outcome in zip(agents, outcomes)]
+
+
+def interact(n, rng):
+    agents = make_agents(n, rng)
+    peers = PeerIndex(agents, rng)
+    return lambda: [agent.interact(peers) for agent in agents]
+
+
+def simulation_step(backend):
+    def setup(n, rng):
+        sim = Simulation(n, total_tasks, max_steps=50, backend=backend, retention="last", keep=2, rng=rng)
+        return sim.step
+    return setup
+
+
+def app_state(n, rng, backend, social_graph=False):
+    import app
+    state = app.new_simulation_state("benchmark")
+    # every agent in full state as the case names say, not large-population mode's sample
+    threshold, app.FULL_STATE_AGENTS = app.FULL_STATE_AGENTS, max(n, app.FULL_STATE_AGENTS)
+    try:
+        app.initialize_simulation(state, n, backend, seed=int(rng.integers(2**32)), social_graph=social_graph)
+    finally:
+        app.FULL_STATE_AGENTS = threshold
+    assert state['backend'] == backend and state['sample'] is None
+    return app, state
+
+
+def run_simulation_round(backend, social_graph=False):
+    def setup(n, rng):
+        app, state = app_state(n, rng, backend, social_graph)
+        state['max_rounds'] = 10**9
+        return lambda: app.run_simulation_round(state)
+    return setup
+
+
+def get_agent_data(backend):
+    def setup(n, rng):
+        app, state = app_state(n, rng, backend)
+        app.run_simulation_round(state)
+        return lambda: app.get_agent_data(state)
+    return setup
+
+
+def calculate_stats(backend):
+    def setup(n, rng):
+        app, state = app_state(n, rng, backend)
+        app.run_simulation_round(state)
+        return lambda: app.calculate_stats(state)
+    return setup
+
+
+CASES = {
+    "Agent.__init__": agent_init,
+    "Agent.choose_task": choose_task,
+    "Task.is_success": is_success,
+    "Agent.update": update,
+    "Agent.interact": interact,
+    "Simulation.step[agents]": simulation_step("agents"),
+    "Simulation.step[vectorized]": simulation_step("vectorized"),
+    "app.run_simulation_round[agents]": run_simulation_round("agents"),
+    "app.run_simulation_round[vectorized]": run_simulation_round("vectorized"),
+    "app.run_simulation_round[graph]": run_simulation_round("vectorized", social_graph=True),
+    "app.get_agent_data[agents]": get_agent_data("agents"),
+    "app.get_agent_data[vectorized]": get_agent_data("vectorized"),
+    "app.calculate_stats[agents]": calculate_stats("agents"),
+    "app.calculate_stats[vectorized]": calculate_stats("vectorized"),
+}
+
+
+def measure(call, min_time=MIN_TIME, max_calls=MAX_CALLS):
+    """(best seconds per call, peak traced MB of one more call)."""
+    times = []
+    while not times or (sum(times) < min_time and len(times) < max_calls):
+        started = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 2**20
+
+
+def run(cases, sizes, min_time=MIN_TIME, log=print):
+    results = []
+    for case in cases:
+        for n in sizes:
+            # app's round printouts would drown the report
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    call = CASES[case](n, np.random.default_rng(SEED))
+                    seconds, peak_mb = measure(call, min_time)
+                finally:
+                    sys.stdout = stdout
+            result = {"case": case, "n": n, "seconds": seconds, "throughput": n / seconds, "peak_mb": peak_mb}
+            results.append(result)
+            log(f"{case:<38}{n:>8}{result['throughput']:>16,.0f}{peak_mb:>10.1f}")
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Lines for the (case, n) pairs whose throughput fell more than tolerance below baseline."""
+    before = {(r["case"], r["n"]): r["throughput"] for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        reference = before.get((result["case"], result["n"]))
+        if reference and result["throughput"] < reference * (1 - tolerance):
+            regressions.append(
+                f"{result['case']} N={result['n']}: {result['throughput']:,.0f}/s vs {reference:,.0f}/s baseline "
+                f"({result['throughput'] / reference - 1:+.0%})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and peak memory of the simulation hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES), metavar="CASE")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME)
+    parser.add_argument("--output", help="write the results as JSON here")
+    parser.add_argument("--baseline", help="compare against this results file, exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true", help=f"also write the results to {BASELINE}")
+    args = parser.parse_args()
+
+    print(f"{'case':<38}{'N':>8}{'agent-rounds/s':>16}{'peak MB':>10}")
+    results = run(args.cases, args.sizes, args.min_time)
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    for path in filter(None, (args.output, BASELINE if args.save_baseline else None)):
+        with open(path, "w") as out:
+            json.dump(report, out, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import each entry
+point, and (with --profile) which imports that time goes to.
+
+    python benchmarks/startup.py --runs 5 --profile
+
+Every run is a new process (python -X importtime -c "import <module>"), so
+nothing is cached between runs except the OS page cache and .pyc files.
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (directory relative to the repo, module to import)
+TARGETS = {
+    "interpreter": ("", None),
+    "simulation server": ("", "app"),
+    "headless simulation": ("", "loop"),
+    "ensemble runner": ("", "ensemble"),
+    "ai-service": ("ai-service", "main"),
+}
+
+
+def run_once(directory, module):
+    """(wall seconds, importtime stderr), or raises CalledProcessError if the import fails."""
+    code = f"import {module}" if module else "pass"
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.join(ROOT, directory),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - started, result.stderr
+
+
+def parse_importtime(stderr):
+    """[(self us, cumulative us, module)] for every line -X importtime printed."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((int(self_us), int(cumulative_us), name.strip()))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time of each entry point from a cold interpreter")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--profile", action="store_true", help="list the slowest imports of each target")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'target':<22}{'median ms':>10}{'min ms':>10}")
+    for name, (directory, module) in TARGETS.items():
+        times = []
+        try:
+            for _ in range(args.runs):
+                seconds, stderr = run_once(directory, module)
+                times.append(seconds)
+        except subprocess.CalledProcessError as e:
+            error = e.stderr.strip().splitlines()[-1] if e.stderr.strip() else f"exit {e.returncode}"
+            print(f"{name:<22}  failed: {error}")
+            continue
+        print(f"{name:<22}{statistics.median(times) * 1e3:>10.0f}{min(times) * 1e3:>10.0f}")
+
+        if args.profile and module:
+            imports = parse_importtime(stderr)
+            for self_us, cumulative_us, imported in sorted(imports, reverse=True)[:args.top]:
+                print(f"    {self_us / 1e3:8.1f} ms self {cumulative_us / 1e3:8.1f} ms total  {imported}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import json
+import os
+import shutil
+import numpy as np
+import namegen
+from agent import Agent, Identity, Task, wealth_classes, risk_classes
+from outcomes import TaskTable
+from population import Population
+from socialgraph import SocialGraph
+from history import HistoryStore, DiskHistoryStore, STATIC
+
+"""
+Checkpoints of a running simulation.
+
+A checkpoint is a directory: one .npy file per array plus meta.json for the
+scalars, task list and RNG states. Arrays are loaded with mmap_mode="c"
+(copy-on-write), so restoring a vectorized Population only maps the files and
+pages come in as the next rounds touch them. Agent objects (the "agents"
+backend) are rebuilt from the same columns in one pass.
+
+Array files are named "<section>.<field>.npy", e.g. "population.rewards.npy"
+or "history.column.money.npy".
+"""
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def write_checkpoint(path, meta: dict, arrays: dict):
+    """Write meta + arrays to directory path, replacing an older checkpoint there."""
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(array), allow_pickle=False)
+    with open(os.path.join(tmp, META_FILE), "w") as meta_file:
+        json.dump({"format": FORMAT_VERSION, **meta}, meta_file)
+
+    # swap the finished directory in, so a crash mid-write never leaves half a checkpoint
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp, path)
+
+
+def read_checkpoint(path, kind, mmap=True):
+    """(meta, arrays) of the checkpoint at path; arrays are memory-mapped copy-on-write."""
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        raise CheckpointError(f"No checkpoint at {path!r}")
+    with open(meta_path) as meta_file:
+        meta = json.load(meta_file)
+    if meta.get("format") != FORMAT_VERSION or meta.get("kind") != kind:
+        raise CheckpointError(f"{path!r} is not a version {FORMAT_VERSION} {kind} checkpoint")
+
+    arrays = {}
+    for filename in os.listdir(path):
+        if filename.endswith(".npy"):
+            file_path = os.path.join(path, filename)
+            # empty arrays can't be mapped
+            mode = "c" if mmap and os.path.getsize(file_path) > 128 else None
+            arrays[filename[:-4]] = np.load(file_path, mmap_mode=mode, allow_pickle=False)
+    return meta, arrays
+
+
+def prefixed(prefix, arrays):
+    return {f"{prefix}.{name}": array for name, array in arrays.items()}
+
+
+def section(arrays, prefix):
+    start = len(prefix) + 1
+    return {name[start:]: array for name, array in arrays.items() if name.startswith(prefix + ".")}
+
+
+def rng_state(rng):
+    return rng.bit_generator.state
+
+
+def rng_from_state(state):
+    bit_generator = getattr(np.random, state["bit_generator"])()
+    bit_generator.state = state
+    return np.random.Generator(bit_generator)
+
+
+def tasks_state(tasks):
+    return [{field: getattr(task, field) for field in Task.__slots__} for task in tasks]
+
+
+def tasks_from_state(state):
+    return [Task(**fields) for fields in state]
+
+
+def population_state(population: Population):
+    # _names is an array too once restored, it's saved as "names" below
+    arrays = {
+        name: value for name, value in vars(population).items()
+        if isinstance(value, np.ndarray) and name != "_names"
+    }
+    if population.history_window:
+        arrays |= prefixed("history", population.history)
+    if population._names is not None:
+        arrays["names"] = np.array(population._names, dtype=str)
+    if population.graph is not None:
+        arrays |= prefixed("graph", population.graph.state())
+    meta = {
+        "size": population.size,
+        "round": population.round,
+        "history_window": population.history_window,
+        "graph": population.graph is not None,
+        "rng": rng_state(population.rng),
+        "name_rng": rng_state(population.name_rng),
+    }
+    return meta, arrays
+
+
+def restore_population(meta, arrays, tasks, rng=None):
+    """Population over the checkpoint's (mapped) columns; rng replaces the saved stream if given."""
+    population = Population.__new__(Population)
+    population.rng = rng if rng is not None else rng_from_state(meta["rng"])
+    population.name_rng = rng_from_state(meta["name_rng"])
+    population.size = meta["size"]
+    population.table = TaskTable(tasks)
+    population.round = meta["round"]
+    population.history_window = meta["history_window"]
+    population.history_row = None  # replaced below if the checkpoint only tracked some agents
+    population._names = arrays.get("names")
+    if population.history_window:
+        population.history = section(arrays, "history")
+    population.graph = None
+    if meta.get("graph"):
+        population.graph = SocialGraph.from_state(section(arrays, "graph"), population.rng)
+    for name, array in arrays.items():
+        if "." not in name and name != "names":
+            setattr(population, name, array)
+    return population
+
+
+# Agent fields stored as one column each (besides the coded / ragged ones below)
+AGENT_COLUMNS = (
+    "id", "talent", "age", "alive", "performance_estimate", "rewards", "last_task_succeeded",
+    "dropout_pressure", "social_capital", "total_tasks_attempted", "total_tasks_succeeded",
+    "task_difficulty_sum", "initial_rewards",
+)
+IDENTITY_COLUMNS = ("aspiration", "competence", "confidence", "max_confidence", "risk_tolerance")
+
+
+def ragged(lists):
+    """Flatten a list of lists into (values, offsets) with offsets[i]:offsets[i + 1] per list."""
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(values) for values in lists])
+    return [value for values in lists for value in values], offsets
+
+
+def agents_state(agents: list[Agent], table: TaskTable):
+    arrays = {column: [getattr(a, column) for a in agents] for column in AGENT_COLUMNS}
+    arrays |= {column: [getattr(a.identity, column) for a in agents] for column in IDENTITY_COLUMNS}
+    arrays["gender"] = np.array([a.gender == "male" for a in agents], dtype=np.uint8)
+    arrays["wealth"] = np.array([wealth_classes.index(a.wealth) for a in agents], dtype=np.uint8)
+    arrays["risk_class"] = np.array([risk_classes.index(a.identity.risk_class) for a in agents], dtype=np.uint8)
+    arrays["last_task"] = np.array(
+        [table.index[a.last_task] if a.last_task is not None else -1 for a in agents], dtype=np.int16
+    )
+    # "" for names nobody has read yet
+    arrays["name"] = np.array([a._name or "" for a in agents], dtype=str)
+
+    tasks_done = np.zeros((len(agents), len(table)), dtype=np.int32)
+    for i, agent in enumerate(agents):
+        for name, count in agent.tasks_done.items():
+            tasks_done[i, table.index[name]] = count
+    arrays["tasks_done"] = tasks_done
+
+    values, arrays["reward_history.offsets"] = ragged([a.reward_history for a in agents])
+    arrays["reward_history.values"] = np.array(values, dtype=float)
+
+    # app.py's rolling history: list of dicts per agent, the "task" field stored as a table row
+    entries, arrays["history.offsets"] = ragged([a.history for a in agents])
+    fields = list(entries[0]) if entries else []
+    for field in fields:
+        values = [entry[field] for entry in entries]
+        if field == "task":
+            values = [table.index[value] for value in values]
+        arrays[f"history.{field}"] = np.array(values)
+
+    meta = {"history_fields": fields}
+    pool = agents[0].name_pool if agents else None
+    if pool is not None:
+        meta["name_pool_rng"] = rng_state(pool.rng)
+        for gender, names in pool.pools.items():
+            arrays[f"name_pool.{gender}"] = np.array(names, dtype=str)
+    return meta, arrays
+
+
+def restore_agents(meta, arrays, table: TaskTable, rng):
+    """Agent objects from the checkpoint's columns, all drawing from rng."""
+    n = len(arrays["id"])
+    name_pool = None
+    if "name_pool_rng" in meta:
+        name_pool = namegen.NamePool(rng=rng_from_state(meta["name_pool_rng"]))
+        for gender in name_pool.pools:
+            name_pool.pools[gender] = arrays[f"name_pool.{gender}"].tolist()
+
+    columns = {column: arrays[column].tolist() for column in AGENT_COLUMNS + IDENTITY_COLUMNS}
+    gender = arrays["gender"].tolist()
+    wealth = arrays["wealth"].tolist()
+    risk_class = arrays["risk_class"].tolist()
+    last_task = arrays["last_task"].tolist()
+    names = arrays["name"].tolist()
+    tasks_done = arrays["tasks_done"]
+    reward_offsets = arrays["reward_history.offsets"].tolist()
+    rewards = arrays["reward_history.values"].tolist()
+    history_offsets = arrays["history.offsets"].tolist()
+    history_columns = {field: arrays[f"history.{field}"].tolist() for field in meta["history_fields"]}
+    if "task" in history_columns:
+        history_columns["task"] = [table.names[row] for row in history_columns["task"]]
+
+    agents = []
+    for i in range(n):
+        agent = Agent.__new__(Agent)
+        for column in AGENT_COLUMNS:
+            setattr(agent, column, columns[column][i])
+        identity = Identity.__new__(Identity)
+        for column in IDENTITY_COLUMNS:
+            setattr(identity, column, columns[column][i])
+        identity.risk_class = risk_classes[risk_class[i]]
+        agent.identity = identity
+        agent.rng = rng
+        agent.name_pool = name_pool
+        agent.gender = "male" if gender[i] else "female"
+        agent._name = names[i] or None
+        agent.wealth = wealth_classes[wealth[i]]
+        agent.last_task = table.names[last_task[i]] if last_task[i] >= 0 else None
+        done = np.flatnonzero(tasks_done[i])
+        agent.tasks_done = {table.names[t]: int(tasks_done[i, t]) for t in done}
+        agent.reward_history = rewards[reward_offsets[i]:reward_offsets[i + 1]]
+        agent.history = [
+            {field: values[k] for field, values in history_columns.items()}
+            for k in range(history_offsets[i], history_offsets[i + 1])
+        ]
+        agents.append(agent)
+    return agents
+
+
+def history_state(store: HistoryStore):
+    if isinstance(store, DiskHistoryStore):
+        # already on disk: the checkpoint only remembers where, and how far it got
+        store.flush()
+        return {"disk": os.path.abspath(store.path), "count": store.count, "seen": store.seen}, {}
+    arrays = {"times": store.times}
+    arrays |= prefixed("column", store.columns)
+    arrays |= {f"static.{field}": np.array(store.static[field]) for field in STATIC}
+    meta = {
+        "task_names": store.task_names,
+        "retention": store.retention,
+        "every": store.every,
+        "capacity": store.capacity,
+        "count": store.count,
+        "seen": store.seen,
+    }
+    return meta, arrays
+
+
+def restore_history(meta, arrays):
+    if "disk" in meta:
+        return DiskHistoryStore.reopen(meta["disk"], meta["count"], meta["seen"])
+    store = HistoryStore.__new__(HistoryStore)
+    # static columns stay arrays (HistoryStore.row hands out plain Python values)
+    store.static = {field: arrays[f"static.{field}"] for field in STATIC}
+    store.task_names = meta["task_names"]
+    store.n_agents = len(store.static["id"])
+    store.retention = meta["retention"]
+    store.every = meta["every"]
+    store.capacity = meta["capacity"]
+    store.count = meta["count"]
+    store.seen = meta["seen"]
+    store.times = arrays["times"]
+    store.columns = section(arrays, "column")
+    return store
@@ -0,0 +1,90 @@
+import numpy as np
+from agent import wealth_classes
+
+"""
+Running per-class aggregates of the living agents, for app.calculate_stats.
+
+For every wealth class ClassStats keeps the number of living agents and the
+sum and sum of squares of each tracked metric. The round loop removes an
+agent before it changes and adds it back afterwards (unless it dropped out),
+so a round costs O(1) per acting agent and reading means and variances costs
+O(classes). Sums that go up and down for long pick up floating point drift,
+so the owner rebuilds them from the agents every REBUILD_INTERVAL rounds.
+"""
+
+REBUILD_INTERVAL = 100
+
+# tracked metrics, in the order of values(); stats keys for their means and variances
+MEAN_KEYS = ("avgConfidence", "avgCompetence", "avgAspiration", "avgRiskTolerance", "avgMoney")
+VARIANCE_KEYS = ("varConfidence", "varCompetence", "varAspiration", "varRiskTolerance", "varMoney")
+
+CLASS_INDEX = {wealth_class: code for code, wealth_class in enumerate(wealth_classes)}
+
+
+def values(agent):
+    identity = agent.identity
+    return (identity.confidence, identity.competence, identity.aspiration, identity.risk_tolerance, agent.rewards)
+
+
+class ClassStats:
+    def __init__(self, agents=()):
+        self.rebuild(agents)
+
+    def rebuild(self, agents):
+        self.counts = [0] * len(wealth_classes)
+        self.sums = [[0.0] * len(MEAN_KEYS) for _ in wealth_classes]
+        self.squares = [[0.0] * len(MEAN_KEYS) for _ in wealth_classes]
+        for agent in agents:
+            if agent.alive:
+                self.add(agent)
+
+    @classmethod
+    def from_columns(cls, wealth, columns):
+        """
+        Aggregates straight from columns of the living agents (a Population):
+        wealth holds class codes, columns one array per metric in values() order.
+        """
+        stats = cls.__new__(cls)
+        classes = len(wealth_classes)
+        stats.counts = np.bincount(wealth, minlength=classes).tolist()
+        sums = [np.bincount(wealth, weights=column, minlength=classes) for column in columns]
+        squares = [np.bincount(wealth, weights=column * column, minlength=classes) for column in columns]
+        stats.sums = np.array(sums).T.tolist()
+        stats.squares = np.array(squares).T.tolist()
+        return stats
+
+    def add(self, agent):
+        c = CLASS_INDEX[agent.wealth]
+        self.counts[c] += 1
+        sums, squares = self.sums[c], self.squares[c]
+        for m, value in enumerate(values(agent)):
+            sums[m] += value
+            squares[m] += value * value
+
+    def remove(self, agent):
+        c = CLASS_INDEX[agent.wealth]
+        self.counts[c] -= 1
+        sums, squares = self.sums[c], self.squares[c]
+        for m, value in enumerate(values(agent)):
+            sums[m] -= value
+            squares[m] -= value * value
+
+    def alive(self):
+        return sum(self.counts)
+
+    def fill(self, stats):
+        """Write per-class means and (population) variances into a calculate_stats dict."""
+        for m, (mean_key, variance_key) in enumerate(zip(MEAN_KEYS, VARIANCE_KEYS)):
+            means = stats.setdefault(mean_key, {})
+            variances = stats.setdefault(variance_key, {})
+            for c, wealth_class in enumerate(wealth_classes):
+                n = self.counts[c]
+                if n:
+                    mean = self.sums[c][m] / n
+                    means[wealth_class] = float(mean)
+                    # clamped, cancellation can leave a tiny negative
+                    variances[wealth_class] = float(max(self.squares[c][m] / n - mean * mean, 0.0))
+                else:
+                    means[wealth_class] = 0
+                    variances[wealth_class] = 0
+        return stats
@@ -0,0 +1,130 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from agent import wealth_classes
+from loop import Simulation
+from tasks import total_tasks
+
+"""
+Monte Carlo ensembles of loop.Simulation.
+
+run_ensemble runs R independent replicates of one scenario across a process
+pool. Each replicate's Simulation draws from a Generator seeded with its own
+child of one np.random.SeedSequence, so the ensemble is reproducible from a
+single seed no matter how replicates land on workers. Workers reduce their run
+to per-round class statistics (the metrics app.calculate_stats reports) before
+returning, so agent histories never leave the worker; the parent only folds
+those small arrays into running sums.
+"""
+
+# per-class metric -> HistoryStore column it averages, named like calculate_stats
+METRICS = {
+    "avgConfidence": "confidence",
+    "avgCompetence": "competence",
+    "avgAspiration": "aspiration",
+    "avgRiskTolerance": "risk tolerance",
+    "avgMoney": "money",
+}
+
+# two-sided 95% normal quantile for the confidence band of the mean
+Z_95 = 1.96
+
+
+def replicate_stats(sim: Simulation):
+    """
+    Per-round class statistics of a finished run, from its history columns.
+
+    Returns (alive, means): alive is (rounds x classes) counts of living agents,
+    means is (rounds x metrics x classes), NaN where a class had nobody alive.
+    """
+    history = sim.history
+    classes = np.array([wealth_classes.index(c) for c in history.static["class"]])
+    onehot = classes[None, :] == np.arange(len(wealth_classes))[:, None]  # classes x agents
+
+    alive = history.column("alive").astype(float)
+    counts = alive @ onehot.T
+    means = np.empty((len(history), len(METRICS), len(wealth_classes)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for m, column in enumerate(METRICS.values()):
+            sums = (history.column(column) * alive) @ onehot.T
+            means[:, m] = sums / counts
+    return counts, means
+
+
+def run_replicate(args):
+    seed_sequence, N, tasks, steps, backend = args
+    sim = Simulation(N, tasks, max_steps=steps, backend=backend, rng=np.random.default_rng(seed_sequence))
+    sim.step_N_times(steps)
+    return replicate_stats(sim)
+
+
+class EnsembleStats:
+    """Running count / sum / sum of squares per (round, metric, class) cell."""
+    def __init__(self, rounds: int):
+        shape = (rounds, len(METRICS), len(wealth_classes))
+        self.replicates = 0
+        self.n = np.zeros(shape, dtype=np.int64)
+        self.sums = np.zeros(shape)
+        self.squares = np.zeros(shape)
+        self.alive_sums = np.zeros((rounds, len(wealth_classes)))
+        self.alive_squares = np.zeros((rounds, len(wealth_classes)))
+
+    def add(self, alive, means):
+        self.replicates += 1
+        present = ~np.isnan(means)
+        values = np.where(present, means, 0.0)
+        self.n += present
+        self.sums += values
+        self.squares += values ** 2
+        self.alive_sums += alive
+        self.alive_squares += alive ** 2
+
+    @staticmethod
+    def band(n, sums, squares, z):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sums / n
+            variance = np.maximum(squares / n - mean ** 2, 0) * n / np.maximum(n - 1, 1)
+            half = z * np.sqrt(variance / n)
+        return {"mean": mean, "low": mean - half, "high": mean + half, "n": n}
+
+    def result(self, z=Z_95):
+        """
+        {metric: {"mean", "low", "high", "n"}} with (rounds x classes) arrays,
+        plus "alive" (living agents per class) over every replicate.
+        """
+        result = {
+            metric: self.band(self.n[:, m], self.sums[:, m], self.squares[:, m], z)
+            for m, metric in enumerate(METRICS)
+        }
+        result["alive"] = self.band(
+            np.full(self.alive_sums.shape, self.replicates), self.alive_sums, self.alive_squares, z
+        )
+        return result
+
+
+def run_ensemble(replicates: int, N: int, tasks=total_tasks, steps: int = 50, backend: str = "vectorized",
+                 seed=None, max_workers: int = None, chunksize: int = None):
+    """
+    Run `replicates` independent Simulations of N agents for `steps` rounds and
+    merge their per-round class statistics, see EnsembleStats.result.
+    """
+    streams = np.random.SeedSequence(seed).spawn(replicates)
+    stats = EnsembleStats(steps + 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        workers = max_workers or os.cpu_count() or 1
+        # a few chunks per worker keeps them busy without a round trip per replicate
+        chunksize = chunksize or max(1, replicates // (workers * 4))
+        jobs = ((stream, N, tasks, steps, backend) for stream in streams)
+        for alive, means in executor.map(run_replicate, jobs, chunksize=chunksize):
+            stats.add(alive, means)
+    return stats.result()
+
+
+if __name__ == "__main__":
+    result = run_ensemble(replicates=64, N=200, steps=50, seed=0)
+    for metric in ("avgMoney", "avgConfidence", "alive"):
+        print(metric)
+        for c, wealth_class in enumerate(wealth_classes):
+            band = result[metric]
+            print(f"  {wealth_class:>6}: {band['mean'][-1, c]:.3f} "
+                  f"[{band['low'][-1, c]:.3f}, {band['high'][-1, c]:.3f}]")
@@ -0,0 +1,173 @@
+"""
+Delta-encoded agent frames for the Socket.IO broadcast.
+
+The first frame (and every KEYFRAME_INTERVAL-th one after it) is a keyframe:
+the full get_agent_data() list, sent as 'agent_update' like before. In between,
+'agent_delta' frames only carry the fields that changed for agents that were
+alive in the previous frame, the ids that dropped out since, and the history
+entries each agent logged since (more than one when a frame covers several
+rounds). Every frame is numbered; a delta names the frame it applies on top of
+("base") so a client that missed one can ask for a resync.
+"""
+
+KEYFRAME_INTERVAL = 25
+
+# fields of a get_agent_data() row that can change from round to round
+DELTA_FIELDS = (
+    "age",
+    "alive",
+    "money",
+    "confidence",
+    "competence",
+    "aspiration",
+    "risk tolerance",
+    "last task",
+    "succeeded last task?",
+    "avg_task_difficulty",
+    "failure_rate",
+    "reward_rate",
+    "task_repeatability",
+    "total_rewards",
+)
+
+
+def new_entries(cached, history):
+    """Entries of history logged after the last cached one."""
+    last_round = cached[-1]["round"] if cached else -1
+    return [entry for entry in history if entry["round"] > last_round]
+
+
+class DeltaEncoder:
+    """
+    Remembers the last broadcast frame so the next one can be sent as a delta.
+
+    The cached rows are what a client holds after applying every frame so far,
+    which is also what a newly connected client gets as its keyframe.
+    """
+    def __init__(self, history_window, keyframe_interval=KEYFRAME_INTERVAL):
+        self.history_window = history_window
+        self.keyframe_interval = keyframe_interval
+        self.frame = 0
+        self.since_keyframe = 0
+        self.rows = {}  # id -> row as of the last frame
+        self.live = []  # ids alive as of the last frame
+
+    def keyframe_due(self):
+        return not self.rows or self.since_keyframe >= self.keyframe_interval
+
+    def live_ids(self):
+        """Ids whose rows the next frame needs, None when it has to be a full keyframe."""
+        return None if self.keyframe_due() else list(self.live)
+
+    def encode(self, rows):
+        """
+        Turn fresh get_agent_data() rows into the next frame. rows must cover every
+        agent for a keyframe, and at least live_ids() otherwise (other rows are ignored).
+        """
+        self.frame += 1
+        if self.keyframe_due():
+            self.since_keyframe = 0
+            self.rows = {}
+            for row in rows:
+                self.cache(row)
+            self.live = [row["id"] for row in rows if row["alive"]]
+            return self.keyframe()
+
+        self.since_keyframe += 1
+        changes = []
+        dropped = []
+        history = {}
+        live = set(self.live)
+        for row in rows:
+            agent_id = row["id"]
+            if agent_id not in live:
+                continue
+            cached = self.rows[agent_id]
+            changed = {"id": agent_id}
+            for field in DELTA_FIELDS:
+                if row[field] != cached[field]:
+                    changed[field] = cached[field] = row[field]
+            if len(changed) > 1:
+                changes.append(changed)
+            if not row["alive"]:
+                dropped.append(agent_id)
+
+            entries = new_entries(cached["history"], row["history"])
+            if entries:
+                history[agent_id] = entries
+                cached["history"].extend(entries)
+                del cached["history"][:-self.history_window]
+
+        dropped_ids = set(dropped)
+        self.live = [agent_id for agent_id in self.live if agent_id not in dropped_ids]
+        return {
+            'type': 'agent_delta',
+            'frame': self.frame,
+            'base': self.frame - 1,
+            'changes': changes,
+            'dropped': dropped,
+            'history': history
+        }
+
+    def cache(self, row):
+        # the history list may be the agent's own rolling buffer, keep a copy
+        self.rows[row["id"]] = row | {"history": list(row["history"])}
+
+    def keyframe(self):
+        """The last broadcast state as a full frame, or None if nothing was sent yet."""
+        if not self.rows:
+            return None
+        return {
+            'type': 'agent_update',
+            'keyframe': True,
+            'frame': self.frame,
+            'agents': list(self.rows.values())
+        }
+
+
+# per-class averages in calculate_stats() that a coalesced frame reports over its rounds
+CLASS_STATS = ("avgConfidence", "avgCompetence", "avgAspiration", "avgRiskTolerance", "avgMoney")
+
+
+class StatsWindow:
+    """
+    Collects calculate_stats() for every round since the last broadcast, so a frame
+    that coalesces several rounds can still say what happened in between.
+    """
+    def __init__(self):
+        self.base_dropouts = 0
+        self.clear()
+
+    def clear(self):
+        self.stats = []
+
+    def add(self, stats):
+        self.stats.append(stats)
+
+    def __len__(self):
+        return len(self.stats)
+
+    def latest(self):
+        return self.stats[-1] if self.stats else None
+
+    def flush(self):
+        """Summary of the collected rounds (None if there are none), then start a new window."""
+        if not self.stats:
+            return None
+        first, last = self.stats[0], self.stats[-1]
+        summary = {
+            'rounds': len(self.stats),
+            'fromRound': first['round'],
+            'toRound': last['round'],
+            'dropouts': last['dropouts'] - self.base_dropouts,
+            'minAlive': min(stats['alive'] for stats in self.stats),
+        }
+        # class averages over the window (mean of the per-round averages)
+        for key in CLASS_STATS:
+            summary[key] = {
+                wealth_class: sum(stats[key][wealth_class] for stats in self.stats) / len(self.stats)
+                for wealth_class in last[key]
+            }
+        self.base_dropouts = last['dropouts']
+        self.clear()
+        return summary
@@ -0,0 +1,433 @@
+import json
+import os
+import queue
+import threading
+import numpy as np
+
+"""
+Columnar history for Simulation.log_state.
+
+Instead of one dict per agent per step, every metric is a preallocated
+(steps x agents) NumPy array. Retention decides which steps are kept:
+
+    "all":   every step (the arrays grow by doubling when full)
+    "last":  only the last `keep` steps, as a ring buffer
+    "every": every `every`-th logged step
+
+DiskHistoryStore keeps the same interface for runs too long to hold in RAM:
+the steps are streamed to append-only files and read back memory-mapped.
+"""
+
+RETENTION = ("all", "last", "every")
+
+# per-step metrics and their dtypes, keyed the way Agent.state_summary names them
+METRICS = {
+    "age": np.int32,
+    "alive": bool,
+    "money": np.float64,
+    "confidence": np.float64,
+    "competence": np.float64,
+    "aspiration": np.float64,
+    "risk tolerance": np.float64,
+    "last task": np.int16,  # index into task_names, -1 for no task yet
+    "succeeded last task?": bool,
+}
+
+# per-agent fields that never change during a run
+STATIC = ("id", "name", "gender", "class", "talent")
+
+# DiskHistoryStore: size of the chunks handed to the writer thread (whole steps,
+# at least one), and how many finished chunks may wait for it before record() blocks
+CHUNK_BYTES = 8 * 2**20
+MAX_PENDING = 2
+
+# file stem of each DiskHistoryStore column ("time" is the time axis)
+FILE_NAMES = {
+    "time": "time",
+    "age": "age",
+    "alive": "alive",
+    "money": "money",
+    "confidence": "confidence",
+    "competence": "competence",
+    "aspiration": "aspiration",
+    "risk tolerance": "risk_tolerance",
+    "last task": "last_task",
+    "succeeded last task?": "succeeded_last_task",
+}
+INFO_FILE = "history.json"
+
+
+def static_from_agents(agents):
+    return {
+        "id": [a.id for a in agents],
+        "name": [a.name for a in agents],
+        "gender": [a.gender for a in agents],
+        "class": [a.wealth for a in agents],
+        "talent": [a.talent for a in agents],
+    }
+
+
+def columns_from_agents(agents, task_index):
+    """Turn a list of Agent objects into the per-step columns a HistoryStore records."""
+    return {
+        "age": [a.age for a in agents],
+        "alive": [a.alive for a in agents],
+        "money": [a.rewards for a in agents],
+        "confidence": [a.identity.confidence for a in agents],
+        "competence": [a.identity.competence for a in agents],
+        "aspiration": [a.identity.aspiration for a in agents],
+        "risk tolerance": [a.identity.risk_tolerance for a in agents],
+        "last task": [task_index[a.last_task] if a.last_task is not None else -1 for a in agents],
+        "succeeded last task?": [a.last_task_succeeded for a in agents],
+    }
+
+
+class HistoryStore:
+    """
+    static:     per-agent fields from STATIC, one list each
+    task_names: decodes the "last task" column (a TaskTable's names)
+    """
+    def __init__(self, static: dict, task_names: list[str], retention: str = "all",
+                 keep: int = None, every: int = 1, capacity: int = 64):
+        if retention not in RETENTION:
+            raise ValueError(f"Unknown retention {retention!r}, expected one of {RETENTION}")
+        if retention == "last" and not keep:
+            raise ValueError("retention='last' needs keep > 0")
+        if every < 1:
+            raise ValueError("every must be >= 1")
+
+        self.static = static
+        self.task_names = list(task_names)
+        self.n_agents = len(static["id"])
+        self.retention = retention
+        self.every = every if retention == "every" else 1
+        self.capacity = keep if retention == "last" else capacity
+
+        self.count = 0  # steps stored so far (including ones a ring buffer overwrote)
+        self.seen = 0   # steps offered to record()
+        self.times = np.zeros(self.capacity, dtype=np.int64)
+        self.columns = {
+            metric: np.zeros((self.capacity, self.n_agents), dtype=dtype)
+            for metric, dtype in METRICS.items()
+        }
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def record(self, time, columns: dict):
+        seen = self.seen
+        self.seen += 1
+        if seen % self.every:
+            return
+
+        if self.retention != "last" and self.count == self.capacity:
+            self.grow()
+        slot = self.count % self.capacity
+        self.times[slot] = time
+        for metric, values in columns.items():
+            self.columns[metric][slot] = values
+        self.count += 1
+
+    def grow(self):
+        self.capacity *= 2
+        times = np.zeros(self.capacity, dtype=self.times.dtype)
+        times[:self.count] = self.times
+        self.times = times
+        for metric, column in self.columns.items():
+            grown = np.zeros((self.capacity, self.n_agents), dtype=column.dtype)
+            grown[:self.count] = column
+            self.columns[metric] = grown
+
+    def slots(self):
+        """Storage rows of the kept steps, oldest first."""
+        n = len(self)
+        if self.count <= self.capacity:
+            return np.arange(n)
+        return (self.count + np.arange(n)) % self.capacity
+
+    def time_axis(self):
+        return self.times[self.slots()]
+
+    def column(self, metric):
+        """(steps x agents) array of one metric over the kept steps."""
+        return self.columns[metric][self.slots()]
+
+    def trajectory(self, agent_id):
+        """Every kept step of one agent, as one array per metric plus "time"."""
+        slots = self.slots()
+        trajectory = {"time": self.times[slots]}
+        for metric, column in self.columns.items():
+            trajectory[metric] = column[slots, agent_id]
+        return trajectory
+
+    def value(self, metric, slot, agent_id):
+        return self.columns[metric][slot, agent_id].item()
+
+    def time_at(self, slot):
+        return int(self.times[slot])
+
+    def snapshot(self, slot):
+        """(time, {metric: every agent's value}) of one stored step."""
+        return int(self.times[slot]), {metric: column[slot] for metric, column in self.columns.items()}
+
+    def row(self, slot, agent_id):
+        """One logged state_summary row (with "time"), in the same key order."""
+        # static fields may be lists or (restored from a checkpoint) arrays
+        static = {field: self.static[field][agent_id] for field in STATIC}
+        static = {field: v.item() if isinstance(v, np.generic) else v for field, v in static.items()}
+        time, step = self.snapshot(slot)
+        value = lambda metric: step[metric][agent_id].item()
+        task = value("last task")
+        return {
+            "time": time,
+            "id": static["id"],
+            "name": static["name"],
+            "gender": static["gender"],
+            "age": value("age"),
+            "class": static["class"],
+            "alive": value("alive"),
+            "talent": static["talent"],
+            "money": value("money"),
+            "confidence": value("confidence"),
+            "competence": value("competence"),
+            "aspiration": value("aspiration"),
+            "risk tolerance": value("risk tolerance"),
+            "last task": self.task_names[task] if task >= 0 else None,
+            "succeeded last task?": value("succeeded last task?"),
+        }
+
+    def __getitem__(self, step):
+        """The step-th kept snapshot as state_summary rows (built on demand)."""
+        slot = self.slots()[step]
+        return [self.row(slot, agent_id) for agent_id in range(self.n_agents)]
+
+
+class DiskHistoryStore(HistoryStore):
+    """
+    HistoryStore that lives in directory path instead of RAM.
+
+    Every metric (and the time axis) is an append-only raw file of (steps x agents)
+    values. Steps are recorded into an in-memory chunk of chunk_steps rows
+    (by default as many as fit in CHUNK_BYTES); full
+    chunks are appended by a background thread while the next one fills, and
+    steps already written are read back through read-only memory maps, so
+    column() / trajectory() don't copy them. Resident memory stays at a few
+    chunks however long the run is.
+
+    Only retention "all" and "every" are supported (a ring buffer of the last
+    steps fits in memory, use HistoryStore). Call close() (or use it as a
+    context manager) to write the last partial chunk and stop the writer.
+    """
+    def __init__(self, path, static: dict, task_names: list[str], retention: str = "all", every: int = 1,
+                 chunk_steps: int = None, max_pending: int = MAX_PENDING):
+        if retention not in ("all", "every"):
+            raise ValueError(f"DiskHistoryStore supports retention 'all' or 'every', not {retention!r}")
+        if every < 1:
+            raise ValueError("every must be >= 1")
+
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.static = static
+        self.task_names = list(task_names)
+        self.n_agents = len(static["id"])
+        self.retention = retention
+        self.every = every if retention == "every" else 1
+        for field in STATIC:
+            np.save(os.path.join(path, f"static.{field}.npy"), np.array(static[field]), allow_pickle=False)
+        with open(os.path.join(path, INFO_FILE), "w") as info:
+            json.dump({"task_names": self.task_names, "n_agents": self.n_agents,
+                       "retention": self.retention, "every": self.every}, info)
+        self.start(0, 0, chunk_steps, max_pending)
+
+    @classmethod
+    def reopen(cls, path, count: int, seen: int, chunk_steps: int = None, max_pending: int = MAX_PENDING):
+        """
+        Continue a store written earlier, cut back to its first count steps
+        (e.g. to resume from a checkpoint taken at that point).
+        """
+        with open(os.path.join(path, INFO_FILE)) as info:
+            info = json.load(info)
+        store = cls.__new__(cls)
+        store.path = path
+        store.static = {field: np.load(os.path.join(path, f"static.{field}.npy")) for field in STATIC}
+        store.task_names = info["task_names"]
+        store.n_agents = info["n_agents"]
+        store.retention = info["retention"]
+        store.every = info["every"]
+        store.start(count, seen, chunk_steps, max_pending)
+        return store
+
+    def start(self, count, seen, chunk_steps, max_pending):
+        self.count = count  # steps recorded
+        self.seen = seen
+        self.flushed = count  # steps written to the files
+        self.dtypes = {"time": np.dtype(np.int64)} | {metric: np.dtype(dtype) for metric, dtype in METRICS.items()}
+        step_size = sum(self.row_size(name) for name in self.dtypes)
+        self.chunk_steps = chunk_steps or max(1, CHUNK_BYTES // step_size)
+        self.files = {}
+        for name, dtype in self.dtypes.items():
+            file = open(self.file_path(name), "r+b" if count else "wb")
+            file.truncate(count * self.row_size(name))
+            file.seek(0, os.SEEK_END)
+            self.files[name] = file
+        self.maps = {}
+        self.chunk = self.new_chunk()
+        self.fill = 0
+        self.pending = []  # chunks handed to the writer but not written yet, oldest first
+        self.lock = threading.Lock()
+        self.error = None
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.writer = threading.Thread(target=self.write_chunks, name="history-writer", daemon=True)
+        self.writer.start()
+
+    def file_path(self, name):
+        return os.path.join(self.path, f"{FILE_NAMES[name]}.bin")
+
+    def row_size(self, name):
+        return self.dtypes[name].itemsize * (1 if name == "time" else self.n_agents)
+
+    def new_chunk(self):
+        return {
+            name: np.zeros(self.chunk_steps if name == "time" else (self.chunk_steps, self.n_agents), dtype=dtype)
+            for name, dtype in self.dtypes.items()
+        }
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, time, columns: dict):
+        seen = self.seen
+        self.seen += 1
+        if seen % self.every:
+            return
+
+        chunk = self.chunk
+        chunk["time"][self.fill] = time
+        for metric, values in columns.items():
+            chunk[metric][self.fill] = values
+        self.fill += 1
+        self.count += 1
+        if self.fill == self.chunk_steps:
+            self.submit()
+
+    def submit(self):
+        """Hand the filled part of the current chunk to the writer and start a new one."""
+        if self.error is not None:
+            raise self.error
+        if not self.fill:
+            return
+        rows = {name: array[:self.fill] for name, array in self.chunk.items()}
+        with self.lock:
+            self.pending.append(rows)
+        # blocks while max_pending chunks are queued, so a slow disk slows the run
+        # instead of filling RAM
+        self.queue.put(rows)
+        self.chunk = self.new_chunk()
+        self.fill = 0
+
+    def write_chunks(self):
+        while True:
+            rows = self.queue.get()
+            if rows is None:
+                self.queue.task_done()
+                return
+            # after a failed write the files' step offsets are off, so stop writing altogether
+            if self.error is None:
+                try:
+                    for name, array in rows.items():
+                        self.files[name].write(memoryview(array))
+                        self.files[name].flush()
+                    with self.lock:
+                        self.flushed += len(rows["time"])
+                        self.pending.pop(0)
+                except OSError as e:
+                    self.error = e
+            self.queue.task_done()
+
+    def flush(self):
+        """Write every recorded step to disk and wait for it."""
+        self.submit()
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        if self.writer.is_alive():
+            self.flush()
+            self.queue.put(None)
+            self.writer.join()
+            for file in self.files.values():
+                file.close()
+
+    def mapped(self, name, steps):
+        """Read-only memory map of the first `steps` steps of a file (no copy)."""
+        shape = (steps,) if name == "time" else (steps, self.n_agents)
+        if not steps:
+            return np.zeros(shape, dtype=self.dtypes[name])
+        array = self.maps.get(name)
+        if array is None or len(array) != steps:  # the file grew since
+            array = self.maps[name] = np.memmap(self.file_path(name), dtype=self.dtypes[name], mode="r", shape=shape)
+        return array
+
+    def parts(self, name):
+        """[memory-mapped steps on disk, chunks still in memory...], oldest first."""
+        with self.lock:
+            flushed = self.flushed
+            pending = [rows[name] for rows in self.pending]
+        tail = pending + [self.chunk[name][:self.fill]] if self.fill else pending
+        return [self.mapped(name, flushed)] + tail
+
+    def step(self, name, slot):
+        for part in self.parts(name):
+            if slot < len(part):
+                return part[slot]
+            slot -= len(part)
+        raise IndexError("step out of range")
+
+    def join(self, parts):
+        # everything on disk: hand out the map itself
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def slots(self):
+        return np.arange(self.count)
+
+    def time_axis(self):
+        return self.join(self.parts("time"))
+
+    def column(self, metric):
+        return self.join(self.parts(metric))
+
+    def trajectory(self, agent_id):
+        trajectory = {"time": self.time_axis()}
+        for metric in METRICS:
+            trajectory[metric] = np.concatenate([part[:, agent_id] for part in self.parts(metric)])
+        return trajectory
+
+    def value(self, metric, slot, agent_id):
+        return self.step(metric, slot)[agent_id].item()
+
+    def time_at(self, slot):
+        return int(self.step("time", slot))
+
+    def snapshot(self, slot):
+        # every column of a step sits at the same place, so find it once
+        with self.lock:
+            flushed = self.flushed
+            pending = list(self.pending)
+        if slot < flushed:
+            part = {name: self.mapped(name, flushed) for name in self.dtypes}
+        else:
+            slot -= flushed
+            for part in pending + [{name: array[:self.fill] for name, array in self.chunk.items()}]:
+                if slot < len(part["time"]):
+                    break
+                slot -= len(part["time"])
+            else:
+                raise IndexError("step out of range")
+        return int(part["time"][slot]), {metric: part[metric][slot] for metric in METRICS}
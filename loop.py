@@ -1,23 +1,76 @@
-from agent import Agent, Task
-import matplotlib.pyplot as plt
+from agent import Agent, Task, TaskIndex
+from population import Population, BACKENDS
+from outcomes import TaskTable, batch_is_success
+from history import HistoryStore, DiskHistoryStore, static_from_agents, columns_from_agents
+import numpy as np
+import namegen
+import checkpoint
+from export import summary_rows
 
 class Simulation:
-    def __init__(self, N: int, tasks: list[Task], max_steps: int = 50):
+    """
+    retention / keep / every control how much of the run log_state keeps,
+    see history.HistoryStore ("all", the last `keep` steps, or every `every`-th step).
+    With history_dir the steps are streamed to files in that directory instead
+    (history.DiskHistoryStore) and close() should be called when the run is done.
+
+    export is an optional export.Sink that gets every agent's state_summary row
+    each time the state is logged (close() closes it too).
+
+    Every random draw of the run comes from one numpy Generator: rng if given,
+    otherwise one seeded with seed (None = fresh entropy). The same seed replays
+    the same run.
+    """
+    def __init__(self, N: int, tasks: list[Task], max_steps: int = 50, backend: str = "agents",
+                 retention: str = "all", keep: int = None, every: int = 1, seed=None, rng=None,
+                 history_dir=None, export=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+        self.backend = backend
+        self.rng = rng if rng is not None else np.random.default_rng(seed)
         agents = []
-        for i in range(N):
-            agents.append(Agent(id=i))
+        self.population = None
+        if backend == "vectorized":
+            self.population = Population(N, tasks, rng=self.rng)
+        else:
+            # names come from a child stream so reading them doesn't shift the simulation's draws
+            names = namegen.NamePool(rng=self.rng.spawn(1)[0])
+            for i in range(N):
+                agents.append(Agent(id=i, rng=self.rng, name_pool=names))
         self.agents = agents
         self.tasks = tasks
+        self.table = TaskTable(tasks)
+        self.task_index = TaskIndex(tasks)
         self.max_steps = max_steps
 
         self.active = False
         self.time = 0
-        self.history = []
+        self.export = export
+        static = self.population.static_fields() if self.population is not None else static_from_agents(self.agents)
+        if history_dir is not None:
+            self.history = DiskHistoryStore(history_dir, static, self.table.names, retention=retention, every=every)
+        else:
+            self.history = HistoryStore(
+                static,
+                self.table.names,
+                retention=retention,
+                keep=keep,
+                every=every,
+                capacity=max_steps + 2
+            )
         self.log_state()
 
     def step(self):
-        for agent in self.agents:
-            self.step_agent(agent)
+        if self.population is not None:
+            self.population.step(interact=False, insolvency_dropout=True)
+        else:
+            # choices and outcomes only depend on the agent itself, so the whole round
+            # is evaluated in one batch
+            alive = [agent for agent in self.agents if agent.alive]
+            chosen = [agent.choose_task(self.task_index) for agent in alive]
+            outcomes = batch_is_success(alive, chosen, self.table, self.rng)
+            for agent, outcome in zip(alive, outcomes):
+                self.apply_outcome(agent, outcome)
 
         self.log_state()
         self.time += 1
@@ -26,8 +79,11 @@ class Simulation:
         if not agent.alive:
             return
         
-        task = agent.choose_task(self.tasks)
+        task = agent.choose_task(self.task_index)
         outcome = task.is_success(agent)
+        self.apply_outcome(agent, outcome)
+
+    def apply_outcome(self, agent: Agent, outcome):
         agent.update(outcome)
 
         agent.age += 1
@@ -39,25 +95,84 @@ class Simulation:
             self.step()
 
     def log_state(self):
-        snapshot = []
-        for agent in self.agents:
-            snapshot.append({
-                "time": self.time
-            } | agent.state_summary())
-        self.history.append(snapshot)
+        if self.population is not None:
+            columns = self.population.history_columns()
+        else:
+            columns = columns_from_agents(self.agents, self.table.index)
+        self.history.record(self.time, columns)
+        if self.export is not None:
+            self.export.write(summary_rows(self.time, self.agents, self.population))
+
+    def close(self):
+        """Finish writing an on-disk history and the export, if the run has them."""
+        if isinstance(self.history, DiskHistoryStore):
+            self.history.close()
+        if self.export is not None:
+            self.export.close()
+
+    def save_checkpoint(self, path):
+        """Write the whole run (agents, history, RNG state, time) to directory path."""
+        meta = {
+            "kind": "simulation",
+            "backend": self.backend,
+            "time": self.time,
+            "max_steps": self.max_steps,
+            "active": self.active,
+            "tasks": checkpoint.tasks_state(self.tasks),
+            "rng": checkpoint.rng_state(self.rng),
+        }
+        if self.population is not None:
+            meta["population"], arrays = checkpoint.population_state(self.population)
+            arrays = checkpoint.prefixed("population", arrays)
+        else:
+            meta["agents"], arrays = checkpoint.agents_state(self.agents, self.table)
+            arrays = checkpoint.prefixed("agents", arrays)
+        meta["history"], history = checkpoint.history_state(self.history)
+        arrays |= checkpoint.prefixed("history", history)
+        checkpoint.write_checkpoint(path, meta, arrays)
+
+    @classmethod
+    def load_checkpoint(cls, path):
+        """Resume a run written by save_checkpoint; its columns are memory-mapped, not copied."""
+        meta, arrays = checkpoint.read_checkpoint(path, "simulation")
+        sim = cls.__new__(cls)
+        sim.backend = meta["backend"]
+        sim.rng = checkpoint.rng_from_state(meta["rng"])
+        sim.tasks = checkpoint.tasks_from_state(meta["tasks"])
+        sim.table = TaskTable(sim.tasks)
+        sim.task_index = TaskIndex(sim.tasks)
+        sim.max_steps = meta["max_steps"]
+        sim.active = meta["active"]
+        sim.time = meta["time"]
+        sim.export = None
+        sim.population = None
+        sim.agents = []
+        if "population" in meta:
+            sim.population = checkpoint.restore_population(
+                meta["population"], checkpoint.section(arrays, "population"), sim.tasks, sim.rng
+            )
+        else:
+            sim.agents = checkpoint.restore_agents(
+                meta["agents"], checkpoint.section(arrays, "agents"), sim.table, sim.rng
+            )
+        sim.history = checkpoint.restore_history(meta["history"], checkpoint.section(arrays, "history"))
+        return sim
 
     def agent_log(self, id, type):
-        agent_log = []
-        for i in range(len(self.history)):
-            agent_log.append(self.history[i][id])
-            print(self.history[i][id])
+        agent_log = [self.history.row(slot, id) for slot in self.history.slots()]
+        for entry in agent_log:
+            print(entry)
 
         if type == "self belief":
-            plt.plot([i for i in range(len(self.history))], [x["confidence"] for x in agent_log], label="Confidence", color="blue")
-            plt.plot([i for i in range(len(self.history))], [x["competence"] for x in agent_log], label="Competence", color="green")
-            plt.plot([i for i in range(len(self.history))], [x["talent"] for x in agent_log], label="True Talent", color="red")
+            # matplotlib takes most of a second to import, headless runs never need it
+            import matplotlib.pyplot as plt
+            trajectory = self.history.trajectory(id)
+            steps = range(len(self.history))
+            plt.plot(steps, trajectory["confidence"], label="Confidence", color="blue")
+            plt.plot(steps, trajectory["competence"], label="Competence", color="green")
+            plt.plot(steps, [self.history.static["talent"][id]] * len(steps), label="True Talent", color="red")
             plt.xlabel('Age')
-            plt.text(70, 0.2, agent_log[0]["class"])
+            plt.text(70, 0.2, self.history.static["class"][id])
             plt.legend()
             plt.title('Confidence and Competence to Time')
             plt.xlim(0, 300)
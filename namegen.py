@@ -0,0 +1,79 @@
+import numpy as np
+
+"""
+Pooled name generation.
+
+names.get_full_name opens and scans its distribution files on every call, which
+made building a few thousand agents mostly a names benchmark. This loads each
+distribution once and samples names in bulk from a numpy Generator, using the
+same rule as names.get_name (first name whose cumulative % exceeds U(0, 90)).
+"""
+
+GENDERS = ("male", "female")
+
+# refill size for the per-gender pools behind full_name()
+POOL_SIZE = 4096
+
+_distributions = {}
+
+# stream for callers that don't pass a Generator of their own
+default_rng = np.random.default_rng()
+
+
+class NameDistribution:
+    def __init__(self, filename):
+        names, cumulative = [], []
+        with open(filename) as name_file:
+            for line in name_file:
+                name, _, cumulative_pct, _ = line.split()
+                names.append(name.capitalize())
+                cumulative.append(float(cumulative_pct))
+        # trailing "" is what names.get_name falls back to past the end of the file
+        self.names = np.array(names + [""], dtype=object)
+        self.cumulative = np.array(cumulative)
+
+    def sample(self, n, rng):
+        selected = rng.random(n) * 90
+        return self.names[np.searchsorted(self.cumulative, selected, side="right")]
+
+
+def distribution(key):
+    if key not in _distributions:
+        import names  # only needed for the location of its data files
+        _distributions[key] = NameDistribution(names.FILES[key])
+    return _distributions[key]
+
+
+def full_names(genders, rng=None):
+    """One full name per entry of genders ("male" / "female"), sampled in bulk per gender."""
+    rng = default_rng if rng is None else rng
+    genders = np.asarray(genders, dtype=object)
+    firsts = np.empty(len(genders), dtype=object)
+    for gender in GENDERS:
+        mask = genders == gender
+        count = int(mask.sum())
+        if count:
+            firsts[mask] = distribution(f"first:{gender}").sample(count, rng)
+    lasts = distribution("last").sample(len(genders), rng)
+    return [f"{first} {last}" for first, last in zip(firsts, lasts)]
+
+
+class NamePool:
+    """Hands out single names from per-gender buffers that are refilled in bulk from rng."""
+    def __init__(self, size=POOL_SIZE, rng=None):
+        self.size = size
+        self.rng = default_rng if rng is None else rng
+        self.pools = {gender: [] for gender in GENDERS}
+
+    def full_name(self, gender):
+        pool = self.pools[gender]
+        if not pool:
+            pool.extend(full_names([gender] * self.size, self.rng))
+        return pool.pop()
+
+
+_pool = NamePool()
+
+
+def full_name(gender):
+    return _pool.full_name(gender)
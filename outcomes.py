@@ -0,0 +1,149 @@
+import numpy as np
+from agent import Agent, Task, AGE_HALF_LIFE, wealth_classes, resolve_rng
+
+"""
+Batched Task.is_success.
+
+evaluate_outcomes runs the is_success / compute_feedback formulas for a whole
+round at once: one array of agent columns, one array of chosen task indices,
+arrays back out. Population uses it on its own columns and batch_is_success
+adapts it to a list of Agent objects.
+"""
+
+# per-class tables indexed by the wealth code (position in wealth_classes)
+WEALTH_RATE_BY_CLASS = np.array([0.7, 1.0, 1.6])
+ADJUSTMENT_BY_CLASS = np.array([1.3, 1.0, 0.5])
+CLASS_NOISE = np.array([1.4, 1.0, 0.7])
+
+
+def unemployment_task():
+    # same fallback Agent.choose_task hands out when nothing is viable
+    return Task(
+        name="Unemployment",
+        difficulty=0.9,
+        reward=0,
+        variance=0,
+        base_loss=15,
+        repeatability=999
+    )
+
+
+class TaskTable:
+    """
+    Column view of a task list. The Unemployment fallback is always appended as
+    the last row so a chosen task is just an index into these arrays.
+    """
+    def __init__(self, tasks: list[Task]):
+        self.tasks = list(tasks) + [unemployment_task()]
+        self.unemployment = len(tasks)
+        self.names = [t.name for t in self.tasks]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.difficulty = np.array([t.difficulty for t in self.tasks], dtype=float)
+        self.reward = np.array([t.reward for t in self.tasks], dtype=float)
+        self.variance = np.array([t.variance for t in self.tasks], dtype=float)
+        self.base_loss = np.array([t.base_loss for t in self.tasks], dtype=float)
+        self.repeatability = np.array([t.repeatability for t in self.tasks], dtype=float)
+        # a required_capital of None or 0 means no requirement, same as the
+        # truthiness check in available_tasks
+        self.has_capital = np.array([bool(t.required_capital) for t in self.tasks])
+        self.required_capital = np.array([t.required_capital or 0 for t in self.tasks], dtype=float)
+        self.required_class = np.array(
+            [wealth_classes.index(t.required_class) if t.required_class else -1 for t in self.tasks],
+            dtype=np.int8
+        )
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def lookup(self, tasks: list[Task]):
+        """Task objects -> row indices (matched by name, so a fresh Unemployment task maps too)."""
+        return np.array([self.index[t.name] for t in tasks], dtype=np.int16)
+
+
+class Outcomes:
+    """
+    Results of one batch of task attempts, one entry per agent.
+
+    Indexing gives back the same dict Task.is_success returns, so
+    Agent.update can consume a batch entry unchanged.
+    """
+    def __init__(self, success, reward, loss, feedback):
+        self.success = success
+        self.reward = reward
+        self.loss = loss
+        self.feedback = feedback
+
+    def __len__(self):
+        return len(self.success)
+
+    def __getitem__(self, j):
+        return {
+            "success": bool(self.success[j]),
+            "reward": float(self.reward[j]),
+            "loss": float(self.loss[j]),
+            "feedback": float(self.feedback[j])
+        }
+
+    def __iter__(self):
+        for success, reward, loss, feedback in zip(
+            self.success.tolist(), self.reward.tolist(), self.loss.tolist(), self.feedback.tolist()
+        ):
+            yield {"success": success, "reward": reward, "loss": loss, "feedback": feedback}
+
+
+def evaluate_outcomes(table: TaskTable, task_idx, talent, wealth, age, confidence, times_done, rng):
+    """
+    Task.is_success + compute_feedback for a batch of attempts.
+
+    task_idx:   row in table of the task each agent attempts
+    wealth:     wealth codes (index into wealth_classes)
+    times_done: how often each agent has done its task, counting this attempt
+    rng:        numpy Generator the luck and variance draws come from
+    """
+    luck = rng.normal(0, 0.05, len(task_idx))
+    variance = table.variance[task_idx]
+    performance = (talent +
+                   luck +
+                   rng.uniform(-variance, variance) * CLASS_NOISE[wealth])
+
+    # Effects of training slows down as you age
+    task_value = table.reward[task_idx] * np.exp(-times_done / table.repeatability[task_idx])
+    age_penalty = np.exp(-age / AGE_HALF_LIFE)
+    success = performance > table.difficulty[task_idx]
+
+    raw = performance - confidence
+    feedback = raw * np.where(success, WEALTH_RATE_BY_CLASS[wealth], ADJUSTMENT_BY_CLASS[wealth]) * age_penalty
+    reward = np.where(success, task_value * age_penalty, 0.0)
+    loss = np.where(success, 0.0, table.base_loss[task_idx] * ADJUSTMENT_BY_CLASS[wealth])
+    return Outcomes(success, reward, loss, feedback)
+
+
+def batch_is_success(agents: list[Agent], tasks: list[Task], table: TaskTable, rng=None):
+    """
+    Task.is_success for a list of Agent objects and the task each one chose.
+    Bumps tasks_done / last_task / last_task_succeeded exactly like the scalar version.
+    Draws from rng, or the first agent's Generator when it isn't given.
+    """
+    if rng is None:
+        rng = agents[0].rng if agents else resolve_rng(None)
+    times_done = np.empty(len(agents))
+    for j, (agent, task) in enumerate(zip(agents, tasks)):
+        task.add_task(agent)
+        times_done[j] = agent.tasks_done[task.name]
+
+    outcomes = evaluate_outcomes(
+        table,
+        table.lookup(tasks),
+        np.array([a.talent for a in agents], dtype=float),
+        np.array([wealth_classes.index(a.wealth) for a in agents], dtype=np.int8),
+        np.array([a.age for a in agents], dtype=float),
+        np.array([a.identity.confidence for a in agents], dtype=float),
+        times_done,
+        rng
+    )
+
+    for agent, task, success in zip(agents, tasks, outcomes.success.tolist()):
+        if success:
+            agent.last_task = task.name
+        agent.last_task_succeeded = success
+    return outcomes
@@ -0,0 +1,146 @@
+import math
+import time
+
+"""
+Per-phase timing of the simulation and broadcast loops.
+
+A TickTimer is created for every simulation tick (and every broadcast frame)
+of a session that has profiling switched on. The code it times calls
+timer.lap(phase) at the end of each phase, which charges the time since the
+previous lap to that phase, so phases that interleave per agent (history,
+update, interaction) add up across the whole round with one clock read per
+lap. Only phases that were lapped count: a tick that never reached, say, the
+export phase doesn't report it as having taken 0 seconds. When a tick is done
+its phase totals go into:
+
+    Profiler     process-wide latency histograms per phase (the /metrics endpoint)
+    PhaseWindow  per-session count / total / max since the last perf_update event
+
+With profiling off there is no timer and the loops skip every lap.
+"""
+
+# tick phases (simulation_loop / run_simulation_round), then frame phases (publish_frame)
+TICK_PHASES = ("choose", "outcome", "peers", "history", "update", "interact", "export", "stats")
+FRAME_PHASES = ("serialize", "emit")
+# whole tick / whole frame, observed alongside their phases
+TOTALS = ("tick", "frame")
+PHASES = TICK_PHASES + FRAME_PHASES + TOTALS
+
+# histogram upper bounds in seconds (Prometheus "le" labels), +Inf is implied
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class TickTimer:
+    def __init__(self, phases):
+        self.started = self.last = time.perf_counter()
+        self.phases = frozenset(phases)
+        self.durations = {}  # only the phases lapped so far
+
+    def lap(self, phase):
+        if phase not in self.phases:
+            raise KeyError(phase)
+        now = time.perf_counter()
+        self.durations[phase] = self.durations.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def total(self):
+        return self.last - self.started
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # per bucket, not cumulative; last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(le label, cumulative count)] including +Inf."""
+        total = 0
+        out = []
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            out.append(("+Inf" if bound == math.inf else repr(bound), total))
+        return out
+
+
+class Profiler:
+    """Histograms of every phase over all profiled sessions."""
+    def __init__(self):
+        self.histograms = {phase: Histogram() for phase in PHASES}
+
+    def observe(self, timer, total):
+        for phase, seconds in timer.durations.items():
+            self.histograms[phase].observe(seconds)
+        self.histograms[total].observe(timer.total())
+
+
+class PhaseWindow:
+    """Per-phase count, total and max since the last flush, for one session's perf_update."""
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.started = time.monotonic()
+        self.count = dict.fromkeys(PHASES, 0)
+        self.total = dict.fromkeys(PHASES, 0.0)
+        self.max = dict.fromkeys(PHASES, 0.0)
+
+    def add(self, timer, total):
+        for phase, seconds in list(timer.durations.items()) + [(total, timer.total())]:
+            self.count[phase] += 1
+            self.total[phase] += seconds
+            self.max[phase] = max(self.max[phase], seconds)
+
+    def age(self):
+        return time.monotonic() - self.started
+
+    def flush(self):
+        """
+        {phase: {count, meanMs, maxMs}} for the phases that ran, plus ticks per
+        second, then start over.
+        """
+        elapsed = max(self.age(), 1e-9)
+        summary = {
+            'seconds': elapsed,
+            'ticksPerSecond': self.count['tick'] / elapsed,
+            'framesPerSecond': self.count['frame'] / elapsed,
+            'phases': {
+                phase: {
+                    'count': self.count[phase],
+                    'meanMs': self.total[phase] / self.count[phase] * 1e3,
+                    'maxMs': self.max[phase] * 1e3,
+                }
+                for phase in PHASES if self.count[phase]
+            }
+        }
+        self.clear()
+        return summary
+
+
+def prometheus_text(profiler, gauges):
+    """The histograms (and gauges: {name: (help, value)}) in the Prometheus text exposition format."""
+    lines = [
+        "# HELP simulation_phase_seconds Time per simulation tick / broadcast frame spent in each phase",
+        "# TYPE simulation_phase_seconds histogram",
+    ]
+    for phase, histogram in profiler.histograms.items():
+        for le, count in histogram.cumulative():
+            lines.append(f'simulation_phase_seconds_bucket{{phase="{phase}",le="{le}"}} {count}')
+        lines.append(f'simulation_phase_seconds_sum{{phase="{phase}"}} {histogram.sum!r}')
+        lines.append(f'simulation_phase_seconds_count{{phase="{phase}"}} {histogram.count}')
+    for name, (help, value) in gauges.items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
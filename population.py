@@ -0,0 +1,670 @@
+import numpy as np
+import namegen
+from agent import Task, DECAY_RATE, RISK_BANDS, wealth_classes, class_probability, risk_classes, resolve_rng
+from outcomes import TaskTable, WEALTH_RATE_BY_CLASS, evaluate_outcomes
+from socialgraph import SocialGraph
+
+"""
+Struct-of-arrays version of the agent population.
+
+Every agent field lives in one NumPy column and a whole round is advanced with
+masked array operations instead of calling Agent.choose_task / Task.is_success /
+Agent.update once per agent. The rules are the same ones agent.py uses, the
+per-class dict lookups just become arrays indexed by the wealth code.
+"""
+
+# "agents" walks a list of Agent objects, "vectorized" keeps the population as NumPy columns
+BACKENDS = ("agents", "vectorized")
+
+# wealth codes index into every per-class table below
+LOW, MIDDLE, HIGH = 0, 1, 2
+
+STARTING_REWARDS = np.array([30.0, 50.0, 100.0])
+BASE_ASPIRATION = np.array([0.3, 0.5, 0.8])
+BELIEF_OFFSET = np.array([0.0, 0.15, 0.3])
+MAX_CONFIDENCE_BY_CLASS = np.array([0.6, 0.8, 1.0])
+RISK_PROBABILITY = np.array([
+    [65, 30, 5],
+    [30, 40, 30],
+    [20, 40, 40],
+]) / 100
+SOCIAL_CAPITAL_RANGE = np.array([
+    [0.1, 0.3],
+    [0.3, 0.6],
+    [0.6, 0.9],
+])
+SCAR = np.array([0.02, 0.01, 0.0003])
+FAILURE_PRESSURE = np.array([0.08, 0.04, 0.015])
+CAPITAL_RETURN = np.array([0.0, 0.01, 0.025])
+LIVING_COST = np.array([2.0, 4.0, 6.0])
+ELITE_FLOOR = np.array([-10.0, 0.0, 20.0])
+SOCIAL_CAP_MAX = np.array([0.6, 0.8, 1.0])
+RESILIENCE = np.array([1.0, 0.7, 0.4])
+
+RISK_LOW = np.array([RISK_BANDS[r][0] for r in risk_classes])
+RISK_HIGH = np.array([RISK_BANDS[r][1] for r in risk_classes])
+
+# rows of the eligibility matrix evaluated at once in choose_tasks (rows x tasks)
+CHOOSE_CHUNK = 16384
+
+HISTORY_FIELDS = ("round", "age", "task", "success", "reward", "loss",
+                  "confidence", "competence", "aspiration", "risk_tolerance", "money")
+
+
+class Population:
+    """
+    Randomly creates N agents the same way Agent.__init__ does, but stores them as columns.
+
+    Agents are identified by their row index. history_window > 0 keeps a rolling
+    window of per-round entries for the dashboard (the app.py agent.history list).
+    Every random draw comes from rng (a numpy Generator); names use a child stream
+    of it so looking them up never shifts the simulation's draws.
+    """
+    def __init__(self, N: int, tasks: list[Task], history_window: int = 0, rng=None, social_graph=False):
+        self.rng = rng = resolve_rng(rng)
+        self.name_rng = rng.spawn(1)[0]
+        self.size = N
+        self.table = TaskTable(tasks)
+        self.round = 0
+
+        self.ids = np.arange(N)
+        self.gender = (rng.random(N) > 0.5).astype(np.uint8)  # 1 = male
+        self.talent = rng.random(N)
+        self.wealth = rng.choice(3, size=N, p=np.array(class_probability) / sum(class_probability)).astype(np.uint8)
+        self.age = np.zeros(N, dtype=np.int32)
+        self.alive = np.ones(N, dtype=bool)
+
+        # Identity
+        self.aspiration = np.clip(BASE_ASPIRATION[self.wealth] + rng.normal(0, 0.1, N), 0, 1)
+        self.competence = np.clip(self.talent + rng.normal(BELIEF_OFFSET[self.wealth], 0.05), 0, 1)
+        self.confidence = np.clip(self.competence + rng.normal(0, 0.1, N), 0, 1)
+        cumulative = RISK_PROBABILITY.cumsum(axis=1)[self.wealth, :-1]
+        self.risk_class = (rng.random((N, 1)) >= cumulative).sum(axis=1).astype(np.uint8)
+        self.max_confidence = MAX_CONFIDENCE_BY_CLASS[self.wealth] + rng.normal(0, 0.05, N)
+        self.risk_tolerance = rng.uniform(RISK_LOW[self.risk_class], RISK_HIGH[self.risk_class])
+
+        self.performance_estimate = self.confidence.copy()
+        self.rewards = STARTING_REWARDS[self.wealth].copy()
+        self.initial_rewards = self.rewards.copy()
+        self.dropout_pressure = np.zeros(N)
+        social_range = SOCIAL_CAPITAL_RANGE[self.wealth]
+        self.social_capital = rng.uniform(social_range[:, 0], social_range[:, 1])
+
+        self.last_task = np.full(N, -1, dtype=np.int16)  # -1 = no task yet
+        self.last_task_succeeded = np.zeros(N, dtype=bool)
+        self.tasks_done = np.zeros((N, len(self.table)), dtype=np.int32)
+
+        # the extra bookkeeping app.py keeps per agent
+        self.total_tasks_attempted = np.zeros(N, dtype=np.int32)
+        self.total_tasks_succeeded = np.zeros(N, dtype=np.int32)
+        self.task_difficulty_sum = np.zeros(N)
+
+        self._names = None
+
+        self.history_window = 0
+        self.history_row = None
+        if history_window:
+            self.track_history(history_window)
+
+        # with a social graph interaction goes over lasting ties instead of fresh random peers
+        self.graph = SocialGraph(self.wealth, self.social_capital, rng) if social_graph else None
+
+    def track_history(self, window, ids=None):
+        """
+        Keep a rolling window of history entries for every agent, or only for the
+        agents in ids (a large population can't afford one for everybody).
+        """
+        self.history_window = window
+        rows = self.size
+        self.history_row = None  # agent -> history row, None when every agent has its own
+        if ids is not None:
+            rows = len(ids)
+            self.history_row = np.full(self.size, -1, dtype=np.int32)  # -1 = not tracked
+            self.history_row[ids] = np.arange(rows)
+        self.history_count = np.zeros(rows, dtype=np.int32)
+        self.history = {
+            "round": np.zeros((rows, window), dtype=np.int32),
+            "age": np.zeros((rows, window), dtype=np.int32),
+            "task": np.zeros((rows, window), dtype=np.int16),
+            "success": np.zeros((rows, window), dtype=bool),
+            "reward": np.zeros((rows, window)),
+            "loss": np.zeros((rows, window)),
+            "confidence": np.zeros((rows, window)),
+            "competence": np.zeros((rows, window)),
+            "aspiration": np.zeros((rows, window)),
+            "risk_tolerance": np.zeros((rows, window)),
+            "money": np.zeros((rows, window)),
+        }
+
+    def __len__(self):
+        return self.size
+
+    def name(self, i):
+        # the whole population is named in one bulk draw the first time anyone looks
+        if self._names is None:
+            self._names = namegen.full_names(np.where(self.gender == 1, "male", "female"), self.name_rng)
+        return self._names[i]
+
+    def choose_tasks(self, idx):
+        """
+        Vectorized Agent.available_tasks + Agent.choose_task for the agents in idx.
+        Returns the index of the chosen task for every agent (Unemployment if nothing is viable).
+        """
+        table = self.table
+        n_tasks = table.unemployment
+        difficulty = table.difficulty[:n_tasks]
+        base_loss = table.base_loss[:n_tasks]
+        reward = table.reward[:n_tasks]
+        required_class = table.required_class[:n_tasks]
+        has_capital = table.has_capital[:n_tasks]
+        required_capital = table.required_capital[:n_tasks]
+
+        chosen = np.full(len(idx), table.unemployment, dtype=np.int16)
+        for start in range(0, len(idx), CHOOSE_CHUNK):
+            rows = idx[start:start + CHOOSE_CHUNK]
+            n = len(rows)
+            wealth = self.wealth[rows][:, None]
+            rewards = self.rewards[rows][:, None]
+            aspiration = self.aspiration[rows][:, None]
+            confidence = self.confidence[rows][:, None]
+            competence = self.competence[rows][:, None]
+            risk = self.risk_tolerance[rows][:, None]
+            age = self.age[rows][:, None]
+            estimate = self.performance_estimate[rows][:, None]
+            low = wealth == LOW
+
+            # available_tasks
+            viable = ~(has_capital & (required_capital > rewards) & ~(low & (reward <= 20)))
+            breach = low & (self.rng.random((n, n_tasks)) < 0.05)
+            viable &= (required_class < 0) | (wealth == required_class) | breach
+            viable &= low | (rewards >= base_loss)
+
+            # choose_task
+            viable &= ~((difficulty > aspiration) & (self.rng.random((n, n_tasks)) < 0.7))
+            viable &= (confidence - difficulty) >= -risk
+            viable &= ~((age > 40) & (difficulty < aspiration - 0.2))
+            viable &= rewards >= base_loss
+            viable &= ~((wealth == HIGH) & (difficulty > competence + 0.2))
+
+            score = reward * estimate - base_loss * (1 - estimate)
+            score = np.where(viable, score, -np.inf)
+            best = score.argmax(axis=1)
+            chosen[start:start + n] = np.where(viable.any(axis=1), best, table.unemployment)
+        return chosen
+
+    def is_success(self, idx, task_idx):
+        """
+        Task.is_success for the agents in idx attempting task_idx. Updates tasks_done /
+        last_task the same way and returns the batch as an Outcomes.
+        """
+        self.tasks_done[idx, task_idx] += 1
+        outcomes = evaluate_outcomes(
+            self.table,
+            task_idx,
+            self.talent[idx],
+            self.wealth[idx],
+            self.age[idx],
+            self.confidence[idx],
+            self.tasks_done[idx, task_idx],
+            self.rng
+        )
+
+        # a failed task does not overwrite last_task, same as Task.is_success
+        success = outcomes.success
+        self.last_task[idx[success]] = task_idx[success]
+        self.last_task_succeeded[idx] = success
+        return outcomes
+
+    def update(self, idx, outcomes):
+        """Vectorized Agent.update for the agents in idx."""
+        n = len(idx)
+        success, reward, loss, feedback = outcomes.success, outcomes.reward, outcomes.loss, outcomes.feedback
+        wealth = self.wealth[idx]
+        age = self.age[idx]
+        low = wealth == LOW
+        failure = ~success
+        wealth_rate = WEALTH_RATE_BY_CLASS[wealth]
+
+        rewards = self.rewards[idx]
+        confidence = self.confidence[idx]
+        competence = self.competence[idx]
+        aspiration = self.aspiration[idx]
+        risk = self.risk_tolerance[idx]
+        max_confidence = self.max_confidence[idx]
+        social = self.social_capital[idx]
+
+        # Youth buffers burnout
+        pressure = self.dropout_pressure[idx] * np.where(age < 30, 0.88, np.where(age < 40, 0.93, 0.97))
+        age_rate = np.exp(-age / DECAY_RATE)
+        social *= 0.995
+
+        downgraded = (age > 50) & (confidence < 0.3)
+        aspiration = np.where(downgraded, aspiration * 0.7, aspiration)
+        risk = np.where(downgraded, risk * 0.7, risk)
+
+        self.performance_estimate[idx] = 0.9 * self.performance_estimate[idx] + 0.1 * success
+
+        # rock bottom burnout happens before the belief delta is read on failure
+        rock_bottom = failure & low & (rewards < 10)
+        rewards = np.where(rock_bottom, 10.0, rewards)
+        confidence = np.where(rock_bottom, confidence - 0.05, confidence)
+        aspiration = np.where(rock_bottom, aspiration * 0.9, aspiration)
+        belief_delta = feedback * np.clip(confidence, 0.2, 1)
+
+        rewards = np.where(success, rewards + reward * wealth_rate, rewards - loss)
+        confidence = np.where(success, confidence + 0.08 * wealth_rate, confidence)
+        pressure = np.where(success, np.maximum(0, pressure - 0.05), pressure + FAILURE_PRESSURE[wealth])
+        max_confidence = np.where(failure, max_confidence - SCAR[wealth], max_confidence)
+
+        # Rare mentor boost
+        mentored = success & low & (self.rng.random(n) < 0.08)
+        competence = np.where(mentored, competence + 0.05, competence)
+        max_confidence = np.where(mentored, max_confidence + 0.1, max_confidence)
+
+        confidence += belief_delta * age_rate * wealth_rate
+        risk += age_rate * np.where(success, 0.05, -0.1)
+        aspiration_gain = age_rate * belief_delta * 0.5
+        aspiration += np.where(low & (age < 35), aspiration_gain * 0.4, aspiration_gain)
+
+        pressure += np.where((aspiration - confidence > 0.2) & (age > 30), 0.02, 0)
+
+        # Reality check
+        learning_rate = 0.03 * age_rate * wealth_rate
+        competence += learning_rate * (success - competence)
+        confidence += np.clip(0.01 * age_rate * (competence - confidence), -0.005, 0.005)
+
+        competence = np.minimum(competence, 0.6 + 0.4 * self.talent[idx])
+        confidence = np.maximum(np.minimum(confidence, max_confidence), 0.05)
+        risk_class = self.risk_class[idx]
+        risk = np.maximum(np.minimum(risk, RISK_HIGH[risk_class]), RISK_LOW[risk_class])
+        aspiration = np.clip(aspiration, 0, 1)
+
+        rewards += rewards * CAPITAL_RETURN[wealth]
+        rewards -= LIVING_COST[wealth]
+        rewards = np.maximum(rewards, ELITE_FLOOR[wealth])
+
+        unemployed = self.last_task[idx] == self.table.unemployment
+        confidence = np.where(unemployed, np.clip(confidence - 0.05, 0, 1), confidence)
+        aspiration = np.where(unemployed, np.clip(aspiration - 0.02, 0, 1), aspiration)
+        pressure = np.where(unemployed, pressure + 0.05, pressure)
+
+        rewards = np.where(low & (rewards > 150), rewards * 0.98, rewards)
+
+        settled = ~low & (pressure > 0.6)
+        aspiration = np.where(settled, aspiration * 0.85, aspiration)
+        risk = np.where(settled, risk * 0.85, risk)
+        pressure = np.where(settled, pressure * 0.7, pressure)
+
+        rewards = np.where(low & (age < 30), rewards + 2, rewards)
+
+        # Rare positive life shock
+        lucky = low & (self.rng.random(n) < 0.015)
+        rewards = np.where(lucky, rewards + self.rng.uniform(20, 80, n), rewards)
+        confidence = np.where(lucky, confidence + 0.1, confidence)
+
+        social = np.minimum(social, SOCIAL_CAP_MAX[wealth])
+
+        dropout_chance = np.clip((pressure - 0.6) * RESILIENCE[wealth], 0, 0.5)
+        dropped = (pressure > 0.8) & (self.rng.random(n) < dropout_chance)
+
+        self.rewards[idx] = rewards
+        self.confidence[idx] = confidence
+        self.competence[idx] = competence
+        self.aspiration[idx] = aspiration
+        self.risk_tolerance[idx] = risk
+        self.max_confidence[idx] = max_confidence
+        self.social_capital[idx] = social
+        self.dropout_pressure[idx] = pressure
+        self.alive[idx[dropped]] = False
+
+    def interact(self, idx):
+        """
+        Vectorized Agent.interact: one same-class peer, an "above" peer 25% of the time
+        and a "below" peer 10% of the time, keeping at most two. Peers are drawn from
+        the agents alive right now and everyone reads the same snapshot of their state.
+        """
+        n = len(idx)
+        alive = np.flatnonzero(self.alive)
+        if len(alive) == 0:
+            return
+        # wealth codes are already in class rank order, so "above" / "below" are contiguous
+        rank = self.wealth[alive]
+        order = alive[np.argsort(rank, kind="stable")]
+        bounds = np.searchsorted(np.sort(rank), np.arange(len(wealth_classes) + 1))
+
+        peer_confidence = self.confidence.copy()
+        peer_competence = self.competence.copy()
+
+        my_rank = self.wealth[idx]
+        start, stop = bounds[my_rank], bounds[my_rank + 1]
+        ranges = [
+            (start, stop, np.ones(n, dtype=bool)),  # same class
+            (stop, np.full(n, len(order)), self.rng.random(n) < 0.25),  # above
+            (np.zeros(n, dtype=int), start, self.rng.random(n) < 0.1),  # below
+        ]
+
+        picked = np.zeros(n, dtype=np.int8)
+        for lo, hi, wanted in ranges:
+            take = wanted & (hi > lo) & (picked < 2)
+            if not take.any():
+                continue
+            slot = lo + (self.rng.random(n) * (hi - lo)).astype(int)
+            peer = order[np.minimum(slot[take], len(order) - 1)]
+            picked += take
+            self._peer_effects(idx[take], peer, peer_confidence, peer_competence)
+
+    def _peer_effects(self, idx, peer, peer_confidence, peer_competence):
+        n = len(idx)
+        # peer_confidence_update
+        confidence = self.confidence[idx]
+        confidence = np.clip(confidence + 0.02 * (peer_confidence[peer] - confidence), 0, 1)
+        self.confidence[idx] = confidence
+
+        # peer_opportunity
+        opportunity = (
+            (self.wealth[idx] == LOW) & (self.wealth[peer] != LOW) &
+            (self.rng.random(n) < 0.05 * self.social_capital[peer])
+        )
+        self.aspiration[idx] = np.where(opportunity, np.clip(self.aspiration[idx] + 0.1, 0, 1), self.aspiration[idx])
+        self.social_capital[idx] = np.where(opportunity, np.clip(self.social_capital[idx] + 0.05, 0, 1), self.social_capital[idx])
+
+        # peer_learning
+        learned = (
+            (peer_competence[peer] > self.competence[idx]) &
+            self.last_task_succeeded[idx] &
+            (self.rng.random(n) < 0.15)
+        )
+        self.competence[idx] = np.where(learned, np.clip(self.competence[idx] + 0.02, 0, 1), self.competence[idx])
+
+    def network_interact(self, idx):
+        """
+        interact over the social graph: every tie met this round (see socialgraph.py)
+        applies interact's peer rules, and their effects are summed per agent over the
+        edges. Like interact, everyone reads the same snapshot. Then the graph ages a round.
+        """
+        graph = self.graph
+        met = graph.meet(self.alive)
+        sources, targets = graph.rows[met], graph.indices[met]
+        size = self.size
+
+        # peer_confidence_update
+        shift = np.bincount(sources, 0.02 * (self.confidence[targets] - self.confidence[sources]), minlength=size)
+
+        # peer_opportunity, only ever for Low agents
+        low = np.flatnonzero(self.wealth[sources] == LOW)
+        tie = targets[low]
+        opportunity = (self.wealth[tie] != LOW) & (self.rng.random(len(low)) < 0.05 * self.social_capital[tie])
+        opportunities = np.bincount(sources[low[opportunity]], minlength=size)[idx]
+
+        # peer_learning, only after a success
+        succeeded = np.flatnonzero(self.last_task_succeeded[sources])
+        learner, tie = sources[succeeded], targets[succeeded]
+        learned = (self.competence[tie] > self.competence[learner]) & (self.rng.random(len(succeeded)) < 0.15)
+        lessons = np.bincount(learner[learned], minlength=size)[idx]
+
+        self.confidence[idx] = np.clip(self.confidence[idx] + shift[idx], 0, 1)
+        lucky = idx[opportunities > 0]
+        opportunities = opportunities[opportunities > 0]
+        self.aspiration[lucky] = np.clip(self.aspiration[lucky] + 0.1 * opportunities, 0, 1)
+        self.social_capital[lucky] = np.clip(self.social_capital[lucky] + 0.05 * opportunities, 0, 1)
+        taught = idx[lessons > 0]
+        self.competence[taught] = np.clip(self.competence[taught] + 0.02 * lessons[lessons > 0], 0, 1)
+
+        graph.age(met, self.alive, self.wealth, self.social_capital)
+
+    def record_history(self, idx, task_idx, outcomes):
+        rows = idx
+        success, reward, loss = outcomes.success, outcomes.reward, outcomes.loss
+        if self.history_row is not None:
+            # only the tracked agents
+            rows = self.history_row[idx]
+            tracked = rows >= 0
+            rows, idx, task_idx = rows[tracked], idx[tracked], task_idx[tracked]
+            success, reward, loss = success[tracked], reward[tracked], loss[tracked]
+
+        slot = self.history_count[rows] % self.history_window
+        history = self.history
+        history["round"][rows, slot] = self.round
+        history["age"][rows, slot] = self.age[idx]
+        history["task"][rows, slot] = task_idx
+        history["success"][rows, slot] = success
+        history["reward"][rows, slot] = reward
+        history["loss"][rows, slot] = loss
+        history["confidence"][rows, slot] = self.confidence[idx]
+        history["competence"][rows, slot] = self.competence[idx]
+        history["aspiration"][rows, slot] = self.aspiration[idx]
+        history["risk_tolerance"][rows, slot] = self.risk_tolerance[idx]
+        history["money"][rows, slot] = self.rewards[idx]
+        self.history_count[rows] += 1
+
+    def step(self, interact=False, insolvency_dropout=True, timer=None):
+        """
+        Advances every alive agent by one round and returns the ids that dropped out.
+
+        interact=True adds the peer interaction app.py runs after each update,
+        insolvency_dropout=True kills agents whose rewards hit 0 like Simulation.step_agent does.
+        timer is an optional perf.TickTimer that gets a lap per phase.
+        """
+        idx = np.flatnonzero(self.alive)
+        if len(idx) == 0:
+            self.round += 1
+            return idx
+
+        task_idx = self.choose_tasks(idx)
+        if timer:
+            timer.lap("choose")
+        outcomes = self.is_success(idx, task_idx)
+        if timer:
+            timer.lap("outcome")
+
+        if self.history_window:
+            self.record_history(idx, task_idx, outcomes)
+        if timer:
+            timer.lap("history")
+        self.total_tasks_attempted[idx] += 1
+        self.total_tasks_succeeded[idx] += outcomes.success
+        self.task_difficulty_sum[idx] += self.table.difficulty[task_idx]
+
+        self.update(idx, outcomes)
+        if timer:
+            timer.lap("update")
+        if interact and self.graph is not None:
+            self.network_interact(idx)
+        elif interact:
+            self.interact(idx)
+        self.age[idx] += 1
+        if timer:
+            timer.lap("interact")
+        if insolvency_dropout:
+            self.alive[idx[self.rewards[idx] <= 0]] = False
+
+        self.round += 1
+        return idx[~self.alive[idx]]
+
+    def agent_history(self, i):
+        if not self.history_window:
+            return []
+        if self.history_row is not None:
+            i = self.history_row[i]
+            if i < 0:
+                return []
+        count = int(self.history_count[i])
+        n = min(count, self.history_window)
+        slots = (count - n + np.arange(n)) % self.history_window
+        columns = {field: self.history[field][i, slots].tolist() for field in HISTORY_FIELDS}
+        table = self.table
+        entries = []
+        for j in range(n):
+            task = columns["task"][j]
+            entries.append({
+                "round": columns["round"][j],
+                "age": columns["age"][j],
+                "task": table.names[task],
+                "difficulty": float(table.difficulty[task]),
+                "success": columns["success"][j],
+                "reward": columns["reward"][j],
+                "loss": columns["loss"][j],
+                "confidence": columns["confidence"][j],
+                "competence": columns["competence"][j],
+                "aspiration": columns["aspiration"][j],
+                "risk_tolerance": columns["risk_tolerance"][j],
+                "money": columns["money"][j],
+            })
+        return entries
+
+    def state_summary(self, idx=None):
+        """Same rows Agent.state_summary produces, for every agent (or the ones in idx)."""
+        if idx is None:
+            idx = self.ids
+        task_names = self.table.names
+        rows = []
+        for i, age, wealth, alive, talent, money, confidence, competence, aspiration, risk, last, succeeded in zip(
+            idx.tolist(),
+            self.age[idx].tolist(),
+            self.wealth[idx].tolist(),
+            self.alive[idx].tolist(),
+            self.talent[idx].tolist(),
+            self.rewards[idx].tolist(),
+            self.confidence[idx].tolist(),
+            self.competence[idx].tolist(),
+            self.aspiration[idx].tolist(),
+            self.risk_tolerance[idx].tolist(),
+            self.last_task[idx].tolist(),
+            self.last_task_succeeded[idx].tolist(),
+        ):
+            rows.append({
+                "id": i,
+                "name": self.name(i),
+                "gender": "male" if self.gender[i] else "female",
+                "age": age,
+                "class": wealth_classes[wealth],
+                "alive": alive,
+                "talent": talent,
+                "money": money,
+                "confidence": confidence,
+                "competence": competence,
+                "aspiration": aspiration,
+                "risk tolerance": risk,
+                "last task": task_names[last] if last >= 0 else None,
+                "succeeded last task?": succeeded,
+            })
+        return rows
+
+    def agent_data(self, idx=None):
+        """state_summary plus the dashboard metrics app.get_agent_data adds."""
+        if idx is None:
+            idx = self.ids
+        rows = self.state_summary(idx)
+        attempted = self.total_tasks_attempted[idx]
+        safe_attempted = np.maximum(attempted, 1)
+        avg_difficulty = np.where(attempted > 0, self.task_difficulty_sum[idx] / safe_attempted, 0).tolist()
+        failure_rate = np.where(attempted > 0, (attempted - self.total_tasks_succeeded[idx]) / safe_attempted, 0).tolist()
+        age = self.age[idx]
+        reward_rate = np.where(age > 0, (self.rewards[idx] - self.initial_rewards[idx]) / np.maximum(age, 1), 0).tolist()
+        repeatability = self.tasks_done[idx].max(axis=1).tolist()
+        initial = self.initial_rewards[idx].tolist()
+        for j, row in enumerate(rows):
+            row["avg_task_difficulty"] = avg_difficulty[j]
+            row["failure_rate"] = failure_rate[j]
+            row["reward_rate"] = reward_rate[j]
+            row["task_repeatability"] = repeatability[j]
+            row["total_rewards"] = row["money"]
+            row["initial_rewards"] = initial[j]
+            row["history"] = self.agent_history(row["id"])
+        return rows
+
+    def agent(self, i):
+        return AgentView(self, i)
+
+    def static_fields(self):
+        """Per-agent fields a HistoryStore keeps once instead of per step."""
+        return {
+            "id": self.ids.tolist(),
+            "name": [self.name(i) for i in range(self.size)],
+            "gender": np.where(self.gender == 1, "male", "female").tolist(),
+            "class": [wealth_classes[w] for w in self.wealth.tolist()],
+            "talent": self.talent.tolist(),
+        }
+
+    def history_columns(self):
+        """Current value of every per-step HistoryStore metric, one array per metric."""
+        return {
+            "age": self.age,
+            "alive": self.alive,
+            "money": self.rewards,
+            "confidence": self.confidence,
+            "competence": self.competence,
+            "aspiration": self.aspiration,
+            "risk tolerance": self.risk_tolerance,
+            "last task": self.last_task,
+            "succeeded last task?": self.last_task_succeeded,
+        }
+
+
+class IdentityView:
+    def __init__(self, population, i):
+        self._population = population
+        self._i = i
+
+    @property
+    def confidence(self):
+        return float(self._population.confidence[self._i])
+
+    @property
+    def competence(self):
+        return float(self._population.competence[self._i])
+
+    @property
+    def aspiration(self):
+        return float(self._population.aspiration[self._i])
+
+    @property
+    def risk_tolerance(self):
+        return float(self._population.risk_tolerance[self._i])
+
+    @property
+    def max_confidence(self):
+        return float(self._population.max_confidence[self._i])
+
+
+class AgentView:
+    """Read-only Agent-shaped handle on one row of a Population."""
+    def __init__(self, population, i):
+        self._population = population
+        self.id = int(i)
+        self.identity = IdentityView(population, self.id)
+
+    @property
+    def name(self):
+        return self._population.name(self.id)
+
+    @property
+    def gender(self):
+        return "male" if self._population.gender[self.id] else "female"
+
+    @property
+    def wealth(self):
+        return wealth_classes[self._population.wealth[self.id]]
+
+    @property
+    def talent(self):
+        return float(self._population.talent[self.id])
+
+    @property
+    def rewards(self):
+        return float(self._population.rewards[self.id])
+
+    @property
+    def age(self):
+        return int(self._population.age[self.id])
+
+    @property
+    def alive(self):
+        return bool(self._population.alive[self.id])
+
+    @property
+    def history(self):
+        return self._population.agent_history(self.id)
+
+    def state_summary(self):
+        return self._population.state_summary(np.array([self.id]))[0]
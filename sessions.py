@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+
+"""
+Bounded pool of per-session simulations.
+
+Every Socket.IO session owns its own simulation state dict. The pool caps how
+many sessions can be connected at once and how many agents they may hold in
+total; when a new run doesn't fit, paused runs are evicted least recently used
+first. Sessions that sit idle (not running) for longer than the idle timeout
+are evicted as well.
+"""
+
+MAX_SESSIONS = 40
+MAX_TOTAL_AGENTS = 20000
+IDLE_TIMEOUT = 15 * 60  # seconds
+
+
+class PoolFull(Exception):
+    pass
+
+
+class SessionPool:
+    """
+    new_state:  sid -> fresh state dict for a session
+    on_evict:   called with (state, reason) after a run or session is evicted
+    """
+    def __init__(self, new_state, max_sessions=MAX_SESSIONS, max_agents=MAX_TOTAL_AGENTS,
+                 idle_timeout=IDLE_TIMEOUT, on_evict=None):
+        self.new_state = new_state
+        self.max_sessions = max_sessions
+        self.max_agents = max_agents
+        self.idle_timeout = idle_timeout
+        self.on_evict = on_evict
+        self.sessions = OrderedDict()  # sid -> state, least recently used first
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, sid):
+        return sid in self.sessions
+
+    def open(self, sid, **kwargs):
+        if sid not in self.sessions and len(self.sessions) >= self.max_sessions:
+            raise PoolFull(f"Server is at its limit of {self.max_sessions} sessions")
+        state = self.new_state(sid, **kwargs)
+        state['last_active'] = time.monotonic()
+        self.sessions[sid] = state
+        return state
+
+    def get(self, sid):
+        """The session's state (marked as just used), or None."""
+        state = self.sessions.get(sid)
+        if state is not None:
+            self.touch(sid)
+        return state
+
+    def touch(self, sid):
+        self.sessions[sid]['last_active'] = time.monotonic()
+        self.sessions.move_to_end(sid)
+
+    def close(self, sid):
+        state = self.sessions.pop(sid, None)
+        if state is not None:
+            state['running'] = False
+        return state
+
+    def total_agents(self, exclude=None):
+        return sum(state['num_agents'] for sid, state in self.sessions.items() if sid != exclude)
+
+    def reserve(self, sid, num_agents):
+        """
+        Make room for a run of num_agents in session sid, evicting paused runs of
+        other sessions (least recently used first). Raises PoolFull if it can't.
+        """
+        if num_agents > self.max_agents:
+            raise PoolFull(f"At most {self.max_agents} agents can be simulated at once")
+
+        for other, state in list(self.sessions.items()):
+            if self.total_agents(exclude=sid) + num_agents <= self.max_agents:
+                break
+            if other != sid and not state['running'] and state['num_agents']:
+                self.evict_run(state, "memory")
+
+        if self.total_agents(exclude=sid) + num_agents > self.max_agents:
+            raise PoolFull("Too many agents are being simulated right now, try fewer or try again later")
+
+    def evict_run(self, state, reason):
+        state['running'] = False
+        if self.on_evict is not None:
+            self.on_evict(state, reason)
+        state['evicted'] = reason
+
+    def evict_idle(self, now=None):
+        """Close sessions that haven't run or been used for idle_timeout, returning their sids."""
+        now = time.monotonic() if now is None else now
+        idle = [
+            sid for sid, state in self.sessions.items()
+            if not state['running'] and now - state['last_active'] > self.idle_timeout
+        ]
+        for sid in idle:
+            self.evict_run(self.close(sid), "idle")
+        return idle
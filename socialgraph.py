@@ -0,0 +1,155 @@
+import numpy as np
+from agent import wealth_classes
+
+"""
+Persistent social network for the vectorized population.
+
+Ties are directed (the people an agent turns to) and stored in CSR form: the
+slots of agent i are indptr[i]:indptr[i + 1], with each tie's target in indices
+and its strength in strength. A slot with strength 0 is empty. rows holds every
+slot's agent, so per-edge values are summed back onto agents with
+np.add.reduceat over indptr, or np.bincount over rows.
+
+Degree follows social capital: an agent aims for MIN_DEGREE to MAX_DEGREE ties,
+and its row has room for SLACK more than that target at build time. Rows are
+sized once and never grow, so a tie that doesn't fit is simply not made. Ties are
+homophilous: a new one goes to the agent's own class with probability
+HOMOPHILY * (1 - social_capital), and to anybody at all otherwise.
+
+Each round:
+- meet: every tie is met with probability PEERS * its share of the agent's total
+  strength, so an agent meets about PEERS ties, mostly the strong ones.
+- age: ties that were met go back to full strength, the rest lose DECAY of
+  theirs and are removed once weaker than DROP. Ties to agents who dropped out
+  are never met, so they fade the same way.
+- form: an agent under its target degree makes a new tie with probability FORM.
+That is a few vectorized passes over the edges; the graph is never rebuilt.
+"""
+
+MIN_DEGREE = 2
+MAX_DEGREE = 12
+SLACK = 4
+HOMOPHILY = 0.9
+PEERS = 2      # ties met per round on average (like Agent.interact's two peers)
+DECAY = 0.1    # share of its strength an unmet tie loses per round
+DROP = 0.2     # ties weaker than this are removed, ~16 rounds without meeting
+FORM = 0.3     # chance per round that an agent under its target degree makes a tie
+REDRAWS = 3    # tries per agent to find a new tie when building the graph
+
+
+class SocialGraph:
+    def __init__(self, wealth, social_capital, rng):
+        self.rng = rng
+        n = len(wealth)
+        self.size = n
+
+        # class members, contiguous per class (wealth never changes)
+        self.members = np.argsort(wealth, kind="stable").astype(np.int32)
+        self.bounds = np.searchsorted(wealth[self.members], np.arange(len(wealth_classes) + 1))
+
+        target = target_degree(social_capital)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(target + SLACK, out=self.indptr[1:])
+        self.rows = np.repeat(np.arange(n, dtype=np.int32), target + SLACK)
+        self.indices = np.zeros(self.indptr[-1], dtype=np.int32)
+        self.strength = np.zeros(self.indptr[-1], dtype=np.float32)
+        self.degree = np.zeros(n, dtype=np.int32)
+
+        # a tie drawn twice is dropped, so give everybody a few tries to reach its target
+        for _ in range(MAX_DEGREE * REDRAWS):
+            short = np.flatnonzero(self.degree < target)
+            if not len(short):
+                break
+            self.form(short, wealth, social_capital)
+
+    def __len__(self):
+        """Number of ties."""
+        return int(self.degree.sum())
+
+    def draw_ties(self, sources, wealth, social_capital):
+        """A candidate tie for every agent in sources, never to the agent itself."""
+        n = len(sources)
+        rng = self.rng
+        own = wealth[sources]
+        lo, hi = self.bounds[own], self.bounds[own + 1]
+        same = rng.random(n) < HOMOPHILY * (1 - social_capital[sources])
+        targets = np.where(
+            same,
+            self.members[lo + (rng.random(n) * (hi - lo)).astype(np.int64)],
+            rng.integers(self.size, size=n),
+        ).astype(np.int32)
+        # a tie to oneself goes to the next agent over instead
+        loops = targets == sources
+        targets[loops] = (targets[loops] + 1) % self.size
+        return targets
+
+    def form(self, sources, wealth, social_capital):
+        """
+        One new tie for each agent in sources, in the first empty slot of its row. Agents
+        with a full row, or whose draw they are already tied to, go without. Returns how
+        many ties were made.
+        """
+        if not len(sources):
+            return 0
+        targets = self.draw_ties(sources, wealth, social_capital)
+        # the rows of sources side by side, padded out to the widest row
+        first = self.indptr[sources]
+        width = self.indptr[sources + 1] - first
+        slots = first[:, None] + np.arange(width.max())
+        inside = slots < (first + width)[:, None]
+        slots = np.where(inside, slots, 0)
+        empty = inside & (self.strength[slots] == 0)
+        tied = (inside & ~empty & (self.indices[slots] == targets[:, None])).any(axis=1)
+        made = empty.any(axis=1) & ~tied
+        edges = slots[made, empty[made].argmax(axis=1)]
+        self.indices[edges] = targets[made]
+        self.strength[edges] = 1
+        self.degree[sources[made]] += 1
+        return len(edges)
+
+    def meet(self, alive):
+        """
+        Slots of the ties met this round, in row order. Ties of agents who dropped out,
+        and ties to them, are never met, so they fade like any other unused tie.
+        """
+        strength = self.strength
+        total = np.add.reduceat(strength, self.indptr[:-1])
+        # met with probability PEERS * strength / total, without dividing every edge
+        draw = self.rng.random(len(strength), dtype=np.float32) * np.repeat(total, np.diff(self.indptr))
+        met = np.flatnonzero(draw < PEERS * strength)
+        return met[alive[self.rows[met]] & alive[self.indices[met]]]
+
+    def age(self, met, alive, wealth, social_capital):
+        """
+        Close the round: met ties go back to full strength, the others decay and are
+        removed once weaker than DROP, and agents short of their target degree may form
+        a new tie. Returns (removed, formed).
+        """
+        strength = self.strength
+        strength *= 1 - DECAY
+        strength[met] = 1
+        removed = np.flatnonzero((strength < DROP) & (strength > 0))
+        strength[removed] = 0
+        self.degree -= np.bincount(self.rows[removed], minlength=self.size).astype(np.int32)
+
+        short = alive & (self.degree < target_degree(social_capital))
+        short = np.flatnonzero(short & (self.rng.random(self.size) < FORM))
+        return len(removed), self.form(short, wealth, social_capital)
+
+    def state(self):
+        """The graph's columns, for checkpoint.population_state."""
+        return {name: value for name, value in vars(self).items() if isinstance(value, np.ndarray)}
+
+    @classmethod
+    def from_state(cls, arrays, rng):
+        graph = cls.__new__(cls)
+        graph.rng = rng
+        for name, array in arrays.items():
+            setattr(graph, name, array)
+        graph.size = len(graph.indptr) - 1
+        return graph
+
+
+def target_degree(social_capital):
+    """How many ties agents with this social capital aim for."""
+    return MIN_DEGREE + np.rint(np.asarray(social_capital) * (MAX_DEGREE - MIN_DEGREE)).astype(np.int32)
@@ -1,4 +1,4 @@
-from agent import Task
+from agent import Task, TaskIndex
 """
 Types of Tasks
 1. Survival / Maintenance
@@ -392,4 +392,7 @@ total_tasks = (
     recovery_tasks
 )
 
+# built once, lookups go through this instead of rescanning total_tasks
+total_task_index = TaskIndex(total_tasks)
+
 # Generatively Make New Tasks depending on recent information or smth idk. use ai
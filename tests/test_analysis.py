@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import requests
+import app
+from agent import Agent
+from analysiscache import AnalysisCache
+
+"""
+Whatever goes wrong asking the AI service for an analysis, the client gets an
+agent_analysis with an error rather than nothing at all.
+"""
+
+
+class Reply:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    sent = []
+    monkeypatch.setattr(app, "analyses", AnalysisCache())
+    monkeypatch.setattr(app.socketio, "emit", lambda event, data, to=None: sent.append((event, data, to)))
+    return sent
+
+
+@pytest.fixture
+def summary():
+    return app.summarize_agent_for_llm(Agent(3, rng=np.random.default_rng(0)))
+
+
+@pytest.mark.parametrize("reply", [
+    requests.ConnectionError("refused"),
+    ValueError("not JSON"),
+    {"wrong": "key"},
+    ["not", "an", "object"],
+])
+def test_failures_reach_the_client(monkeypatch, emitted, summary, reply):
+    def post(*args, **kwargs):
+        if isinstance(reply, requests.RequestException):
+            raise reply
+        return Reply(reply)
+    monkeypatch.setattr(app.ai_client, "post", post)
+
+    app.send_analysis("sid", 3, summary)
+    [(event, data, to)] = emitted
+    assert event == 'agent_analysis' and to == "sid"
+    assert data['agent_id'] == 3 and 'error' in data
+
+
+def test_analysis_is_cached(monkeypatch, emitted, summary):
+    monkeypatch.setattr(app.ai_client, "post", lambda *args, **kwargs: Reply({"message": "fine"}))
+    app.send_analysis("sid", 3, summary)
+    app.send_analysis("sid", 3, summary)
+    assert [data['cached'] for _, data, _ in emitted] == [False, True]
+    assert emitted[0][1]['analysis'] == "fine"
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+import app
+import checkpoint
+from loop import Simulation
+from tasks import total_tasks
+
+"""
+A run resumed from a checkpoint has to continue bit for bit like the run that
+wrote it: both are stepped further and written out again, and every array and
+meta field of the two checkpoints must match.
+"""
+
+BACKENDS = ["agents", "vectorized"]
+
+
+def assert_same_checkpoint(path, other, kind):
+    meta, arrays = checkpoint.read_checkpoint(path, kind, mmap=False)
+    other_meta, other_arrays = checkpoint.read_checkpoint(other, kind, mmap=False)
+    assert meta == other_meta
+    assert arrays.keys() == other_arrays.keys()
+    for name, array in arrays.items():
+        assert np.array_equal(array, other_arrays[name]), name
+
+
+def assert_same_stats(stats, other):
+    # the agents backend's running class sums differ from a fresh rebuild by rounding only
+    assert stats.keys() == other.keys()
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            assert value == pytest.approx(other[key], rel=1e-12), key
+        else:
+            assert value == other[key], key
+
+
+@pytest.mark.parametrize("backend, social_graph", [(backend, False) for backend in BACKENDS] + [("vectorized", True)])
+def test_app_session_resumes_bit_identical(tmp_path, backend, social_graph):
+    state = app.new_simulation_state("test")
+    app.initialize_simulation(state, 80, backend, seed=21, social_graph=social_graph)
+    state['max_rounds'] = 200
+    for _ in range(30):
+        app.run_simulation_round(state)
+    app.save_checkpoint(state, tmp_path / "saved")
+
+    resumed = app.new_simulation_state("resumed")
+    app.load_checkpoint(resumed, tmp_path / "saved")
+    assert not resumed['running']
+    assert app.get_agent_data(resumed) == app.get_agent_data(state)
+
+    for _ in range(30):
+        app.run_simulation_round(state)
+        app.run_simulation_round(resumed)
+    assert state['dropouts'] > 0
+    assert app.get_agent_data(resumed) == app.get_agent_data(state)
+    assert_same_stats(app.calculate_stats(resumed), app.calculate_stats(state))
+
+    app.save_checkpoint(state, tmp_path / "original")
+    app.save_checkpoint(resumed, tmp_path / "copy")
+    assert_same_checkpoint(tmp_path / "original", tmp_path / "copy", "app")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_simulation_resumes_bit_identical(tmp_path, backend):
+    sim = Simulation(50, total_tasks, max_steps=100, backend=backend, seed=5)
+    sim.step_N_times(20)
+    sim.save_checkpoint(tmp_path / "saved")
+
+    resumed = Simulation.load_checkpoint(tmp_path / "saved")
+    sim.step_N_times(20)
+    resumed.step_N_times(20)
+
+    sim.save_checkpoint(tmp_path / "original")
+    resumed.save_checkpoint(tmp_path / "copy")
+    assert_same_checkpoint(tmp_path / "original", tmp_path / "copy", "simulation")
+
+
+def test_wrong_kind_is_refused(tmp_path):
+    sim = Simulation(5, total_tasks, seed=1)
+    sim.save_checkpoint(tmp_path / "sim")
+    with pytest.raises(checkpoint.CheckpointError):
+        checkpoint.read_checkpoint(tmp_path / "sim", "app")
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+import app
+from agent import Agent, wealth_classes
+from classstats import ClassStats, MEAN_KEYS, VARIANCE_KEYS, REBUILD_INTERVAL, values
+
+"""
+The running per-class aggregates the agents backend keeps have to agree with a
+full rescan of the living agents, through dropouts and periodic rebuilds.
+"""
+
+
+def rescan(agents):
+    return ClassStats(agents).fill({})
+
+
+def assert_close(stats, expected):
+    assert stats.keys() == expected.keys()
+    for key, value in stats.items():
+        assert value == pytest.approx(expected[key], rel=1e-9, abs=1e-12), key
+
+
+def test_running_stats_match_rescan_through_dropouts():
+    state = app.new_simulation_state("test")
+    app.initialize_simulation(state, 120, "agents", seed=4)
+    state['max_rounds'] = 10**6
+    for _ in range(REBUILD_INTERVAL + 20):
+        app.run_simulation_round(state)
+        agents = state['agents']
+        assert state['class_stats'].alive() == sum(agent.alive for agent in agents)
+        assert_close(state['class_stats'].fill({}), rescan(agents))
+    assert state['dropouts'] > 0
+
+
+def test_remove_then_add_is_a_no_op():
+    rng = np.random.default_rng(2)
+    agents = [Agent(i, rng=rng) for i in range(30)]
+    stats = ClassStats(agents)
+    before = stats.fill({})
+    for agent in agents[::3]:
+        stats.remove(agent)
+    assert stats.alive() == 20
+    for agent in agents[::3]:
+        stats.add(agent)
+    assert_close(stats.fill({}), before)
+
+
+def test_from_columns_matches_agents():
+    rng = np.random.default_rng(3)
+    agents = [Agent(i, rng=rng) for i in range(50)]
+    wealth = np.array([wealth_classes.index(agent.wealth) for agent in agents])
+    columns = list(np.array([values(agent) for agent in agents]).T)
+    assert_close(ClassStats.from_columns(wealth, columns).fill({}), rescan(agents))
+
+
+def test_fill_keys_and_empty_class():
+    stats = ClassStats().fill({})
+    assert set(stats) == set(MEAN_KEYS) | set(VARIANCE_KEYS)
+    assert all(stats[key] == {wealth_class: 0 for wealth_class in wealth_classes} for key in stats)
@@ -0,0 +1,74 @@
+import json
+import pytest
+import app
+from frames import KEYFRAME_INTERVAL
+
+"""
+Replays the 'agent_update' / 'agent_delta' frames a session broadcasts the way
+the client applies them (App.jsx), and checks the result against the server's
+own get_agent_data after every frame.
+"""
+
+ROUNDS_PER_FRAME = (1, 3, 1, 2)  # frames that coalesce several rounds too
+
+
+def sent_frames(monkeypatch):
+    frames = []
+    # through JSON like Socket.IO does, so numpy scalars or int dict keys would show
+    monkeypatch.setattr(app.socketio, "emit", lambda event, data, to=None: frames.append(json.loads(json.dumps(data))))
+    return frames
+
+
+def replay(agents, frame):
+    """agents (id -> row) after the client applies frame."""
+    if frame["type"] == "agent_update":
+        return {row["id"]: row for row in frame["agents"]}
+    for change in frame["changes"]:
+        agents[change["id"]] = agents[change["id"]] | change
+    for agent_id, entries in frame["history"].items():
+        agent = agents[int(agent_id)]
+        agent["history"] = (agent["history"] + entries)[-app.HISTORY_WINDOW:]
+    return agents
+
+
+@pytest.mark.parametrize("backend", ["agents", "vectorized"])
+def test_json_frames_replay_to_agent_data(monkeypatch, backend):
+    frames = sent_frames(monkeypatch)
+    state = app.new_simulation_state("test")
+    app.initialize_simulation(state, 60, backend, seed=7)
+    state['max_rounds'] = 10**6
+
+    agents = {}
+    last = None
+    for i in range(2 * KEYFRAME_INTERVAL + 5):
+        for _ in range(ROUNDS_PER_FRAME[i % len(ROUNDS_PER_FRAME)]):
+            app.run_simulation_round(state)
+        app.broadcast_agents(state)
+        frame = frames[-1]
+        if last is not None and frame["type"] == "agent_delta":
+            assert frame["base"] == last
+        last = frame["frame"]
+        agents = replay(agents, frame)
+
+        expected = json.loads(json.dumps(app.get_agent_data(state)))
+        assert [agents[row["id"]] for row in expected] == expected
+
+    types = [frame["type"] for frame in frames]
+    assert types.count("agent_update") == 3
+    assert state['dropouts'] > 0  # the replay covered agents dropping out
+
+
+def test_keyframe_matches_replayed_state(monkeypatch):
+    # a client joining mid-run gets the encoder's cached rows, the same a replaying client holds
+    frames = sent_frames(monkeypatch)
+    state = app.new_simulation_state("test")
+    app.initialize_simulation(state, 30, "agents", seed=3)
+    agents = {}
+    for _ in range(6):
+        app.run_simulation_round(state)
+        app.broadcast_agents(state)
+        agents = replay(agents, frames[-1])
+
+    keyframe = json.loads(json.dumps(app.current_keyframe(state)))
+    assert keyframe["frame"] == frames[-1]["frame"]
+    assert {row["id"]: row for row in keyframe["agents"]} == agents
@@ -0,0 +1,36 @@
+import pytest
+import app
+import perf
+
+"""
+Phase timings only count the phases a tick actually went through.
+"""
+
+
+def test_phases_that_never_ran_are_not_observed():
+    timer = perf.TickTimer(perf.TICK_PHASES)
+    timer.lap("choose")
+    timer.lap("stats")
+    profiler, window = perf.Profiler(), perf.PhaseWindow()
+    profiler.observe(timer, "tick")
+    window.add(timer, "tick")
+
+    observed = {phase for phase, histogram in profiler.histograms.items() if histogram.count}
+    assert observed == {"choose", "stats", "tick"}
+    assert set(window.flush()['phases']) == {"choose", "stats", "tick"}
+
+
+def test_unknown_phase():
+    with pytest.raises(KeyError):
+        perf.TickTimer(perf.FRAME_PHASES).lap("choose")
+
+
+@pytest.mark.parametrize("backend", ["agents", "vectorized"])
+def test_round_laps(backend):
+    state = app.new_simulation_state("test")
+    app.initialize_simulation(state, 20, backend, seed=2)
+    state['timer'] = timer = perf.TickTimer(perf.TICK_PHASES)
+    app.run_simulation_round(state)
+    # the agents backend builds its peer index in a phase of its own
+    expected = {"choose", "outcome", "history", "update", "interact"}
+    assert set(timer.durations) == expected | ({"peers"} if backend == "agents" else set())
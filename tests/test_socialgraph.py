@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import app
+from population import Population
+from socialgraph import DROP, target_degree
+
+"""
+The social graph keeps a CSR row of live, distinct ties per agent whose degree
+follows social capital, forms and drops ties as rounds go by, and its peer
+effects are the per-agent sum over the edges met.
+"""
+
+
+def population(n=400, seed=3):
+    return Population(n, app.TASKS, rng=np.random.default_rng(seed), social_graph=True)
+
+
+def ties(graph, agent):
+    edges = np.arange(graph.indptr[agent], graph.indptr[agent + 1])
+    return graph.indices[edges[graph.strength[edges] > 0]]
+
+
+def assert_consistent(graph):
+    live = graph.strength > 0
+    assert (np.bincount(graph.rows[live], minlength=graph.size) == graph.degree).all()
+    assert (graph.indices[live] != graph.rows[live]).all()
+    for agent in range(graph.size):
+        assert len(set(ties(graph, agent))) == graph.degree[agent]
+
+
+def test_degree_follows_social_capital():
+    pop = population()
+    graph = pop.graph
+    assert_consistent(graph)
+    assert (graph.degree <= target_degree(pop.social_capital)).all()
+    # more social capital, more ties
+    rich = pop.social_capital > 0.6
+    assert graph.degree[rich].mean() > graph.degree[~rich].mean() + 3
+
+
+def test_ties_form_and_fade():
+    pop = population()
+    graph = pop.graph
+    before = graph.strength.copy()
+    for _ in range(30):
+        pop.step(interact=True)
+        assert_consistent(graph)
+    # some of the first ties went unmet long enough to fade, new ones took their place
+    kept = (before > 0) & (graph.strength > 0)
+    assert kept.sum() < (before > 0).sum()
+    assert ((before == 0) & (graph.strength > 0)).any()
+    assert (graph.strength[graph.strength > 0] >= DROP).all()
+
+
+def test_ties_to_dropouts_are_never_met():
+    pop = population()
+    graph = pop.graph
+    pop.alive[::2] = False
+    for _ in range(5):
+        met = graph.meet(pop.alive)
+        assert pop.alive[graph.rows[met]].all() and pop.alive[graph.indices[met]].all()
+        graph.age(met, pop.alive, pop.wealth, pop.social_capital)
+
+
+def test_peer_effects_sum_over_met_edges():
+    pop = population(100)
+    graph = pop.graph
+    pop.last_task_succeeded[:] = False  # no learning, so only confidence moves
+    met = graph.meet(pop.alive)
+    graph.meet = lambda alive: met
+    confidence = pop.confidence.copy()
+    pop.network_interact(np.arange(pop.size))
+
+    expected = confidence.copy()
+    for edge in met:
+        source, target = graph.rows[edge], graph.indices[edge]
+        expected[source] += 0.02 * (confidence[target] - confidence[source])
+    assert pop.confidence == pytest.approx(np.clip(expected, 0, 1))
+
+
+def test_agents_backend_runs_the_graph_vectorized():
+    state = app.new_simulation_state("test")
+    app.initialize_simulation(state, 50, "agents", seed=1, social_graph=True)
+    assert state['backend'] == "vectorized"
+    assert state['population'].graph is not None
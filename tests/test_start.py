@@ -0,0 +1,61 @@
+import pytest
+import app
+
+"""
+'start' checks its parameters before claiming anything, and builds the run in
+the background: the client hears simulation_started once it's ready, and other
+commands are turned away until then.
+"""
+
+
+@pytest.fixture
+def client():
+    client = app.socketio.test_client(app.app)
+    client.get_received()
+    yield client
+    client.disconnect()
+
+
+def session(client):
+    return app.sessions.get(app.socketio.server.manager.sid_from_eio_sid(client.eio_sid, '/'))
+
+
+def names(client):
+    return [message['name'] for message in client.get_received()]
+
+
+def wait_for(client, name, timeout=10):
+    received = []
+    for _ in range(int(timeout / 0.05)):
+        received += names(client)
+        if name in received:
+            return received
+        app.socketio.sleep(0.05)
+    raise AssertionError(f"no {name} in {received}")
+
+
+@pytest.mark.parametrize("params", [
+    {'num_agents': 'lots'},
+    {'num_rounds': None},
+    {'tick_rate': [1]},
+    {'fps': 'fast'},
+    {'num_agents': float('inf')},
+])
+def test_bad_parameters_are_an_error(client, params):
+    client.emit('message', {'command': 'start', 'params': params})
+    assert names(client) == ['simulation_error']
+    state = session(client)
+    assert not state['starting'] and not state['running']
+
+
+def test_start_builds_in_the_background(client):
+    client.emit('message', {'command': 'start', 'params': {'num_agents': 30, 'num_rounds': 3, 'seed': 5}})
+    # the handler returned before the run was built, so it isn't taking commands yet
+    client.emit('message', {'command': 'pause'})
+    assert names(client) == ['simulation_error']
+
+    received = wait_for(client, 'simulation_started')
+    assert 'simulation_error' not in received
+    state = session(client)
+    assert state['seed'] == 5 and len(state['agents']) == 30
+    wait_for(client, 'simulation_complete')
@@ -0,0 +1,139 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import app
+from wire import BinaryEncoder, AGENT_COLUMNS, HISTORY_COLUMNS, DTYPES, KEYFRAME_INTERVAL, NO_TASK
+
+"""
+Decodes 'agent_binary' frames the way the client does (typed array views on
+the payload, codes looked up in the keyframe dictionary) and checks them
+against the get_agent_data rows they were packed from.
+"""
+
+ROUNDS_PER_FRAME = (1, 2, 1, 3)
+
+
+def column(data, spec, length):
+    field, dtype, offset = spec
+    assert offset % 4 == 0
+    return np.frombuffer(data, dtype=DTYPES[dtype], count=length, offset=offset)
+
+
+def columns(data, specs, length):
+    return {spec[0]: column(data, spec, length) for spec in specs}
+
+
+def decode_task(dictionary, code):
+    return None if code == dictionary["noTask"] else dictionary["tasks"][code]
+
+
+def decode_entry(dictionary, values, k):
+    entry = {field: values[field][k].item() for field, _ in HISTORY_COLUMNS}
+    entry["task"] = decode_task(dictionary, entry["task"])
+    entry["success"] = entry["success"] == 1
+    return entry
+
+
+def decode(frame, dictionary, previous):
+    """Rows (id -> row) after the client applies frame on top of previous."""
+    data, count = frame["data"], frame["count"]
+    values = columns(data, frame["columns"], count)
+    logged = columns(data, frame["history"], frame["historyCount"])
+    if frame["keyframe"]:
+        lengths = column(data, frame["historyWindow"][0], count)
+        blocks = columns(data, frame["historyWindow"][1:], count * frame["window"])
+
+    agents = {}
+    for i in range(count):
+        row = {field: values[field][i].item() for field, _ in AGENT_COLUMNS}
+        row["name"] = dictionary["names"][i]
+        row["class"] = dictionary["classes"][row["class"]]
+        row["gender"] = dictionary["genders"][row["gender"]]
+        row["alive"] = row["alive"] == 1
+        row["succeeded last task?"] = row["succeeded last task?"] == 1
+        row["last task"] = decode_task(dictionary, row["last task"])
+        if frame["keyframe"]:
+            row["history"] = [decode_entry(dictionary, blocks, i * frame["window"] + j) for j in range(lengths[i])]
+        else:
+            history = previous[row["id"]]["history"] + [
+                decode_entry(dictionary, logged, k) for k in np.flatnonzero(logged["agent"] == i)
+            ]
+            row["history"] = history[-app.HISTORY_WINDOW:]
+        agents[row["id"]] = row
+    return agents
+
+
+def as_sent(row):
+    """The fields of a get_agent_data row that binary frames carry, after the float32 round trip."""
+    sent = {field: float(np.float32(row[field])) if dtype == "f4" else row[field] for field, dtype in AGENT_COLUMNS}
+    sent["name"] = row["name"]
+    sent["history"] = [
+        {field: float(np.float32(entry[field])) if dtype == "f4" else entry[field] for field, dtype in HISTORY_COLUMNS}
+        for entry in row["history"]
+    ]
+    return sent
+
+
+@pytest.mark.parametrize("backend", ["agents", "vectorized"])
+def test_binary_frames_decode_to_agent_data(backend):
+    state = app.new_simulation_state("test", encoding="binary")
+    app.initialize_simulation(state, 40, backend, seed=11)
+    encoder = state['binary_encoder']
+
+    dictionary, agents = None, {}
+    for i in range(KEYFRAME_INTERVAL + 5):
+        for _ in range(ROUNDS_PER_FRAME[i % len(ROUNDS_PER_FRAME)]):
+            app.run_simulation_round(state)
+        rows = app.get_agent_data(state)
+        frame = encoder.encode(rows)
+        assert len(frame["data"]) % 4 == 0
+        if frame["keyframe"]:
+            dictionary = frame["dictionary"]
+        agents = decode(frame, dictionary, agents)
+
+        assert [agents[row["id"]] for row in rows] == [as_sent(row) for row in rows]
+
+
+def test_task_codes_past_255():
+    names = [f"task {i}" for i in range(300)]
+    table = SimpleNamespace(names=names, difficulty=np.linspace(0, 1, 300))
+    encoder = BinaryEncoder(table, history_window=2)
+    entry = {field: 0 for field, _ in HISTORY_COLUMNS} | {"task": "task 299", "success": True}
+    row = {field: 0 for field, _ in AGENT_COLUMNS} | {
+        "class": "Low", "gender": "male", "last task": "task 280", "name": "A", "history": [entry],
+    }
+    frame = encoder.encode([row, row | {"id": 1, "last task": None}], keyframe=True)
+
+    agents = decode(frame, frame["dictionary"], {})
+    assert agents[0]["last task"] == "task 280"
+    assert agents[0]["history"][0]["task"] == "task 299"
+    assert agents[1]["last task"] is None
+
+
+def test_task_table_too_large_for_codes():
+    table = SimpleNamespace(names=[str(i) for i in range(NO_TASK)], difficulty=np.zeros(NO_TASK))
+    with pytest.raises(ValueError):
+        BinaryEncoder(table, history_window=2)
+
+
+def test_resync_keyframe_between_broadcasts(monkeypatch):
+    # rounds run between broadcasts, so a resync keyframe carries entries the next frame must not repeat
+    sent = []
+    monkeypatch.setattr(app, "emit", lambda event, data: sent.append(data))
+    monkeypatch.setattr(app.socketio, "emit", lambda event, data, to=None: sent.append(data))
+    state = app.new_simulation_state("test", encoding="binary")
+    app.initialize_simulation(state, 20, "agents", seed=5)
+
+    dictionary, agents = None, {}
+    for rounds, action in [(2, app.broadcast_agents), (3, app.send_keyframe), (1, app.broadcast_agents),
+                           (2, app.broadcast_agents)]:
+        for _ in range(rounds):
+            app.run_simulation_round(state)
+        action(state)
+        frame = sent[-1]
+        if frame["keyframe"]:
+            dictionary = frame["dictionary"]
+        agents = decode(frame, dictionary, agents)
+
+        rows = app.get_agent_data(state)
+        assert [agents[row["id"]] for row in rows] == [as_sent(row) for row in rows]
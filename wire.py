@@ -0,0 +1,171 @@
+import numpy as np
+from agent import wealth_classes
+
+"""
+Packed binary encoding of get_agent_data() rows.
+
+Clients that ask for it on connect get 'agent_binary' frames instead of JSON:
+every numeric agent field is one little-endian float32, uint16 or uint8 column in a
+fixed order, concatenated into a single bytes payload (each column starts on a
+4-byte boundary so the client can wrap it in a typed array view
+without copying). Strings never go into the columns: names, classes, genders
+and task names are sent as a dictionary in keyframes and referenced by code.
+
+Every frame carries the full columns plus the history entries logged since the
+previous broadcast (several per agent when a frame covers more than one round);
+keyframes instead carry the dictionary and the whole rolling history window.
+"""
+
+KEYFRAME_INTERVAL = 25
+
+GENDERS = ["male", "female"]
+NO_TASK = 65535  # uint16 task code for "no task yet", the catalogue can grow to 65535 tasks
+
+# (row field, dtype) in wire order
+AGENT_COLUMNS = (
+    ("id", "f4"),
+    ("age", "f4"),
+    ("talent", "f4"),
+    ("money", "f4"),
+    ("confidence", "f4"),
+    ("competence", "f4"),
+    ("aspiration", "f4"),
+    ("risk tolerance", "f4"),
+    ("avg_task_difficulty", "f4"),
+    ("failure_rate", "f4"),
+    ("reward_rate", "f4"),
+    ("task_repeatability", "f4"),
+    ("total_rewards", "f4"),
+    ("initial_rewards", "f4"),
+    ("class", "u1"),
+    ("gender", "u1"),
+    ("alive", "u1"),
+    ("succeeded last task?", "u1"),
+    ("last task", "u2"),
+)
+
+# (history entry field, dtype); "difficulty" is looked up from the task dictionary
+HISTORY_COLUMNS = (
+    ("round", "f4"),
+    ("age", "f4"),
+    ("task", "u2"),
+    ("success", "u1"),
+    ("reward", "f4"),
+    ("loss", "f4"),
+    ("confidence", "f4"),
+    ("competence", "f4"),
+    ("aspiration", "f4"),
+    ("risk_tolerance", "f4"),
+    ("money", "f4"),
+)
+
+DTYPES = {"f4": "<f4", "u2": "<u2", "u1": "u1"}
+
+
+class ColumnWriter:
+    """Appends arrays to one buffer, padding every column to a 4-byte boundary."""
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def add(self, field, dtype, values):
+        data = np.asarray(values, dtype=DTYPES[dtype]).tobytes()
+        spec = [field, dtype, self.size]
+        self.chunks.append(data)
+        self.size += len(data)
+        padding = -self.size % 4
+        if padding:
+            self.chunks.append(b"\0" * padding)
+            self.size += padding
+        return spec
+
+    def getvalue(self):
+        return b"".join(self.chunks)
+
+
+class BinaryEncoder:
+    def __init__(self, table, history_window, keyframe_interval=KEYFRAME_INTERVAL):
+        self.task_names = list(table.names)
+        if len(self.task_names) >= NO_TASK:
+            raise ValueError(f"Binary frames carry at most {NO_TASK} tasks, the table has {len(self.task_names)}")
+        self.task_difficulty = table.difficulty.tolist()
+        self.task_codes = {name: code for code, name in enumerate(self.task_names)}
+        self.history_window = history_window
+        self.keyframe_interval = keyframe_interval
+        self.frame = 0
+        self.since_keyframe = 0
+        self.last_round = -1  # newest history round already broadcast
+
+    def code(self, field, value):
+        if field == "class":
+            return wealth_classes.index(value)
+        if field == "gender":
+            return GENDERS.index(value)
+        if field in ("last task", "task"):
+            return NO_TASK if value is None else self.task_codes[value]
+        return value
+
+    def encode(self, rows, keyframe=None):
+        """
+        Pack rows into the next broadcast frame. keyframe=None follows the
+        keyframe schedule, True forces one (e.g. for a client that just joined).
+        """
+        if keyframe is None:
+            keyframe = self.since_keyframe == 0 or self.since_keyframe >= self.keyframe_interval
+        self.frame += 1
+        self.since_keyframe = 1 if keyframe else self.since_keyframe + 1
+        frame = self.pack(rows, keyframe, self.last_round)
+        self.last_round = max(
+            [self.last_round] + [row["history"][-1]["round"] for row in rows if row["history"]]
+        )
+        return frame
+
+    def pack(self, rows, keyframe, since_round=-1):
+        writer = ColumnWriter()
+        columns = [
+            writer.add(field, dtype, [self.code(field, row[field]) for row in rows])
+            for field, dtype in AGENT_COLUMNS
+        ]
+
+        # history entries newer than since_round, flattened, "agent" is the row they belong to
+        entries = [] if keyframe else [
+            (i, entry) for i, row in enumerate(rows)
+            for entry in row["history"] if entry["round"] > since_round
+        ]
+        history = [writer.add("agent", "f4", [i for i, _ in entries])]
+        for field, dtype in HISTORY_COLUMNS:
+            history.append(writer.add(field, dtype, [self.code(field, entry[field]) for _, entry in entries]))
+
+        frame = {
+            'type': 'agent_binary',
+            'frame': self.frame,
+            'count': len(rows),
+            'keyframe': keyframe,
+            'columns': columns,
+            'history': history,
+            'historyCount': len(entries)
+        }
+
+        if keyframe:
+            window = self.history_window
+            frame['dictionary'] = {
+                'names': [row["name"] for row in rows],
+                'classes': wealth_classes,
+                'genders': GENDERS,
+                'tasks': self.task_names,
+                'difficulty': self.task_difficulty,
+                'noTask': NO_TASK
+            }
+            # full rolling window as (agents x window) row-major blocks, oldest entry first
+            frame['window'] = window
+            lengths = [min(len(row["history"]), window) for row in rows]
+            frame['historyWindow'] = [writer.add("history_len", "u1", lengths)]
+            for field, dtype in HISTORY_COLUMNS:
+                block = np.zeros((len(rows), window), dtype=DTYPES[dtype])
+                for i, row in enumerate(rows):
+                    entries = row["history"][-window:]
+                    block[i, :len(entries)] = [self.code(field, entry[field]) for entry in entries]
+                frame['historyWindow'].append(writer.add(field, dtype, block))
+
+        frame['data'] = writer.getvalue()
+        return frame